@@ -0,0 +1,6 @@
+"""Backend components for the AyurParam Streamlit app.
+
+Modules in this package hold process-wide state (caches, pools, counters).
+They are imported once per process, unlike ``ayurparam_streamlit.py`` which
+Streamlit re-executes on every rerun.
+"""
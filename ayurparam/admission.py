@@ -0,0 +1,179 @@
+"""Process-wide admission control: a concurrency limit with fair queueing."""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+# Weight of the newest sample in the service time moving average.
+SERVICE_ALPHA = 0.2
+
+
+class Rejected(RuntimeError):
+    """Raised when a request would wait longer than the admission limit."""
+
+
+class Ticket:
+    """One request waiting for (or holding) an upstream slot."""
+
+    __slots__ = ('owner', 'enqueued', 'admitted', 'position', 'eta')
+
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.enqueued = time.monotonic()
+        self.admitted = None
+        # Refreshed under the controller lock whenever the queue changes
+        self.position = 0
+        self.eta = None
+
+    @property
+    def waiting(self) -> bool:
+        return self.admitted is None
+
+
+class AdmissionController:
+    """Limit upstream generations to ``max_concurrent`` across every session.
+
+    Waiting requests queue FIFO per ``owner`` (a Streamlit session, or one
+    session's batch), and owners take turns when a slot frees up, so one
+    busy session cannot push everybody else to the back. Each ticket's
+    ``position`` and ``eta`` are kept current for display. A request is
+    rejected straight away if its estimated wait exceeds ``max_wait``
+    seconds, and rejected later if it actually waits that long.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_wait: float = 120.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_time = None
+        self._lanes = OrderedDict()
+        self._cond = threading.Condition()
+
+    def acquire(self, owner: str, cancelled: Optional[threading.Event] = None, on_queue=None) -> Ticket:
+        """Block until a slot is free and return the admitted ticket.
+
+        ``on_queue(ticket)`` is called once if the request has to wait.
+        Raises ``Rejected`` when the wait is (or would be) too long, and
+        returns ``None`` if ``cancelled`` is set while waiting.
+        """
+        with self._cond:
+            ticket = Ticket(owner)
+            if self.active < self.max_concurrent and not self._lanes:
+                return self._admit(ticket)
+            self._lanes.setdefault(owner, deque()).append(ticket)
+            self._update_positions()
+            if ticket.eta is not None and ticket.eta > self.max_wait:
+                self._remove(ticket)
+                raise self._reject(ticket.eta)
+        if on_queue is not None:
+            on_queue(ticket)
+        with self._cond:
+            while ticket.waiting:
+                waited = time.monotonic() - ticket.enqueued
+                if cancelled is not None and cancelled.is_set():
+                    self._remove(ticket)
+                    return None
+                if waited >= self.max_wait:
+                    self._remove(ticket)
+                    raise self._reject(waited)
+                # Wake up now and then to notice cancellation and the deadline
+                self._cond.wait(min(0.5, self.max_wait - waited))
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot and admit the next waiting request."""
+        held = time.monotonic() - ticket.admitted
+        with self._cond:
+            self.active -= 1
+            self.service_time = held if self.service_time is None else SERVICE_ALPHA * held + (1 - SERVICE_ALPHA) * self.service_time
+            self._admit_waiting()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": sum(len(lane) for lane in self._lanes.values()),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+    def _admit(self, ticket: Ticket) -> Ticket:
+        ticket.admitted = time.monotonic()
+        ticket.position = 0
+        ticket.eta = 0.0
+        self.active += 1
+        self.admitted += 1
+        return ticket
+
+    def _admit_waiting(self):
+        while self.active < self.max_concurrent and self._lanes:
+            # Round robin: serve the oldest lane, then move it to the back
+            owner, lane = next(iter(self._lanes.items()))
+            ticket = lane.popleft()
+            del self._lanes[owner]
+            if lane:
+                self._lanes[owner] = lane
+            self._admit(ticket)
+        self._update_positions()
+        self._cond.notify_all()
+
+    def _remove(self, ticket: Ticket):
+        lane = self._lanes.get(ticket.owner)
+        if lane is not None and ticket in lane:
+            lane.remove(ticket)
+            if not lane:
+                del self._lanes[ticket.owner]
+        self._admit_waiting()
+
+    def _reject(self, wait: float) -> Rejected:
+        self.rejected += 1
+        return Rejected(f"Error: Server busy (estimated wait {wait:.0f}s). Please try again shortly.")
+
+    def _update_positions(self):
+        # Replay the round robin to find the order tickets will be admitted in
+        lanes = [list(lane) for lane in self._lanes.values()]
+        position = 0
+        for depth in range(max(map(len, lanes), default=0)):
+            for lane in lanes:
+                if depth < len(lane):
+                    position += 1
+                    ticket = lane[depth]
+                    ticket.position = position
+                    if self.service_time is not None:
+                        ticket.eta = -(-position // self.max_concurrent) * self.service_time
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per minute with bursts of ``burst``.
+
+    Not thread-safe; keep one per Streamlit session.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: int = 3):
+        self.rate = rate / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        """Take one token if available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
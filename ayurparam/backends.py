@@ -0,0 +1,182 @@
+"""Least-loaded routing across several Ollama servers with health probes."""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional, TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+# Weight of the newest sample in the latency moving average.
+LATENCY_ALPHA = 0.2
+
+
+def base_url(url: str) -> str:
+    """Return ``scheme://host:port`` for an Ollama endpoint URL."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class Backend:
+    """Load and health state of one Ollama endpoint."""
+
+    __slots__ = ('url', 'outstanding', 'healthy', 'latency', 'probe_latency', 'requests', 'failures', 'last_error', 'last_used', 'last_probe')
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.latency = None
+        self.probe_latency = None
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_used = time.time()
+        self.last_probe = None
+
+    @property
+    def base_url(self) -> str:
+        return base_url(self.url)
+
+
+class Lease:
+    """One request routed to ``backend``; call ``fail`` if it did not succeed."""
+
+    __slots__ = ('backend', 'url', 'ok', 'error')
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.url = backend.url
+        self.ok = True
+        self.error = None
+
+    def fail(self, error: str):
+        self.ok = False
+        self.error = error
+
+
+class BackendRegistry:
+    """Process-wide set of Ollama backends, keyed by URL.
+
+    ``lease(urls)`` routes a request to whichever of ``urls`` has the fewest
+    outstanding requests (ties go to the lower average latency), skipping
+    backends whose last ``/api/tags`` probe failed. A daemon thread probes
+    every backend used within ``idle_after`` seconds every
+    ``health_interval`` seconds; new backends and backends whose request
+    just failed are probed straight away.
+    """
+
+    def __init__(self, session: requests.Session, health_interval: float = 15.0, probe_timeout: float = 5.0, idle_after: float = 3600.0):
+        self.session = session
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self.idle_after = idle_after
+        self._backends = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._probe_loop, name="ayurparam-health", daemon=True)
+        self._thread.start()
+
+    def get(self, url: str) -> Backend:
+        """Return the backend for ``url``, registering it on first use."""
+        with self._lock:
+            backend = self._backends.get(url)
+            if backend is not None:
+                return backend
+            backend = self._backends[url] = Backend(url)
+        self.probe_soon(backend)
+        return backend
+
+    def pick(self, urls: Iterable[str]) -> Backend:
+        """Return the least-loaded healthy backend among ``urls``.
+
+        When every candidate is unhealthy all of them are considered, so a
+        request still gets a chance (and a real error) instead of nothing.
+        """
+        candidates = [self.get(url) for url in urls]
+        if not candidates:
+            raise ValueError("no Ollama backend configured")
+        with self._lock:
+            healthy = [b for b in candidates if b.healthy] or candidates
+            return min(healthy, key=lambda b: (b.outstanding, b.latency if b.latency is not None else 0.0))
+
+    @contextmanager
+    def lease(self, urls: Iterable[str]):
+        """Route one request; yields a ``Lease`` whose ``url`` should be called."""
+        backend = self.pick(urls)
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+            backend.last_used = time.time()
+        lease = Lease(backend)
+        start = time.perf_counter()
+        try:
+            yield lease
+        except Exception as e:
+            lease.fail(str(e))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                backend.outstanding -= 1
+                if lease.ok:
+                    backend.latency = elapsed if backend.latency is None else (1 - LATENCY_ALPHA) * backend.latency + LATENCY_ALPHA * elapsed
+                else:
+                    backend.failures += 1
+                    backend.last_error = lease.error
+            if not lease.ok:
+                self.probe_soon(backend)
+
+    def probe(self, backend: Backend) -> bool:
+        """Check ``backend`` with ``GET /api/tags`` and update its health."""
+        start = time.perf_counter()
+        try:
+            response = self.session.get(urljoin(backend.base_url, "/api/tags"), timeout=self.probe_timeout)
+            response.raise_for_status()
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+        with self._lock:
+            backend.healthy = healthy
+            backend.probe_latency = time.perf_counter() - start
+            backend.last_probe = time.time()
+            if error:
+                backend.last_error = error
+        return healthy
+
+    def probe_soon(self, backend: Backend):
+        """Probe ``backend`` on a short-lived thread, without waiting for the next cycle."""
+        threading.Thread(target=self.probe, args=(backend,), name="ayurparam-probe", daemon=True).start()
+
+    def snapshot(self, urls: Optional[Iterable[str]] = None) -> list:
+        """Return a list of per-backend stats dicts, for display."""
+        with self._lock:
+            backends = list(self._backends.values()) if urls is None else [self._backends[u] for u in urls if u in self._backends]
+            return [
+                {
+                    "url": b.url,
+                    "healthy": b.healthy,
+                    "outstanding": b.outstanding,
+                    "latency": b.latency,
+                    "probe_latency": b.probe_latency,
+                    "requests": b.requests,
+                    "failures": b.failures,
+                    "last_error": b.last_error,
+                }
+                for b in backends
+            ]
+
+    def close(self):
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.health_interval):
+            now = time.time()
+            with self._lock:
+                active = [b for b in self._backends.values() if now - b.last_used <= self.idle_after]
+            for backend in active:
+                self.probe(backend)
@@ -0,0 +1,154 @@
+"""Bulk answering of uploaded question files with bounded concurrency."""
+
+import csv
+import io
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, Optional, Tuple
+
+QUESTION_FIELDS = ("question", "prompt", "query")
+
+
+def _pick_question(record) -> Tuple[Optional[str], Optional[str]]:
+    """Return ``(id, question)`` from a parsed JSONL value or CSV row."""
+    if isinstance(record, str):
+        return None, record
+    if isinstance(record, dict):
+        record_id = record.get("id")
+        for field in QUESTION_FIELDS:
+            if record.get(field):
+                return (str(record_id) if record_id is not None else None), str(record[field])
+    return None, None
+
+
+def iter_questions(fileobj, filename: str) -> Iterator[Tuple[int, Optional[str], str]]:
+    """Yield ``(index, id, question)`` from a CSV or JSONL upload, one row at a time.
+
+    CSV files need a ``question`` (or ``prompt``/``query``) column, otherwise
+    the first column is used. JSONL lines may be objects with one of those
+    keys or plain strings. Blank rows are skipped.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        if filename.lower().endswith(".csv"):
+            reader = csv.reader(text)
+            header = next(reader, None)
+            if header is None:
+                return
+            names = [name.strip().lower() for name in header]
+            column = next((names.index(f) for f in QUESTION_FIELDS if f in names), None)
+            id_column = names.index("id") if "id" in names else None
+            if column is None:
+                # No recognised header: treat the first row as data.
+                column = 0
+                rows = _chain_first(header, reader)
+            else:
+                rows = reader
+            for index, row in enumerate(rows):
+                if column < len(row) and row[column].strip():
+                    record_id = row[id_column] if id_column is not None and id_column < len(row) else None
+                    yield index, record_id, row[column].strip()
+        else:
+            for index, line in enumerate(text):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = line
+                record_id, question = _pick_question(record)
+                if question and question.strip():
+                    yield index, record_id, question.strip()
+    finally:
+        text.detach()
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+def count_questions(fileobj, filename: str) -> int:
+    """Count the questions in an upload without keeping them, then rewind it."""
+    total = sum(1 for _ in iter_questions(fileobj, filename))
+    fileobj.seek(0)
+    return total
+
+
+def run_batch(
+    questions: Iterator[Tuple[int, Optional[str], str]],
+    answer: Callable[[str], str],
+    out,
+    concurrency: int = 4,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    stop: Optional[threading.Event] = None,
+) -> Tuple[int, int]:
+    """Answer ``questions`` on a thread pool and write JSONL records to ``out``.
+
+    At most ``concurrency`` requests run at once and only ``2 * concurrency``
+    questions are read ahead, so memory stays flat however large the input
+    is. Records are written as soon as each answer finishes (completion
+    order, with the input ``index``). ``answer`` returns the answer text or
+    a string starting with ``"Error:"``. ``on_progress(done, errors)`` is
+    called from the calling thread after every record.
+
+    If the calling thread is interrupted (including by Streamlit stopping or
+    rerunning the script), queued questions are dropped and ``stop`` is set
+    so ``answer`` calls already running can give up early.
+
+    Returns ``(done, errors)``.
+    """
+    done = errors = 0
+
+    def timed_answer(question):
+        start = time.perf_counter()
+        result = answer(question)
+        return result, time.perf_counter() - start
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ayurparam-batch")
+    try:
+        pending = {}
+        questions = iter(questions)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * concurrency:
+                item = next(questions, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending[pool.submit(timed_answer, item[2])] = item
+
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, record_id, question = pending.pop(future)
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    result, latency = f"Error: {str(e)}", None
+                failed = result.startswith("Error:")
+                record = {
+                    "index": index,
+                    "id": record_id,
+                    "question": question,
+                    "answer": None if failed else result,
+                    "error": result if failed else None,
+                    "latency_s": round(latency, 3) if latency is not None else None,
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                done += 1
+                errors += failed
+                if on_progress is not None:
+                    on_progress(done, errors)
+    except BaseException:
+        if stop is not None:
+            stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return done, errors
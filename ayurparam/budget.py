@@ -0,0 +1,244 @@
+"""Token budgeting: fit each request into the model's context window.
+
+Before a generation is sent, its prompt (plus any conversation context) is
+counted and ``num_ctx``/``num_predict`` are chosen so prompt and answer fit
+instead of Ollama silently truncating the prompt. Token counts come from a
+per-model characters-per-token ratio calibrated against the counts Ollama
+reports for every answer, so no tokenizer has to be shipped. Every decision
+and its outcome (tokens generated, whether the answer hit the limit) can be
+appended to a JSONL log to measure how many reserved tokens go unused.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urljoin
+
+if TYPE_CHECKING:
+    import requests
+
+# Starting ratio until a model's answers have been seen; the same rule of
+# thumb as ``conversation.estimate_tokens``
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Weight of each new observation in the calibrated ratio
+CALIBRATION_WEIGHT = 0.2
+
+# Share of the requested output length each kind of question gets
+OUTPUT_SHARE = {"brief": 0.5, "list": 0.75, "detailed": 1.0}
+
+_DETAILED_RE = re.compile(
+    r"\b(explain|describe|discuss|elaborate|compare|comparison|difference|differences|pathogenesis|samprapti|"
+    r"treat|treatment|treatments|chikitsa|management|manage|procedure|protocol|how|why|detail|detailed)\b",
+    re.IGNORECASE,
+)
+_LIST_RE = re.compile(r"\b(list|types|kinds|examples|enumerate|name the|name some|what are the|which are the)\b", re.IGNORECASE)
+_BRIEF_RE = re.compile(r"^\s*(what is|what's|what does|who|when|where|define|definition|meaning|is|are|does|can)\b", re.IGNORECASE)
+
+# How long a failed /api/show lookup is remembered before it is tried again
+SHOW_RETRY_AFTER = 300.0
+
+
+def classify_question(question: str) -> str:
+    """Return ``"brief"``, ``"list"`` or ``"detailed"`` for a question."""
+    if _DETAILED_RE.search(question):
+        return "detailed"
+    if _LIST_RE.search(question):
+        return "list"
+    if _BRIEF_RE.search(question) and len(question) < 200:
+        return "brief"
+    return "detailed"
+
+
+class Decision:
+    """The sizes chosen for one request, and later its outcome."""
+
+    __slots__ = ('model', 'kind', 'prompt_tokens', 'context_tokens', 'requested', 'num_predict', 'num_ctx', 'grown', 'fits')
+
+    def __init__(self, model: str, kind: str, prompt_tokens: int, context_tokens: int, requested: int, num_predict: int, num_ctx: int, grown: bool, fits: bool):
+        self.model = model
+        self.kind = kind
+        self.prompt_tokens = prompt_tokens
+        self.context_tokens = context_tokens
+        self.requested = requested
+        self.num_predict = num_predict
+        self.num_ctx = num_ctx
+        self.grown = grown
+        self.fits = fits
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TokenBudget:
+    """Choose ``num_ctx`` and ``num_predict`` for each request.
+
+    Requests are sent with ``num_ctx`` (or the model's own ``num_ctx``
+    parameter, if its Modelfile sets one) so the loaded model is not
+    reloaded with a different context size between requests. Only a prompt
+    that would not fit makes it double, up to ``max_num_ctx`` and the
+    model's trained context length. When ``adaptive`` is set the output
+    budget is the requested length scaled by the kind of question (see
+    ``OUTPUT_SHARE``), never below ``min_output``; it is cut further if the
+    context window would otherwise overflow. A prompt that leaves less than
+    ``min_output`` tokens even in the largest window is refused.
+    """
+
+    def __init__(self, session: requests.Session, num_ctx: int = 4096, max_num_ctx: int = 16384, adaptive: bool = True, min_output: int = 128, margin: int = 32, log_path: Optional[str] = None, log_max_bytes: int = 16 * 1024 * 1024):
+        self.session = session
+        self.num_ctx = num_ctx
+        self.max_num_ctx = max(max_num_ctx, num_ctx)
+        self.adaptive = adaptive
+        self.min_output = min_output
+        self.margin = margin
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.requests = 0
+        self.reserved = 0
+        self.generated = 0
+        self.truncated = 0
+        self.grown = 0
+        self.refused = 0
+        self._ratios = {}
+        self._shows = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def count(self, model: str, text: str) -> int:
+        """Estimate the tokens ``text`` takes for ``model``."""
+        with self._lock:
+            ratio = self._ratios.get(model, DEFAULT_CHARS_PER_TOKEN)
+        return int(len(text) / ratio) + 1
+
+    def model_limits(self, base_url: str, model: str) -> tuple:
+        """Return ``(num_ctx, context_length)`` from ``/api/show``; either may be ``None``."""
+        key = (base_url, model)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._shows.get(key)
+        if cached is not None and (cached[2] is None or now - cached[2] < SHOW_RETRY_AFTER):
+            return cached[:2]
+        limits = (None, None)
+        failed_at = None
+        try:
+            response = self.session.post(urljoin(base_url, "/api/show"), json={"model": model, "name": model}, timeout=10)
+            response.raise_for_status()
+            info = response.json()
+            limits = (_parameter(info.get("parameters", ""), "num_ctx"), _context_length(info.get("model_info") or {}))
+        except Exception:
+            failed_at = now
+        with self._lock:
+            self._shows[key] = (*limits, failed_at)
+        return limits
+
+    def base_ctx(self, base_url: str, model: str) -> int:
+        """The ``num_ctx`` the model is loaded with on ``base_url``."""
+        configured, trained = self.model_limits(base_url, model)
+        base = configured or self.num_ctx
+        return min(base, trained) if trained else base
+
+    def plan(self, model: str, base_url: str, prompt: str, requested: int, question: str = "", context: Optional[list] = None) -> Decision:
+        """Size one request; ``question`` is the user's text, used to pick an output budget."""
+        prompt_tokens = self.count(model, prompt)
+        context_tokens = len(context) if context else 0
+        used = prompt_tokens + context_tokens + self.margin
+
+        kind = classify_question(question) if question else "detailed"
+        want = requested
+        if self.adaptive:
+            want = min(requested, max(self.min_output, round(requested * OUTPUT_SHARE[kind])))
+        floor = min(want, self.min_output)
+
+        num_ctx = base = self.base_ctx(base_url, model)
+        _, trained = self.model_limits(base_url, model)
+        largest = min(self.max_num_ctx, trained) if trained else self.max_num_ctx
+        # Double the window only when the prompt leaves too little room
+        while used + floor > num_ctx and num_ctx * 2 <= largest:
+            num_ctx *= 2
+        fits = used + floor <= num_ctx
+        num_predict = max(min(want, num_ctx - used), 0) if fits else 0
+
+        decision = Decision(model, kind, prompt_tokens, context_tokens, requested, num_predict, num_ctx, num_ctx > base, fits)
+        with self._lock:
+            self.requests += 1
+            self.grown += decision.grown
+            self.refused += not fits
+        if not fits:
+            self._log(decision, {"outcome": "refused"})
+        return decision
+
+    def record(self, decision: Decision, meta: dict, text: str, cancelled: bool = False):
+        """Record how a planned request went and calibrate the model's token ratio.
+
+        ``meta`` holds Ollama's final response fields and ``text`` the raw
+        answer they describe.
+        """
+        eval_count = meta.get("eval_count")
+        truncated = meta.get("done_reason") == "length"
+        with self._lock:
+            if eval_count and not cancelled:
+                self.reserved += decision.num_predict
+                self.generated += eval_count
+                self.truncated += truncated
+                if len(text) >= 64:
+                    ratio = len(text) / eval_count
+                    old = self._ratios.get(decision.model, DEFAULT_CHARS_PER_TOKEN)
+                    self._ratios[decision.model] = min(max(old + CALIBRATION_WEIGHT * (ratio - old), 1.0), 8.0)
+            chars_per_token = self._ratios.get(decision.model, DEFAULT_CHARS_PER_TOKEN)
+        outcome = {
+            "outcome": "cancelled" if cancelled else ("truncated" if truncated else "complete"),
+            "prompt_eval_count": meta.get("prompt_eval_count"),
+            "eval_count": eval_count,
+            "unused": decision.num_predict - eval_count if eval_count is not None else None,
+            "chars_per_token": round(chars_per_token, 3),
+        }
+        self._log(decision, outcome)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "reserved": self.reserved,
+                "generated": self.generated,
+                "used_share": self.generated / self.reserved if self.reserved else None,
+                "truncated": self.truncated,
+                "grown": self.grown,
+                "refused": self.refused,
+                "chars_per_token": dict(self._ratios),
+            }
+
+    def _log(self, decision: Decision, outcome: dict):
+        if not self.log_path:
+            return
+        line = json.dumps({"time": round(time.time(), 3), **decision.as_dict(), **outcome}) + "\n"
+        with self._log_lock:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.log_max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+
+def _parameter(parameters: str, name: str) -> Optional[int]:
+    """Read an integer parameter from ``/api/show``'s Modelfile parameter text."""
+    for line in parameters.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == name and parts[1].isdigit():
+            return int(parts[1])
+    return None
+
+
+def _context_length(model_info: dict) -> Optional[int]:
+    """Read the trained context length (``<architecture>.context_length``) from ``model_info``."""
+    for key, value in model_info.items():
+        if key.endswith(".context_length") and isinstance(value, int):
+            return value
+    return None
@@ -0,0 +1,158 @@
+"""Two-tier response cache: an in-memory LRU in front of an SQLite file."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def make_key(model_name: str, prompt: str, num_predict: int, temperature: float, top_p: float, top_k: int, context: Optional[list] = None) -> str:
+    """Return the cache key for a generation request.
+
+    ``context`` is the token context of an ongoing conversation, if any.
+    """
+    fields = [model_name, prompt, num_predict, temperature, top_p, top_k]
+    if context:
+        fields.append(context)
+    raw = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU + SQLite cache of generated answers.
+
+    Entries older than ``ttl`` seconds are treated as misses and removed. The
+    disk tier is trimmed, least recently used first, whenever the stored text
+    exceeds ``max_disk_bytes``.
+    """
+
+    def __init__(self, path: str, max_memory_items: int = 256, max_disk_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for ``key`` or ``None``."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+            row = self._db.execute("SELECT response, created, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created, size = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self._disk_bytes -= size
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, response, created)
+            self.disk_hits += 1
+            return response
+
+    def age(self, key: str) -> Optional[float]:
+        """Return how many seconds ago ``key`` was stored, or ``None`` if it is missing or expired.
+
+        Unlike ``get`` this neither counts as a hit or miss nor refreshes recency.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created = entry[1]
+            else:
+                row = self._db.execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                created = row[0]
+        age = time.time() - created
+        return age if age <= self.ttl else None
+
+    def put(self, key: str, response: str):
+        """Store ``response`` under ``key`` in both tiers."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._remember(key, response, now)
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, size),
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict_disk()
+            self._db.commit()
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current tier sizes."""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        # Expired rows go first, then the least recently used ones.
+        self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._disk_bytes -= size
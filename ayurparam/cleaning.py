@@ -0,0 +1,55 @@
+"""Removal of stray Unicode escape annotations such as ``(\\u0c05)`` from answers."""
+
+import re
+
+_ESCAPE_RE = re.compile(r'\s*\([\\u0-9a-fA-F]+\)')
+_ESCAPE_CHARS = frozenset('\\u0123456789abcdefABCDEF')
+
+
+def clean_response(text: str) -> str:
+    """Clean unwanted Unicode escape sequences from the response."""
+    return _ESCAPE_RE.sub('', text)
+
+
+def _unfinished_start(text: str) -> int:
+    """Return where the suffix of ``text`` that could still grow into a match begins.
+
+    That is an unclosed ``(`` followed only by escape characters, plus any
+    whitespace in front of it, or just trailing whitespace, which may be
+    followed by a ``(`` in the next chunk.
+    """
+    end = len(text)
+    i = end
+    while i > 0 and text[i - 1] in _ESCAPE_CHARS:
+        i -= 1
+    start = i - 1 if i > 0 and text[i - 1] == '(' else end
+    while start > 0 and text[start - 1].isspace():
+        start -= 1
+    return start
+
+
+class StreamCleaner:
+    """Incremental ``clean_response`` for streamed text.
+
+    Each ``feed`` returns the cleaned text that is final so far and holds back
+    only the unfinished suffix, so work per chunk is proportional to the chunk
+    size. Concatenating every ``feed`` result and ``flush`` gives exactly
+    ``clean_response`` of the whole text.
+    """
+
+    __slots__ = ('_pending',)
+
+    def __init__(self):
+        self._pending = ''
+
+    def feed(self, chunk: str) -> str:
+        """Add ``chunk`` and return the newly finalised cleaned text."""
+        text = self._pending + chunk
+        cut = _unfinished_start(text)
+        self._pending = text[cut:]
+        return _ESCAPE_RE.sub('', text[:cut])
+
+    def flush(self) -> str:
+        """Return whatever is still held back, cleaned."""
+        text, self._pending = self._pending, ''
+        return _ESCAPE_RE.sub('', text)
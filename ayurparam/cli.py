@@ -0,0 +1,165 @@
+"""Command-line access to the answering pipeline.
+
+Ask one question and stream the answer to stdout:
+
+    python -m ayurparam.cli "What balances Pitta?" --ollama http://localhost:11434
+
+Pass ``-`` to read the question from stdin. Answer a JSONL or CSV file (the
+format of the app's batch upload) and write one JSONL record per question
+to stdout, with progress on stderr:
+
+    python -m ayurparam.cli --batch questions.jsonl --concurrency 8 > answers.jsonl
+"""
+
+import argparse
+import os
+import sys
+
+from ayurparam.pipeline import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_K,
+    DEFAULT_TOP_P,
+    FOLLOW_HEARTBEAT,
+    answer_question,
+    create_session,
+    format_prompt,
+    parse_urls,
+    start_generation,
+)
+from ayurparam.settings import (
+    ADAPTIVE_OUTPUT,
+    BATCH_MAX_CONCURRENCY,
+    BUDGET_LOG,
+    CACHE_MAX_MB,
+    CACHE_MEMORY_ITEMS,
+    CACHE_PATH,
+    CACHE_TTL_HOURS,
+    FAQ_DB,
+    FAQ_FILE,
+    FAQ_MIN_OVERLAP,
+    HEDGE,
+    HEDGE_MAX_RATE,
+    HEDGE_PERCENTILE,
+    MAX_NUM_CTX,
+    NUM_CTX,
+    OLLAMA_URLS,
+)
+
+
+def ask(question: str, ollama_urls: tuple, args, session, registry, flights, budget, hedger, faq) -> int:
+    """Stream one answer to stdout; return the exit status."""
+    from ayurparam.cleaning import StreamCleaner
+
+    match = faq.lookup(question) if faq is not None else None
+    if match is not None:
+        print(match.answer)
+        print(f"(from the answer bank: {match.question})", file=sys.stderr)
+        return 0
+    flight = start_generation(format_prompt(question), ollama_urls, args.model, args.max_tokens, args.temperature, args.top_p, args.top_k, flights, session, registry, budget=budget, hedger=hedger)
+    cleaner = StreamCleaner()
+    try:
+        for chunk in flight.follow(heartbeat=FOLLOW_HEARTBEAT):
+            sys.stdout.write(cleaner.feed(chunk))
+            sys.stdout.flush()
+    finally:
+        flights.leave(flight)
+    if flight.error:
+        print(flight.error, file=sys.stderr)
+        return 1
+    sys.stdout.write(cleaner.flush() + "\n")
+    return 0
+
+
+def batch(path: str, ollama_urls: tuple, args, session, registry, flights, budget, hedger, faq) -> int:
+    """Answer every question in ``path``, writing JSONL to stdout; return the exit status."""
+    from functools import partial
+
+    from ayurparam.batch import iter_questions, run_batch
+
+    cache = None
+    if not args.no_cache:
+        from ayurparam.cache import ResponseCache
+
+        cache = ResponseCache(CACHE_PATH, max_memory_items=CACHE_MEMORY_ITEMS, max_disk_bytes=int(CACHE_MAX_MB * 1024 * 1024), ttl=CACHE_TTL_HOURS * 3600)
+    answer = partial(
+        answer_question,
+        ollama_urls=ollama_urls,
+        model_name=args.model,
+        max_tokens=args.max_tokens,
+        temperature=args.temperature,
+        top_p=args.top_p,
+        top_k=args.top_k,
+        cache=cache,
+        use_cache=cache is not None and args.temperature == 0,
+        flights=flights,
+        session=session,
+        registry=registry,
+        budget=budget,
+        hedger=hedger,
+        faq=faq,
+    )
+
+    def progress(done, errors):
+        print(f"\r{done} answered, {errors} errors", end="", file=sys.stderr, flush=True)
+
+    with open(path, "rb") as f:
+        done, errors = run_batch(iter_questions(f, path), answer, sys.stdout, min(args.concurrency, BATCH_MAX_CONCURRENCY), on_progress=progress)
+    print(file=sys.stderr)
+    return 1 if errors else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("question", nargs="?", help="question to answer, or - to read it from stdin")
+    parser.add_argument("--batch", metavar="FILE", help="JSONL or CSV file of questions")
+    parser.add_argument("--concurrency", type=int, default=4, help="batch requests in flight at once")
+    parser.add_argument("--ollama", default=OLLAMA_URLS, help="Ollama URL(s), comma-separated")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--top-p", type=float, default=DEFAULT_TOP_P)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the response cache in batch mode")
+    parser.add_argument("--no-faq", action="store_true", help="always ask the model, even when the answer bank has the question")
+    args = parser.parse_args(argv)
+
+    ollama_urls = parse_urls(args.ollama)
+    if not ollama_urls:
+        parser.error("pass --ollama or set AYURPARAM_OLLAMA_URL")
+    if (args.question is None) == (args.batch is None):
+        parser.error("pass either a question or --batch")
+
+    from ayurparam.backends import BackendRegistry
+    from ayurparam.budget import TokenBudget
+    from ayurparam.faq import LOAD_ERRORS, FaqBank
+    from ayurparam.hedging import Hedger
+    from ayurparam.singleflight import SingleFlight
+
+    session = create_session(pool_size=max(args.concurrency, 10))
+    registry = BackendRegistry(session)
+    flights = SingleFlight()
+    budget = TokenBudget(session, num_ctx=NUM_CTX, max_num_ctx=MAX_NUM_CTX, adaptive=ADAPTIVE_OUTPUT, log_path=BUDGET_LOG or None)
+    hedger = Hedger(percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE) if HEDGE else None
+    faq = None
+    if not args.no_faq and (FAQ_FILE or os.path.exists(FAQ_DB)):
+        faq = FaqBank(FAQ_DB, min_overlap=FAQ_MIN_OVERLAP)
+        if FAQ_FILE:
+            try:
+                faq.load_file(FAQ_FILE)
+            except LOAD_ERRORS as e:
+                print(f"Answer bank not loaded from {FAQ_FILE}: {e}", file=sys.stderr)
+    try:
+        if args.batch:
+            return batch(args.batch, ollama_urls, args, session, registry, flights, budget, hedger, faq)
+        question = sys.stdin.read() if args.question == "-" else args.question
+        return ask(question.strip(), ollama_urls, args, session, registry, flights, budget, hedger, faq)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
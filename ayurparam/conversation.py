@@ -0,0 +1,82 @@
+"""Multi-turn conversations that reuse Ollama's token context between turns."""
+
+from typing import List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class Turn:
+    """One question/answer exchange and the tokens it occupies in the context."""
+
+    __slots__ = ('question', 'answer', 'tokens')
+
+    def __init__(self, question: str, answer: str, tokens: int):
+        self.question = question
+        self.answer = answer
+        self.tokens = tokens
+
+
+class Conversation:
+    """Per-session chat history bounded by a token budget.
+
+    Follow-up questions are sent as just the new turn together with the
+    ``context`` array Ollama returned for the previous one, so the earlier
+    turns are not evaluated again. When the history plus the new question and
+    its output budget would exceed ``token_budget``, the oldest turns are
+    dropped and the remaining ones are sent once as plain text, which
+    yields a fresh, shorter context.
+    """
+
+    __slots__ = ('turns', 'context')
+
+    def __init__(self):
+        self.turns: List[Turn] = []
+        self.context: Optional[list] = None
+
+    def __len__(self):
+        return len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+    def clear(self):
+        self.turns = []
+        self.context = None
+
+    def prepare(self, question: str, format_prompt, max_tokens: int, token_budget: int) -> Tuple[str, Optional[list]]:
+        """Return ``(prompt, context)`` to send for ``question``.
+
+        ``format_prompt`` wraps a single question in the model's chat markers.
+        """
+        prompt = format_prompt(question)
+        needed = estimate_tokens(prompt) + max_tokens
+        if self.context is not None and self.tokens + needed <= token_budget:
+            return prompt, self.context
+
+        # Drop the oldest turns until the rest fits, then replay them as text.
+        while self.turns and self.tokens + needed > token_budget:
+            self.turns.pop(0)
+        self.context = None
+        history = "".join(f"{format_prompt(turn.question)} {turn.answer} " for turn in self.turns)
+        return history + prompt, None
+
+    def record(self, question: str, answer: str, prompt: str, meta: dict):
+        """Add a finished turn using the response fields Ollama returned.
+
+        ``prompt`` is what ``prepare`` returned; it contains the replayed
+        history whenever no context was reused.
+        """
+        context = meta.get("context")
+        if context:
+            # The new context holds every retained turn plus this one.
+            tokens = len(context) - self.tokens
+        else:
+            tokens = meta.get("prompt_eval_count", estimate_tokens(prompt)) + meta.get("eval_count", estimate_tokens(answer))
+            if self.context is None:
+                tokens -= self.tokens
+        self.turns.append(Turn(question, answer, max(tokens, 1)))
+        self.context = context or None
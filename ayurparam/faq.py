@@ -0,0 +1,290 @@
+"""A bank of vetted question/answer pairs, consulted before the model.
+
+``FaqBank`` keeps the pairs in one SQLite file with an FTS5 index of the
+questions. A lookup ranks the stored questions with BM25 and accepts the
+best one only when it shares most of its content words with the asked
+question, so "What are the properties of Ashwagandha?" is answered from
+the bank in milliseconds while "Can Ashwagandha be taken with milk?" still
+goes to the model. To load a JSONL or CSV file of pairs from the shell:
+
+    python -m ayurparam.faq faqs.jsonl --db .cache/faq.sqlite3
+
+JSONL lines are objects with ``question`` and ``answer`` (and optionally
+``source``); CSV files need ``question`` and ``answer`` columns.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import combinations
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from ayurparam.metrics import GenerationMetrics
+
+# Pairs inserted per statement while loading
+LOAD_BATCH = 1000
+
+# What a bad file or database raises while loading; the bank keeps its
+# previous answers
+LOAD_ERRORS = (OSError, sqlite3.Error, ValueError, csv.Error)
+
+# Questions with more content words than this are not looked up; they are
+# not the short lookups the bank is for
+MAX_QUESTION_WORDS = 12
+
+# Words that do not change what is being asked
+STOPWORDS = frozenset(
+    "a an the of in on at for to and or is are was were be been what which who whom whose when where does do did "
+    "can could should would will shall may might me my i we our you your it its this that these those there some any "
+    "tell about please give describe define definition meaning mean means with by from as according ayurveda ayurvedic".split()
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class FaqMatch(NamedTuple):
+    question: str
+    answer: str
+    source: Optional[str]
+    score: float
+    overlap: float
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_words(text: str) -> frozenset:
+    """The lower-cased, singular content words of ``text``."""
+    return frozenset(_stem(word) for word in _WORD_RE.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS)
+
+
+def question_key(question: str) -> str:
+    """Key under which a pair is stored; rewording only in case or punctuation keeps it."""
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+def iter_pairs(fileobj, filename: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Yield ``(question, answer, source)`` from a JSONL or CSV file, one row at a time.
+
+    Rows without a question or an answer are skipped.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        if filename.lower().endswith(".csv"):
+            for row in csv.DictReader(text):
+                row = {(name or "").strip().lower(): (value or "").strip() for name, value in row.items()}
+                if row.get("question") and row.get("answer"):
+                    yield row["question"], row["answer"], row.get("source") or None
+        else:
+            for line in text:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("question") and record.get("answer"):
+                    yield str(record["question"]).strip(), str(record["answer"]).strip(), record.get("source") or None
+    finally:
+        text.detach()
+
+
+class FaqBank:
+    """Vetted answers looked up by BM25 before a question reaches the model.
+
+    ``lookup`` returns the best BM25-ranked stored question among the top
+    ``candidates`` whose content words overlap the asked question's by at
+    least ``min_overlap`` (Jaccard), or ``None``. Only stored questions
+    containing enough of the asked words to reach that overlap are
+    searched, so the time taken does not grow with words that are common
+    in the bank. Lookups are counted and timed for ``stats`` and, when
+    given, ``metrics``.
+    """
+
+    def __init__(self, path: str, min_overlap: float = 0.8, candidates: int = 5, metrics: GenerationMetrics = None):
+        self.path = path
+        self.min_overlap = min_overlap
+        self.candidates = candidates
+        self.metrics = metrics
+        self.lookups = 0
+        self.hits = 0
+        self.last_load = None
+        self.last_error = None
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS faqs ("
+            " id INTEGER PRIMARY KEY,"
+            " key TEXT UNIQUE NOT NULL,"
+            " question TEXT NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " source TEXT);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS faqs_fts USING fts5("
+            " question, content='faqs', content_rowid='id', tokenize='porter unicode61');"
+            "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM faqs").fetchone()[0]
+
+    def lookup(self, question: str) -> Optional[FaqMatch]:
+        """Return the vetted answer to ``question``, or ``None`` if none matches confidently."""
+        start = time.perf_counter()
+        words = content_words(question)
+        match = None
+        if 0 < len(words) <= MAX_QUESTION_WORDS:
+            # A stored question at min_overlap or above shares at least this many words
+            need = max(math.ceil(self.min_overlap * len(words) - 1e-9), 1)
+            expression = " OR ".join(
+                "(" + " AND ".join(f'"{word}"' for word in group) + ")" for group in combinations(sorted(words), need)
+            )
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT faqs.question, faqs.answer, faqs.source, bm25(faqs_fts) FROM faqs_fts "
+                    "JOIN faqs ON faqs.id = faqs_fts.rowid WHERE faqs_fts MATCH ? ORDER BY bm25(faqs_fts) LIMIT ?",
+                    (expression, self.candidates),
+                ).fetchall()
+            for stored, answer, source, rank in rows:
+                stored_words = content_words(stored)
+                overlap = len(words & stored_words) / len(words | stored_words)
+                if overlap >= self.min_overlap:
+                    # FTS5's bm25() is negative, lower being better
+                    match = FaqMatch(stored, answer, source, -rank, overlap)
+                    break
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.lookups += 1
+            self.hits += match is not None
+            self._latencies.append(elapsed)
+        if self.metrics is not None:
+            self.metrics.observe_faq(match is not None, elapsed)
+        return match
+
+    def load(self, pairs: Iterable[Tuple[str, str, Optional[str]]], replace: bool = False) -> dict:
+        """Add ``(question, answer, source)`` pairs, replacing stored answers to the same question.
+
+        Pairs are streamed in batches of ``LOAD_BATCH`` through a connection
+        of their own inside one transaction, so memory use does not depend
+        on the size of the input and lookups keep seeing the previous
+        answers until the load commits. The search index is rebuilt once at
+        the end. With ``replace`` the bank holds only the loaded pairs
+        afterwards.
+        """
+        start = time.perf_counter()
+        loaded = 0
+        with self._load_lock:
+            db = sqlite3.connect(self.path)
+            try:
+                db.execute("PRAGMA synchronous=NORMAL")
+                with db:
+                    if replace:
+                        db.execute("DELETE FROM faqs")
+                    batch = []
+                    for question, answer, source in pairs:
+                        batch.append((question_key(question), question, answer, source))
+                        if len(batch) == LOAD_BATCH:
+                            loaded += self._insert(db, batch)
+                            batch = []
+                    if batch:
+                        loaded += self._insert(db, batch)
+                    db.execute("INSERT INTO faqs_fts (faqs_fts) VALUES ('rebuild')")
+                entries = db.execute("SELECT COUNT(*) FROM faqs").fetchone()[0]
+            finally:
+                db.close()
+        result = {"loaded": loaded, "entries": entries, "seconds": time.perf_counter() - start}
+        self.last_load = result
+        return result
+
+    def load_file(self, path: str, replace: bool = True) -> Optional[dict]:
+        """Load a JSONL or CSV file unless it is unchanged since it was last loaded."""
+        stat = os.stat(path)
+        signature = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime}"
+        with self._lock:
+            row = self._db.execute("SELECT value FROM settings WHERE name = 'source'").fetchone()
+        if row is not None and row[0] == signature:
+            return None
+        with open(path, "rb") as f:
+            result = self.load(iter_pairs(f, path), replace=replace)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('source', ?)", (signature,))
+            self._db.commit()
+        return result
+
+    def start_load(self, path: str):
+        """Run ``load_file`` on a daemon thread; a failure is kept in ``last_error``."""
+        def run():
+            try:
+                self.load_file(path)
+                self.last_error = None
+            except LOAD_ERRORS as e:
+                self.last_error = str(e)
+
+        threading.Thread(target=run, name="ayurparam-faq-load", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM faqs").fetchone()[0]
+            latencies = sorted(self._latencies)
+            stats = {
+                "entries": entries,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "last_load": self.last_load,
+                "last_error": self.last_error,
+            }
+        stats["p50_ms"] = latencies[len(latencies) // 2] * 1000 if latencies else None
+        stats["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else None
+        return stats
+
+    @staticmethod
+    def _insert(db: sqlite3.Connection, batch: list) -> int:
+        db.executemany(
+            "INSERT INTO faqs (key, question, answer, source) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET question = excluded.question, answer = excluded.answer, source = excluded.source",
+            batch,
+        )
+        return len(batch)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load vetted question/answer pairs into the answer bank.")
+    parser.add_argument("file", help="JSONL or CSV file of question/answer pairs")
+    parser.add_argument("--db", default=os.path.join(".cache", "faq.sqlite3"), help="answer bank database")
+    parser.add_argument("--append", action="store_true", help="keep pairs that are not in the file")
+    args = parser.parse_args()
+
+    bank = FaqBank(args.db)
+    with open(args.file, "rb") as f:
+        result = bank.load(iter_pairs(f, args.file), replace=not args.append)
+    print(f"{result['loaded']} pairs loaded in {result['seconds']:.1f}s ({result['loaded'] / max(result['seconds'], 1e-9):.0f}/s); "
+          f"the bank now has {result['entries']} answers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Hedged requests: when to race a second backend, and how often it helped."""
+
+import threading
+from collections import deque
+from typing import Dict
+
+
+class Hedger:
+    """Policy and counters for hedging generations across backends.
+
+    A request whose first token has not arrived after ``delay(model)``
+    seconds is sent to a second backend as well; whichever streams first is
+    kept and the other is cancelled. The delay is the ``percentile`` of the
+    model's last ``window`` times to first token on the first backend tried,
+    counted up to the moment a hedge beat it (``initial_delay`` until
+    ``min_samples`` have been seen), and never below ``min_delay``. At
+    most ``max_rate`` of requests are hedged, which bounds the extra GPU
+    work.
+    """
+
+    def __init__(self, percentile: float = 95.0, max_rate: float = 0.1, min_delay: float = 0.25, initial_delay: float = 2.0, window: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self._ttfts: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, model: str) -> float:
+        """Seconds to wait for a first token before hedging a request for ``model``."""
+        with self._lock:
+            samples = self._ttfts.get(model)
+            if samples is None or len(samples) < self.min_samples:
+                return max(self.initial_delay, self.min_delay)
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(ordered[index], self.min_delay)
+
+    def observe(self, model: str, ttft: float):
+        """Record a first backend's time to first token, or its wait when a hedge streamed first."""
+        with self._lock:
+            samples = self._ttfts.get(model)
+            if samples is None:
+                samples = self._ttfts[model] = deque(maxlen=self.window)
+            samples.append(ttft)
+
+    def allow(self) -> bool:
+        """Whether hedging one more request stays within ``max_rate``."""
+        with self._lock:
+            return self.hedged < self.max_rate * max(self.requests, 1)
+
+    def record(self, hedged: bool, won: bool):
+        """Count one finished request; ``won`` means the hedge streamed first."""
+        with self._lock:
+            self.requests += 1
+            self.hedged += hedged
+            self.wins += won
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = list(self._ttfts)
+            stats = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "wins": self.wins,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "win_rate": self.wins / self.hedged if self.hedged else 0.0,
+            }
+        stats["delays"] = {model: self.delay(model) for model in models}
+        return stats
@@ -0,0 +1,263 @@
+"""Bounded per-session answer history with idle-session eviction to disk."""
+
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# zlib level for older entries: close to the best ratio at a fraction of level 9's cost
+COMPRESS_LEVEL = 6
+
+
+class HistoryEntry:
+    """One answered question.
+
+    The answer and its sources are held as plain text while the entry is
+    among the newest of its session, and as one zlib-compressed JSON blob
+    once it is not, since older entries are rarely displayed.
+    """
+
+    __slots__ = ('question', 'created', 'captions', '_data')
+
+    def __init__(self, question: str, answer: str, captions: Sequence[str] = (), sources: Sequence[Tuple[str, str]] = (), created: Optional[float] = None):
+        self.question = question
+        self.created = time.time() if created is None else created
+        self.captions = tuple(captions)
+        self._data = (answer, tuple((title, text) for title, text in sources))
+
+    @property
+    def compressed(self) -> bool:
+        return isinstance(self._data, bytes)
+
+    @property
+    def answer(self) -> str:
+        return self._unpack()[0]
+
+    @property
+    def sources(self) -> List[Tuple[str, str]]:
+        """``(title, text)`` of the passages the answer was grounded in."""
+        return [tuple(source) for source in self._unpack()[1]]
+
+    def compress(self):
+        if not self.compressed:
+            self._data = zlib.compress(json.dumps(self._data).encode("utf-8"), COMPRESS_LEVEL)
+
+    def size(self) -> int:
+        """Approximate bytes held by this entry."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.question) + sys.getsizeof(self.captions)
+        size += sum(sys.getsizeof(caption) for caption in self.captions)
+        if self.compressed:
+            return size + sys.getsizeof(self._data)
+        answer, sources = self._data
+        size += sys.getsizeof(self._data) + sys.getsizeof(answer) + sys.getsizeof(sources)
+        return size + sum(sys.getsizeof(title) + sys.getsizeof(text) for title, text in sources)
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a JSON header line followed by the compressed payload."""
+        self.compress()
+        header = {"question": self.question, "created": self.created, "captions": self.captions, "size": len(self._data)}
+        return json.dumps(header).encode("utf-8") + b"\n" + self._data
+
+    @classmethod
+    def read_from(cls, f) -> Optional["HistoryEntry"]:
+        """Read one entry written by ``to_bytes``, or ``None`` at end of file."""
+        line = f.readline()
+        if not line:
+            return None
+        header = json.loads(line)
+        entry = cls(header["question"], "", header["captions"], created=header["created"])
+        entry._data = f.read(header["size"])
+        return entry
+
+    def _unpack(self):
+        if self.compressed:
+            return json.loads(zlib.decompress(self._data))
+        return self._data
+
+
+class SessionHistory:
+    """Ring buffer of one session's newest entries."""
+
+    __slots__ = ('entries', 'last_seen', 'size')
+
+    def __init__(self, max_entries: int):
+        self.entries = deque(maxlen=max_entries)
+        self.last_seen = time.monotonic()
+        # Approximate bytes held, kept up to date as entries come and go
+        self.size = sys.getsizeof(self) + sys.getsizeof(self.entries)
+
+    def append(self, entry: HistoryEntry, hot_entries: int):
+        if len(self.entries) == self.entries.maxlen:
+            self.size -= self.entries[0].size()
+        self.entries.append(entry)
+        self.size += entry.size()
+        # Compress whatever just dropped out of the newest few
+        if len(self.entries) > hot_entries:
+            older = self.entries[-hot_entries - 1]
+            if not older.compressed:
+                self.size -= older.size()
+                older.compress()
+                self.size += older.size()
+
+
+class HistoryStore:
+    """Answer history of every session in the process.
+
+    Each session keeps at most ``max_entries`` answers; the newest
+    ``hot_entries`` stay uncompressed. Sessions not seen for ``idle_ttl``
+    seconds are written to ``path`` as one compressed file each and dropped
+    from memory; they are read back if the session returns. Evicted files
+    older than ``retention`` seconds are deleted. Without ``path`` idle
+    sessions are simply dropped.
+
+    Idle sessions are swept at most every ``sweep_interval`` seconds, from
+    ``touch``, so no background thread is needed.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 20, hot_entries: int = 1, idle_ttl: float = 1800.0, retention: float = 7 * 86400.0, sweep_interval: float = 60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.hot_entries = hot_entries
+        self.idle_ttl = idle_ttl
+        self.retention = retention
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self.restored = 0
+        self._sessions: Dict[str, SessionHistory] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._on_disk = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._on_disk = sum(1 for name in os.listdir(path) if name.endswith(".hist"))
+
+    def touch(self, session_id: str):
+        """Mark ``session_id`` as active and evict idle sessions if a sweep is due."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = time.monotonic()
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.evict_idle()
+
+    def add(self, session_id: str, entry: HistoryEntry):
+        with self._lock:
+            session = self._session(session_id)
+            session.append(entry, self.hot_entries)
+            session.last_seen = time.monotonic()
+
+    def entries(self, session_id: str) -> List[HistoryEntry]:
+        """Return the session's entries, newest first."""
+        with self._lock:
+            return list(reversed(self._session(session_id).entries))
+
+    def latest(self, session_id: str) -> Optional[HistoryEntry]:
+        with self._lock:
+            entries = self._session(session_id).entries
+            return entries[-1] if entries else None
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self.path:
+                try:
+                    os.remove(self._file(session_id))
+                    self._on_disk -= 1
+                except OSError:
+                    pass
+
+    def evict_idle(self) -> int:
+        """Move sessions idle for ``idle_ttl`` to disk; return how many were evicted."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_sweep = now
+            idle = [(sid, s) for sid, s in self._sessions.items() if now - s.last_seen >= self.idle_ttl]
+            for sid, session in idle:
+                del self._sessions[sid]
+                # Written under the lock so a returning session finds its file
+                if self.path and session.entries:
+                    self._write(sid, session)
+            self.evicted += len(idle)
+            if self.path:
+                self._prune()
+        return len(idle)
+
+    def stats(self) -> dict:
+        """Session counts and the approximate memory held by entries."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            memory = sum(s.size for s in sessions)
+            entries = sum(len(s.entries) for s in sessions)
+            on_disk = self._on_disk
+        return {
+            "sessions": len(sessions),
+            "entries": entries,
+            "memory_bytes": memory,
+            "bytes_per_session": memory / len(sessions) if sessions else 0.0,
+            "on_disk": on_disk,
+            "evicted": self.evicted,
+            "restored": self.restored,
+        }
+
+    def _session(self, session_id: str) -> SessionHistory:
+        """Return the session's history, reading it back from disk if evicted; lock held."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = SessionHistory(self.max_entries)
+            if self.path:
+                self._read(session_id, session)
+        return session
+
+    def _file(self, session_id: str) -> str:
+        # Session ids are generated hex strings; keep only safe characters anyway
+        return os.path.join(self.path, "".join(c for c in session_id if c.isalnum()) + ".hist")
+
+    def _write(self, session_id: str, session: SessionHistory):
+        """Write one evicted session; lock held."""
+        path = self._file(session_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp, "wb") as f:
+                # Entries are already compressed; reuse their payloads as they are
+                for entry in session.entries:
+                    f.write(entry.to_bytes())
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._on_disk += not existed
+
+    def _read(self, session_id: str, session: SessionHistory):
+        path = self._file(session_id)
+        entries = []
+        try:
+            with open(path, "rb") as f:
+                while (entry := HistoryEntry.read_from(f)) is not None:
+                    entries.append(entry)
+            os.remove(path)
+        except (OSError, ValueError, KeyError):
+            return
+        self._on_disk -= 1
+        for entry in entries[-self.max_entries:]:
+            session.append(entry, self.hot_entries)
+        self.restored += 1
+
+    def _prune(self):
+        """Delete evicted sessions older than ``retention``; lock held."""
+        cutoff = time.time() - self.retention
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.path, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    self._on_disk -= name.endswith(".hist")
+            except OSError:
+                pass
@@ -0,0 +1,238 @@
+"""Per-request Ollama timing metrics and Prometheus-style process aggregates."""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+LOOKUP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# name -> (help text, buckets, function of a summary returning the observation)
+HISTOGRAMS = {
+    "ayurparam_total_duration_seconds": ("Total time Ollama spent on a generation", DURATION_BUCKETS, lambda s: s["total"]),
+    "ayurparam_load_duration_seconds": ("Time spent loading the model", DURATION_BUCKETS, lambda s: s["load"]),
+    "ayurparam_prompt_eval_duration_seconds": ("Time spent evaluating the prompt", DURATION_BUCKETS, lambda s: s["prompt_eval"]),
+    "ayurparam_eval_duration_seconds": ("Time spent generating output tokens", DURATION_BUCKETS, lambda s: s["eval"]),
+    "ayurparam_eval_tokens_per_second": ("Output tokens generated per second", RATE_BUCKETS, lambda s: s["tokens_per_second"]),
+    "ayurparam_prompt_tokens": ("Prompt tokens evaluated per generation", TOKEN_BUCKETS, lambda s: s["prompt_tokens"]),
+    "ayurparam_output_tokens": ("Output tokens generated per generation", TOKEN_BUCKETS, lambda s: s["output_tokens"]),
+}
+
+
+def summarize(meta: dict) -> Optional[dict]:
+    """Convert Ollama's nanosecond timing fields into seconds and rates.
+
+    Returns ``None`` when ``meta`` carries no timing information (cached
+    answers, servers that omit the fields).
+    """
+    if "eval_count" not in meta and "total_duration" not in meta:
+        return None
+    eval_seconds = meta.get("eval_duration", 0) / 1e9
+    prompt_seconds = meta.get("prompt_eval_duration", 0) / 1e9
+    output_tokens = meta.get("eval_count", 0)
+    prompt_tokens = meta.get("prompt_eval_count", 0)
+    return {
+        "total": meta.get("total_duration", 0) / 1e9,
+        "load": meta.get("load_duration", 0) / 1e9,
+        "prompt_eval": prompt_seconds,
+        "eval": eval_seconds,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "tokens_per_second": output_tokens / eval_seconds if eval_seconds else 0.0,
+        "prompt_tokens_per_second": prompt_tokens / prompt_seconds if prompt_seconds else 0.0,
+    }
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class GenerationMetrics:
+    """Process-wide aggregation of generation timings, labelled by model.
+
+    ``observe`` records one finished generation; ``render`` returns the
+    Prometheus text exposition format. When ``path`` is set, a daemon thread
+    rewrites the text atomically after observations, at most every
+    ``interval`` seconds, so a node_exporter textfile collector (or anything
+    else) can scrape it without requests waiting on the disk.
+    """
+
+    def __init__(self, path: Optional[str] = None, interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self._histograms = {}
+        self._requests = {}
+        self._failures = {}
+        self._cancelled = {}
+        self._rejected = {}
+        self._hedged = {}
+        self._hedge_wins = {}
+        self._faq_hits = 0
+        self._faq_lookups = Histogram(LOOKUP_BUCKETS)
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        if path:
+            threading.Thread(target=self._loop, name="ayurparam-metrics-file", daemon=True).start()
+
+    def observe(self, model: str, meta: dict):
+        summary = summarize(meta)
+        with self._lock:
+            self._requests[model] = self._requests.get(model, 0) + 1
+            if summary is not None:
+                for name, (_, buckets, value) in HISTOGRAMS.items():
+                    histogram = self._histograms.get((name, model))
+                    if histogram is None:
+                        histogram = self._histograms[(name, model)] = Histogram(buckets)
+                    histogram.observe(value(summary))
+        self._changed.set()
+
+    def observe_failure(self, model: str):
+        with self._lock:
+            self._failures[model] = self._failures.get(model, 0) + 1
+        self._changed.set()
+
+    def observe_cancelled(self, model: str):
+        with self._lock:
+            self._cancelled[model] = self._cancelled.get(model, 0) + 1
+        self._changed.set()
+
+    def observe_rejected(self, model: str):
+        with self._lock:
+            self._rejected[model] = self._rejected.get(model, 0) + 1
+        self._changed.set()
+
+    def observe_hedge(self, model: str, won: bool):
+        with self._lock:
+            self._hedged[model] = self._hedged.get(model, 0) + 1
+            if won:
+                self._hedge_wins[model] = self._hedge_wins.get(model, 0) + 1
+        self._changed.set()
+
+    def observe_faq(self, hit: bool, seconds: float):
+        with self._lock:
+            self._faq_lookups.observe(seconds)
+            self._faq_hits += hit
+        self._changed.set()
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP ayurparam_generations_total Generations completed by Ollama",
+                "# TYPE ayurparam_generations_total counter",
+            ]
+            lines += [f'ayurparam_generations_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._requests.items())]
+            lines += [
+                "# HELP ayurparam_generation_failures_total Generations that ended in an error",
+                "# TYPE ayurparam_generation_failures_total counter",
+            ]
+            lines += [f'ayurparam_generation_failures_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._failures.items())]
+            lines += [
+                "# HELP ayurparam_generations_cancelled_total Generations abandoned by every session before they finished",
+                "# TYPE ayurparam_generations_cancelled_total counter",
+            ]
+            lines += [f'ayurparam_generations_cancelled_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._cancelled.items())]
+            lines += [
+                "# HELP ayurparam_admission_rejected_total Generations turned away because the queue was too long",
+                "# TYPE ayurparam_admission_rejected_total counter",
+            ]
+            lines += [f'ayurparam_admission_rejected_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._rejected.items())]
+            lines += [
+                "# HELP ayurparam_hedged_total Generations also sent to a second backend because the first token was late",
+                "# TYPE ayurparam_hedged_total counter",
+            ]
+            lines += [f'ayurparam_hedged_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._hedged.items())]
+            lines += [
+                "# HELP ayurparam_hedge_wins_total Hedged generations where the second backend streamed first",
+                "# TYPE ayurparam_hedge_wins_total counter",
+            ]
+            lines += [f'ayurparam_hedge_wins_total{{model="{_label(m)}"}} {n}' for m, n in sorted(self._hedge_wins.items())]
+            lines += [
+                "# HELP ayurparam_faq_hits_total Questions answered from the answer bank without the model",
+                "# TYPE ayurparam_faq_hits_total counter",
+                f"ayurparam_faq_hits_total {self._faq_hits}",
+                "# HELP ayurparam_faq_lookup_seconds Time spent looking a question up in the answer bank",
+                "# TYPE ayurparam_faq_lookup_seconds histogram",
+            ]
+            lookups = self._faq_lookups
+            lines += [f'ayurparam_faq_lookup_seconds_bucket{{le="{bound}"}} {count}' for bound, count in zip(lookups.buckets, lookups.counts)]
+            lines.append(f'ayurparam_faq_lookup_seconds_bucket{{le="+Inf"}} {lookups.count}')
+            lines.append(f"ayurparam_faq_lookup_seconds_sum {lookups.sum:.6f}")
+            lines.append(f"ayurparam_faq_lookup_seconds_count {lookups.count}")
+            for name, (help_text, _, _) in HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (hist_name, model), histogram in sorted(self._histograms.items()):
+                    if hist_name != name:
+                        continue
+                    label = f'model="{_label(model)}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+            return "\n".join(lines) + "\n"
+
+    def _loop(self):
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            self._write()
+            time.sleep(self.interval)
+
+    def _write(self):
+        text = self.render()
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+        except OSError:
+            # A full disk or read-only directory only costs the file; the next change retries
+            pass
+
+
+def serve_metrics(metrics: GenerationMetrics, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``metrics.render()`` at ``/metrics`` on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="ayurparam-metrics", daemon=True).start()
+    return server
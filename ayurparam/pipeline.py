@@ -0,0 +1,500 @@
+"""The question-answering pipeline shared by the app, the HTTP server and the CLI.
+
+Prompt formatting, the Ollama requests and the single-flight generation
+path live here, free of Streamlit, so headless callers get exactly the
+answers the UI gives. Shared resources (HTTP session, backend registry,
+in-flight generations, admission control, metrics, cache) are passed in by
+the caller; ``ayurparam.resources`` holds the Streamlit-cached ones.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import socket
+import threading
+import time
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlsplit
+
+from ayurparam.admission import Rejected
+from ayurparam.cache import make_key
+from ayurparam.cleaning import clean_response
+from ayurparam.settings import HTTP_BACKOFF_FACTOR, HTTP_MAX_RETRIES, HTTP_POOL_SIZE, KEEP_ALIVE
+
+if TYPE_CHECKING:
+    import requests
+
+    from ayurparam.admission import AdmissionController
+    from ayurparam.backends import BackendRegistry
+    from ayurparam.budget import TokenBudget
+    from ayurparam.cache import ResponseCache
+    from ayurparam.faq import FaqBank
+    from ayurparam.hedging import Hedger
+    from ayurparam.metrics import GenerationMetrics
+    from ayurparam.singleflight import Flight, SingleFlight
+
+# Defaults of the app's model and generation settings
+DEFAULT_MODEL = "Jayasimma/Ayurveda-8b"
+DEFAULT_MAX_TOKENS = 700
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_TOP_P = 0.95
+DEFAULT_TOP_K = 50
+
+# Seconds between checks of a stop event while following a generation
+FOLLOW_HEARTBEAT = 0.5
+
+
+def create_session(pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES, backoff_factor: float = HTTP_BACKOFF_FACTOR) -> requests.Session:
+    """Create a keep-alive HTTP session for talking to Ollama.
+
+    Connections to each Ollama host are pooled and reused. Retries only cover
+    failures where the generation cannot have started upstream (connection
+    errors and 502/503/504), so a POST is never run twice on the GPU.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=max_retries,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,
+        backoff_factor=backoff_factor,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+@lru_cache(maxsize=1)
+def _default_session() -> requests.Session:
+    return create_session()
+
+
+def parse_urls(text: str) -> tuple:
+    """Split a list of endpoint URLs (one per line or comma-separated) into a tuple.
+
+    A bare server address such as ``http://localhost:11434`` stands for its
+    ``/api/generate`` endpoint.
+    """
+    urls = []
+    for url in text.replace(",", "\n").splitlines():
+        url = url.strip()
+        if not url:
+            continue
+        if urlsplit(url).path in ("", "/"):
+            url = url.rstrip("/") + "/api/generate"
+        urls.append(url)
+    return tuple(dict.fromkeys(urls))
+
+
+def format_prompt(user_input: str) -> str:
+    """Wrap a question in the model's chat markers."""
+    return f"<user> {user_input} <assistant>"
+
+
+def ground_question(question: str, passages: list) -> str:
+    """Put retrieved passages in front of the question, numbered for citation."""
+    if not passages:
+        return question
+    sources = "\n\n".join(f"[{i}] {p.title}: {p.text}" for i, p in enumerate(passages, 1))
+    return (
+        "Answer using the passages from the classical Ayurvedic texts below where they are relevant, "
+        f"citing them by number.\n\n{sources}\n\nQuestion: {question}"
+    )
+
+
+def question_of(formatted_prompt: str) -> str:
+    """Return the user's question from a prompt built by ``format_prompt`` (and ``ground_question``)."""
+    turn = formatted_prompt.rsplit("<user>", 1)[-1].rsplit("<assistant>", 1)[0]
+    return turn.rsplit("\n\nQuestion: ", 1)[-1].strip()
+
+
+def build_payload(prompt: str, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, stream: bool = False, context: list = None, num_ctx: int = None) -> dict:
+    """Build the /api/generate request body.
+
+    ``context`` is the token array returned with a previous answer; passing
+    it continues that conversation without re-sending its text. ``num_ctx``
+    sets the context window; without it the model's default applies.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": KEEP_ALIVE,
+        "options": {
+            "num_predict": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "top_k": top_k
+        }
+    }
+    if num_ctx:
+        payload["options"]["num_ctx"] = num_ctx
+    if context:
+        payload["context"] = context
+    return payload
+
+
+def fetch_ollama(prompt: str, ollama_url: str, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, session: requests.Session = None, context: list = None, num_ctx: int = None) -> dict:
+    """Send a blocking request to Ollama API and return the decoded JSON result.
+
+    Errors are raised. Without ``session`` a process-wide default session
+    is used.
+    """
+    payload = build_payload(prompt, model_name, max_tokens, temperature, top_p, top_k, context=context, num_ctx=num_ctx)
+
+    response = (session or _default_session()).post(ollama_url, json=payload, timeout=300)
+    response.raise_for_status()
+
+    return response.json()
+
+
+def stream_ollama(prompt: str, ollama_url: str, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, session: requests.Session = None, context: list = None, on_done=None, num_ctx: int = None, on_open=None):
+    """Stream a response from Ollama API, yielding raw text chunks as they arrive.
+
+    Ollama answers a streaming request with one JSON object per line (NDJSON);
+    errors are raised rather than returned so the caller can fall back. The
+    final object (context, eval counts, durations) is passed to ``on_done``,
+    and the open response to ``on_open`` so another thread can abort it.
+    """
+    payload = build_payload(prompt, model_name, max_tokens, temperature, top_p, top_k, stream=True, context=context, num_ctx=num_ctx)
+
+    with (session or _default_session()).post(ollama_url, json=payload, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        if on_open is not None:
+            on_open(response)
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            text = chunk.get("response", "")
+            if text:
+                yield text
+            if chunk.get("done"):
+                if on_done is not None:
+                    on_done(chunk)
+                break
+
+
+def produce_generation(flight: Flight, formatted_prompt: str, ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, session: requests.Session, registry: BackendRegistry, context: list = None, metrics: GenerationMetrics = None, admission: AdmissionController = None, owner: str = "", budget: TokenBudget = None, hedger: Hedger = None):
+    """Run one upstream generation for a flight, publishing raw text chunks.
+
+    Waits for an ``admission`` slot first, queued under ``owner``; the
+    ticket is exposed as ``flight.ticket`` while waiting. Always streams from
+    Ollama, so a cancelled flight can drop the connection at the next chunk
+    and Ollama stops generating; a blocking request is only used if the
+    stream fails before its first token. The final response fields end up
+    in ``flight.meta`` and are recorded in ``metrics``; with a ``budget``
+    the request is sized by it first and with a ``hedger`` a late first
+    token is raced on a second backend (see ``run_upstream``). Errors are
+    raised.
+    """
+    ticket = None
+    if admission is not None:
+        try:
+            ticket = admission.acquire(owner, flight.cancelled, on_queue=partial(setattr, flight, "ticket"))
+        except Rejected:
+            if metrics is not None:
+                metrics.observe_rejected(model_name)
+            raise
+        if ticket is None:
+            if metrics is not None:
+                metrics.observe_cancelled(model_name)
+            return
+
+    try:
+        run_upstream(flight, formatted_prompt, ollama_urls, model_name, max_tokens, temperature, top_p, top_k, session, registry, context, budget, hedger)
+    except Exception:
+        if metrics is not None and not flight.cancelled.is_set():
+            metrics.observe_failure(model_name)
+        raise
+    finally:
+        if ticket is not None:
+            admission.release(ticket)
+    if metrics is None:
+        return
+    if flight.meta.get("hedged"):
+        metrics.observe_hedge(model_name, flight.meta["hedge_won"])
+    if flight.cancelled.is_set():
+        metrics.observe_cancelled(model_name)
+    else:
+        metrics.observe(model_name, flight.meta)
+
+
+def run_upstream(flight: Flight, formatted_prompt: str, ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, session: requests.Session, registry: BackendRegistry, context: list = None, budget: TokenBudget = None, hedger: Hedger = None):
+    """Send a flight's request to the least-loaded backend.
+
+    With a ``budget``, ``max_tokens`` is the upper limit of the output and
+    the budget picks ``num_predict`` and ``num_ctx``; its decision is kept
+    in ``flight.meta["budget"]``. With a ``hedger`` and more than one
+    backend the request is hedged (see ``run_hedged``).
+    """
+    def record_meta(result):
+        flight.meta.update((k, v) for k, v in result.items() if k != "response")
+
+    num_ctx = None
+    decision = None
+    if budget is not None:
+        # Sized before leasing, so a refused prompt does not count against a backend
+        decision = budget.plan(model_name, registry.pick(ollama_urls).base_url, formatted_prompt, max_tokens, question_of(formatted_prompt), context)
+        flight.meta["budget"] = decision.as_dict()
+        if not decision.fits:
+            raise RuntimeError(
+                f"Error: Question too long for the model (about {decision.prompt_tokens + decision.context_tokens} tokens; "
+                f"the largest context window is {decision.num_ctx} tokens)"
+            )
+        max_tokens, num_ctx = decision.num_predict, decision.num_ctx
+
+    if hedger is not None and len(set(ollama_urls)) > 1:
+        run_hedged(flight, formatted_prompt, ollama_urls, model_name, max_tokens, temperature, top_p, top_k, session, registry, context, num_ctx, hedger)
+    else:
+        with registry.lease(ollama_urls) as lease:
+            flight.meta["backend_url"] = lease.url
+            got_token = False
+            try:
+                for chunk in stream_ollama(formatted_prompt, lease.url, model_name, max_tokens, temperature, top_p, top_k, session=session, context=context, on_done=record_meta, num_ctx=num_ctx):
+                    if flight.cancelled.is_set():
+                        # Leaving the loop closes the response and with it the upstream request
+                        break
+                    got_token = True
+                    flight.publish(chunk)
+                stream_failed = False
+            except Exception:
+                if got_token:
+                    raise
+                stream_failed = True
+            if stream_failed and not flight.cancelled.is_set():
+                result = fetch_ollama(formatted_prompt, lease.url, model_name, max_tokens, temperature, top_p, top_k, session=session, context=context, num_ctx=num_ctx)
+                record_meta(result)
+                flight.publish(result.get("response", ""))
+    if decision is not None:
+        budget.record(decision, flight.meta, "".join(flight.chunks), cancelled=flight.cancelled.is_set())
+
+
+class _Attempt:
+    """One backend's stream in a hedged race."""
+
+    __slots__ = ('url', 'started', 'meta', 'response', 'stopped', 'lock')
+
+    def __init__(self, url: str):
+        self.url = url
+        self.started = time.monotonic()
+        self.meta = {}
+        self.response = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def opened(self, response):
+        with self.lock:
+            if self.stopped.is_set():
+                _shutdown(response)
+            else:
+                self.response = response
+
+    def finished(self, result: dict):
+        # Cleared before the response is closed and its connection goes back to the pool
+        with self.lock:
+            self.response = None
+            self.meta = {k: v for k, v in result.items() if k != "response"}
+
+    def abort(self):
+        """Stop the stream now, even while its thread is waiting for the first token."""
+        with self.lock:
+            self.stopped.set()
+            if self.response is not None:
+                _shutdown(self.response)
+                self.response = None
+
+
+def _shutdown(response):
+    # Closing alone does not wake a thread blocked reading the socket; shutting it down does
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def run_hedged(flight: Flight, formatted_prompt: str, ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, session: requests.Session, registry: BackendRegistry, context: list, num_ctx: Optional[int], hedger: Hedger):
+    """Stream from the least-loaded backend, racing a second one if the first token is late.
+
+    When no token has arrived after ``hedger.delay(model_name)`` seconds (or
+    the first stream failed) and the hedger's rate limit allows, the same
+    request is sent to the next healthy backend. Whichever streams a token first is published; the other
+    stream is aborted, which stops it upstream. ``flight.meta`` records the
+    winning ``backend_url``, ``hedged`` and ``hedge_won``. If every stream
+    fails before its first token a blocking request is sent instead.
+    """
+    events = queue.Queue()
+
+    def race(attempt: _Attempt):
+        with registry.lease((attempt.url,)) as lease:
+            try:
+                for chunk in stream_ollama(formatted_prompt, attempt.url, model_name, max_tokens, temperature, top_p, top_k, session=session, context=context, on_done=attempt.finished, num_ctx=num_ctx, on_open=attempt.opened):
+                    if attempt.stopped.is_set():
+                        break
+                    events.put((attempt, "chunk", chunk))
+                events.put((attempt, "done", None))
+            except Exception as e:
+                # An aborted stream is not the backend's fault
+                if not attempt.stopped.is_set():
+                    lease.fail(str(e))
+                    events.put((attempt, "error", e))
+
+    def launch(url: str) -> _Attempt:
+        attempt = _Attempt(url)
+        attempts.append(attempt)
+        threading.Thread(target=race, args=(attempt,), name="ayurparam-hedge", daemon=True).start()
+        return attempt
+
+    attempts = []
+    primary = launch(registry.pick(ollama_urls).url)
+    hedge_at = primary.started + hedger.delay(model_name)
+    winner = None
+    failed = 0
+    primary_failed = False
+    try:
+        while True:
+            timeout = FOLLOW_HEARTBEAT
+            if hedge_at is not None:
+                timeout = min(timeout, max(hedge_at - time.monotonic(), 0.0))
+            try:
+                attempt, kind, value = events.get(timeout=timeout)
+            except queue.Empty:
+                if flight.cancelled.is_set():
+                    return
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    others = tuple(url for url in ollama_urls if url != primary.url)
+                    backend = registry.pick(others)
+                    if backend.healthy and hedger.allow():
+                        launch(backend.url)
+                if failed == len(attempts):
+                    break
+                continue
+
+            if winner is None:
+                if kind == "error":
+                    failed += 1
+                    primary_failed = primary_failed or attempt is primary
+                    if failed == len(attempts):
+                        if hedge_at is None:
+                            break
+                        # Hedge straight away rather than wait out the delay
+                        hedge_at = time.monotonic()
+                    continue
+                winner = attempt
+                hedge_at = None
+                for other in attempts:
+                    if other is not winner:
+                        other.abort()
+                if kind == "chunk" and not primary_failed:
+                    # The first backend's wait, cut off when a hedge beats it; a
+                    # winning hedge's own time would understate the tail
+                    hedger.observe(model_name, time.monotonic() - primary.started)
+                flight.meta["backend_url"] = winner.url
+                flight.meta["hedged"] = len(attempts) > 1
+                flight.meta["hedge_won"] = winner is not primary
+            if attempt is not winner:
+                continue
+            if kind == "chunk":
+                if flight.cancelled.is_set():
+                    return
+                flight.publish(value)
+            elif kind == "done":
+                flight.meta.update(winner.meta)
+                break
+            else:
+                raise value
+    finally:
+        for attempt in attempts:
+            if attempt is not winner or flight.cancelled.is_set():
+                attempt.abort()
+
+    if winner is not None:
+        hedger.record(flight.meta["hedged"], flight.meta["hedge_won"])
+        return
+    if flight.cancelled.is_set():
+        return
+    with registry.lease(ollama_urls) as lease:
+        flight.meta["backend_url"] = lease.url
+        result = fetch_ollama(formatted_prompt, lease.url, model_name, max_tokens, temperature, top_p, top_k, session=session, context=context, num_ctx=num_ctx)
+        flight.meta.update((k, v) for k, v in result.items() if k != "response")
+        flight.publish(result.get("response", ""))
+
+
+def start_generation(formatted_prompt: str, ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, flights: SingleFlight, session: requests.Session, registry: BackendRegistry, context: list = None, metrics: GenerationMetrics = None, admission: AdmissionController = None, owner: str = "", budget: TokenBudget = None, hedger: Hedger = None) -> Flight:
+    """Join the in-flight generation for this request, starting one if there is none.
+
+    Identical requests (model, prompt, options and conversation context) from
+    any session share a single upstream generation; a new one is queued for
+    ``admission`` under ``owner``, sized by ``budget`` and hedged by
+    ``hedger``.
+    """
+    producer = partial(
+        produce_generation,
+        formatted_prompt=formatted_prompt,
+        ollama_urls=ollama_urls,
+        model_name=model_name,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        top_k=top_k,
+        session=session,
+        registry=registry,
+        context=context,
+        metrics=metrics,
+        admission=admission,
+        owner=owner,
+        budget=budget,
+        hedger=hedger,
+    )
+    return flights.join(make_key(model_name, formatted_prompt, max_tokens, temperature, top_p, top_k, context), producer)
+
+
+def answer_question(question: str, ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, cache: Optional[ResponseCache], use_cache: bool, flights: SingleFlight, session: requests.Session, registry: BackendRegistry, metrics: GenerationMetrics = None, stop: threading.Event = None, admission: AdmissionController = None, owner: str = "", budget: TokenBudget = None, hedger: Hedger = None, faq: FaqBank = None) -> str:
+    """Answer one question to completion, going through the response cache when enabled.
+
+    A confident match in the ``faq`` answer bank is returned without asking
+    the model. Returns the cleaned answer or a string starting with
+    ``"Error:"``. Gives up as soon as ``stop`` is set, cancelling the
+    generation unless another caller is still following it.
+    """
+    if faq is not None:
+        match = faq.lookup(question)
+        if match is not None:
+            return match.answer
+    formatted_prompt = format_prompt(question)
+    cache_key = make_key(model_name, formatted_prompt, max_tokens, temperature, top_p, top_k)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    flight = start_generation(formatted_prompt, ollama_urls, model_name, max_tokens, temperature, top_p, top_k, flights, session, registry, metrics=metrics, admission=admission, owner=owner, budget=budget, hedger=hedger)
+    try:
+        for _ in flight.follow(heartbeat=FOLLOW_HEARTBEAT):
+            if stop is not None and stop.is_set():
+                return "Error: Batch stopped"
+        response = flight.result()
+    finally:
+        flights.leave(flight)
+    if not response.startswith("Error:"):
+        response = clean_response(response)
+    if use_cache and not response.startswith("Error:"):
+        cache.put(cache_key, response)
+    return response
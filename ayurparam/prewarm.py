@@ -0,0 +1,208 @@
+"""Background generation of answers to the app's starting questions."""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Iterable
+
+from ayurparam.cache import make_key
+from ayurparam.cleaning import clean_response
+from ayurparam.pipeline import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_K,
+    DEFAULT_TOP_P,
+    FOLLOW_HEARTBEAT,
+    format_prompt,
+    ground_question,
+    start_generation,
+)
+
+if TYPE_CHECKING:
+    import requests
+
+    from ayurparam.admission import AdmissionController
+    from ayurparam.backends import BackendRegistry
+    from ayurparam.budget import TokenBudget
+    from ayurparam.cache import ResponseCache
+    from ayurparam.metrics import GenerationMetrics
+    from ayurparam.retrieval import PassageIndex
+    from ayurparam.semantic import Embedder
+    from ayurparam.singleflight import SingleFlight
+
+
+def load_prompts(path: str) -> tuple:
+    """Read seed questions from a text file, one per line; blank lines and ``#`` comments are skipped."""
+    with open(path, encoding="utf-8") as f:
+        return tuple(dict.fromkeys(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")))
+
+
+class Prewarmer:
+    """Keep answers to a few seed questions in the response cache.
+
+    A daemon thread checks every ``interval`` seconds whether the backends
+    are idle (nothing generating, nobody queued) and, if so, generates the
+    seed answers that are missing from ``cache`` or older than ``refresh``
+    seconds, one at a time, with the app's default generation settings. It
+    gives way as soon as a user's question has to queue behind it.
+
+    ``configure(ollama_urls, model)`` says which backends and model to warm
+    for; a new model name makes every seed due again. The prewarmer is
+    shared by every session, so it is configured once by the operator
+    rather than from any one session's settings. When a passage
+    ``index`` is given and not empty, seeds are grounded the way the app
+    grounds questions by default, so the cache key matches what a user's
+    first click looks up.
+    """
+
+    def __init__(
+        self,
+        prompts: Iterable[str],
+        cache: ResponseCache,
+        flights: SingleFlight,
+        session: requests.Session,
+        registry: BackendRegistry,
+        interval: float = 30.0,
+        refresh: float = 24 * 3600.0,
+        admission: AdmissionController = None,
+        metrics: GenerationMetrics = None,
+        index: PassageIndex = None,
+        embedder: Embedder = None,
+        retrieval_top_k: int = 4,
+        budget: TokenBudget = None,
+    ):
+        self.prompts = tuple(prompts)
+        self.cache = cache
+        self.flights = flights
+        self.session = session
+        self.registry = registry
+        self.interval = interval
+        self.refresh = refresh
+        self.admission = admission
+        self.metrics = metrics
+        self.index = index
+        self.embedder = embedder
+        self.retrieval_top_k = retrieval_top_k
+        self.budget = budget
+        self.warmed = 0
+        self.failures = 0
+        self.yielded = 0
+        self.last_error = None
+        self._ready = set()
+        self._target = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="ayurparam-prewarm", daemon=True)
+        self._thread.start()
+
+    def configure(self, ollama_urls: tuple, model: str):
+        """Warm answers of ``model`` on ``ollama_urls``; cheap when unchanged."""
+        target = (tuple(ollama_urls), model)
+        with self._lock:
+            if target == self._target:
+                return
+            self._target = target
+            self._ready.clear()
+        self._wake.set()
+
+    def is_seed(self, question: str) -> bool:
+        return question.strip() in self.prompts
+
+    def prompt_for(self, question: str, ollama_urls: tuple) -> str:
+        """Format a seed question as the app would with its default settings."""
+        passages = []
+        if self.index is not None and self.index.stats()["chunks"]:
+            vector = None
+            if self.embedder is not None:
+                vector = self.embedder.embed(self.registry.pick(ollama_urls).base_url, question)
+            passages = self.index.search(question, self.retrieval_top_k, vector)
+        return format_prompt(ground_question(question, passages))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompts": len(self.prompts),
+                "ready": len(self._ready),
+                "warmed": self.warmed,
+                "failures": self.failures,
+                "yielded": self.yielded,
+                "last_error": self.last_error,
+            }
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _idle(self, ollama_urls: tuple) -> bool:
+        if any(backend["outstanding"] for backend in self.registry.snapshot(ollama_urls)):
+            return False
+        if self.admission is not None:
+            queue = self.admission.stats()
+            return queue["active"] == 0 and queue["waiting"] == 0
+        return True
+
+    def _busy(self) -> bool:
+        """Whether a user's question is waiting for the slot a seed is using."""
+        return self.admission is not None and self.admission.stats()["waiting"] > 0
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                target = self._target
+            if target is None or not target[0] or self._stop.is_set():
+                continue
+            try:
+                self._warm_due(target)
+            except Exception as e:
+                # Embedding or index errors; try again on the next pass
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+
+    def _warm_due(self, target: tuple):
+        ollama_urls, model = target
+        for question in self.prompts:
+            if self._stop.is_set() or self._target != target:
+                return
+            prompt = self.prompt_for(question, ollama_urls)
+            key = make_key(model, prompt, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_TOP_K)
+            age = self.cache.age(key)
+            if age is not None and age < self.refresh:
+                with self._lock:
+                    self._ready.add(question)
+                continue
+            if not self._idle(ollama_urls) or not self._generate(target, prompt, key):
+                # Busy, failed or reconfigured: leave the rest for the next pass
+                return
+            with self._lock:
+                self._ready.add(question)
+
+    def _generate(self, target: tuple, prompt: str, key: str) -> bool:
+        ollama_urls, model = target
+        flight = start_generation(
+            prompt, ollama_urls, model, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_TOP_K,
+            self.flights, self.session, self.registry, metrics=self.metrics, admission=self.admission, owner="prewarm", budget=self.budget,
+        )
+        try:
+            for _ in flight.follow(heartbeat=FOLLOW_HEARTBEAT):
+                if self._stop.is_set() or self._target != target or self._busy():
+                    # Leaving cancels the generation unless a user joined it
+                    with self._lock:
+                        self.yielded += 1
+                    return False
+            response = flight.result()
+        finally:
+            self.flights.leave(flight)
+        if response.startswith("Error:"):
+            with self._lock:
+                self.failures += 1
+                self.last_error = response
+            return False
+        self.cache.put(key, clean_response(response))
+        with self._lock:
+            self.warmed += 1
+            self.last_error = None
+        return True
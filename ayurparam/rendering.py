@@ -0,0 +1,116 @@
+"""Markdown-to-HTML rendering of answers with reused ``Markdown`` instances."""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import markdown
+
+# Blank-line runs separate Markdown blocks; whitespace-only lines count as blank.
+_BLANK_RE = re.compile(r'\n(?:[ \t]*\n)+')
+# Lines starting a list item or blockquote, which merge across blank lines.
+_CONTINUABLE_RE = re.compile(r'^ {0,3}(?:[*+-]|\d+\.|>)(?:[ \t]|$)', re.M)
+# Raw HTML blocks and reference definitions can affect the whole document.
+_WHOLE_DOCUMENT_RE = re.compile(r'^ {0,3}(?:<|\[[^\]]+\]:)', re.M)
+
+_local = threading.local()
+
+
+def get_markdown() -> markdown.Markdown:
+    """Return this thread's ``Markdown`` instance, creating it on first use."""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        import markdown
+
+        md = _local.md = markdown.Markdown()
+    return md
+
+
+def render_markdown(text: str) -> str:
+    """Render ``text`` to HTML; same output as ``markdown.markdown(text)``."""
+    md = get_markdown()
+    md.reset()
+    return md.convert(text)
+
+
+def _is_safe_cut(group: str, next_first_line: str) -> bool:
+    """Whether the blocks in ``group`` render the same without what follows."""
+    if next_first_line[:1] in (' ', '\t'):
+        return False  # indented: code block or continuation of a list item
+    if _CONTINUABLE_RE.match(next_first_line) and _CONTINUABLE_RE.search(group):
+        return False  # loose list or multi-paragraph blockquote
+    return True
+
+
+class IncrementalRenderer:
+    """Render a growing Markdown document without reparsing finished blocks.
+
+    Text before the last safe block boundary is rendered once and kept as
+    HTML; each ``render`` only converts the open tail (usually the last
+    paragraph or list). ``finish`` returns the same HTML as a one-shot
+    ``render_markdown`` of the whole text. Documents containing raw HTML
+    blocks or reference definitions are always rendered in one piece.
+    """
+
+    __slots__ = ('_text', '_stable', '_blocks', '_whole')
+
+    def __init__(self):
+        self._text = ''
+        self._stable = 0
+        self._blocks = []
+        self._whole = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str):
+        """Append ``chunk`` to the document."""
+        self._text += chunk
+
+    def render(self) -> str:
+        """Return HTML for the document so far."""
+        self._advance()
+        if self._whole:
+            return render_markdown(self._text)
+        return self._join(render_markdown(self._text[self._stable:]))
+
+    def finish(self) -> str:
+        """Return the final HTML, identical to a one-shot render."""
+        return self.render()
+
+    def _advance(self):
+        if self._whole:
+            return
+        tail = self._text[self._stable:]
+        if _WHOLE_DOCUMENT_RE.search(tail):
+            self._whole = True
+            self._blocks = []
+            return
+        group_start = 0
+        for match in _BLANK_RE.finditer(tail):
+            next_start = match.end()
+            line_end = tail.find('\n', next_start)
+            if line_end == -1:
+                break  # the next block's first line may still change
+            if not tail[group_start:match.start()].strip():
+                # Only the document's leading blank lines: a first line of
+                # four or more columns is an empty code block in one piece
+                # but renders to nothing alone, so it stays with what follows
+                continue
+            if _is_safe_cut(tail[group_start:match.start()], tail[next_start:line_end]):
+                html = render_markdown(tail[group_start:match.start()])
+                if html:
+                    self._blocks.append(html)
+                group_start = next_start
+        self._stable += group_start
+
+    def _join(self, tail_html: str) -> str:
+        if not self._blocks:
+            return tail_html
+        if not tail_html:
+            return '\n'.join(self._blocks)
+        return '\n'.join(self._blocks) + '\n' + tail_html
@@ -0,0 +1,255 @@
+"""Process-wide resources every Streamlit session shares.
+
+Streamlit re-executes the app script on every interaction. Defining the
+``st.cache_resource`` getters here, in a module imported once per process,
+keeps their wrappers from being rebuilt on every rerun. Each getter imports
+what it needs on first use, so the first page paint does not wait for
+``requests``, NumPy or the Markdown parser. Settings live in
+``ayurparam.settings``.
+"""
+
+import os
+
+import streamlit as st
+
+from ayurparam.settings import (
+    ADAPTIVE_OUTPUT,
+    BUDGET_LOG,
+    CACHE_MAX_MB,
+    CACHE_MEMORY_ITEMS,
+    CACHE_PATH,
+    CACHE_TTL_HOURS,
+    CORPUS_DIR,
+    CORPUS_SCAN_INTERVAL,
+    EMBED_MODEL,
+    FAQ_DB,
+    FAQ_FILE,
+    FAQ_MIN_OVERLAP,
+    HEALTH_INTERVAL,
+    HEDGE,
+    HEDGE_MAX_RATE,
+    HEDGE_PERCENTILE,
+    HISTORY_DIR,
+    HISTORY_IDLE_TTL,
+    HISTORY_MAX_ENTRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_SIZE,
+    INDEX_DIR,
+    KEEP_ALIVE,
+    MAX_CONCURRENT,
+    MAX_NUM_CTX,
+    MAX_QUEUE_WAIT,
+    METRICS_FILE,
+    METRICS_PORT,
+    NUM_CTX,
+    OLLAMA_URLS,
+    PREWARM_FILE,
+    PREWARM_INTERVAL,
+    PREWARM_MODEL,
+    PREWARM_REFRESH_HOURS,
+    RETRIEVAL_TOP_K,
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_MAX_ENTRIES,
+    SEMANTIC_THRESHOLD,
+    WARMUP_INTERVAL,
+)
+
+
+@st.cache_resource
+def get_logo_uri(path: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.jpg")):
+    """Return the sidebar logo as a ``data:`` URI, or ``None`` if it is missing.
+
+    Inlining the small logo avoids ``st.image``, which imports NumPy and
+    Pillow and re-encodes the file on every rerun.
+    """
+    import base64
+    import mimetypes
+
+    try:
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+    except OSError:
+        return None
+    mime = mimetypes.guess_type(path)[0] or "image/jpeg"
+    return f"data:{mime};base64,{data}"
+
+
+@st.cache_resource
+def get_http_session(pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES, backoff_factor: float = HTTP_BACKOFF_FACTOR):
+    """Return the keep-alive HTTP session shared by every Streamlit session."""
+    from ayurparam.pipeline import create_session
+
+    return create_session(pool_size, max_retries, backoff_factor)
+
+
+@st.cache_resource
+def get_backend_registry():
+    """Return the backend registry (load, latency, health) shared by every session."""
+    from ayurparam.backends import BackendRegistry
+
+    return BackendRegistry(get_http_session(), health_interval=HEALTH_INTERVAL)
+
+
+@st.cache_resource
+def get_model_warmer():
+    """Return the model warmer shared by every session."""
+    from ayurparam.warmup import ModelWarmer
+
+    return ModelWarmer(get_http_session(), keep_alive=KEEP_ALIVE, interval=WARMUP_INTERVAL, budget=get_token_budget())
+
+
+@st.cache_resource
+def get_token_budget():
+    """Return the context window and output sizing shared by every session."""
+    from ayurparam.budget import TokenBudget
+
+    return TokenBudget(get_http_session(), num_ctx=NUM_CTX, max_num_ctx=MAX_NUM_CTX, adaptive=ADAPTIVE_OUTPUT, log_path=BUDGET_LOG or None)
+
+
+@st.cache_resource
+def get_hedger():
+    """Return the request hedging policy shared by every session, or ``None`` when hedging is off."""
+    if not HEDGE:
+        return None
+    from ayurparam.hedging import Hedger
+
+    return Hedger(percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE)
+
+
+@st.cache_resource
+def get_generation_metrics():
+    """Return the process-wide generation metrics, serving them over HTTP if configured."""
+    from ayurparam.metrics import GenerationMetrics, serve_metrics
+
+    metrics = GenerationMetrics(METRICS_FILE or None)
+    if METRICS_PORT:
+        try:
+            serve_metrics(metrics, METRICS_PORT)
+        except OSError:
+            # Another process (or an earlier reload) already serves the port.
+            pass
+    return metrics
+
+
+@st.cache_resource
+def get_faq_bank():
+    """Return the answer bank consulted before the model, or ``None`` when there is none.
+
+    A changed ``AYURPARAM_FAQ_FILE`` is loaded into it in the background.
+    """
+    if not FAQ_FILE and not os.path.exists(FAQ_DB):
+        return None
+    from ayurparam.faq import FaqBank
+
+    bank = FaqBank(FAQ_DB, min_overlap=FAQ_MIN_OVERLAP, metrics=get_generation_metrics())
+    if FAQ_FILE:
+        bank.start_load(FAQ_FILE)
+    return bank
+
+
+@st.cache_resource
+def get_response_cache():
+    """Return the response cache shared by every Streamlit session."""
+    from ayurparam.cache import ResponseCache
+
+    return ResponseCache(
+        CACHE_PATH,
+        max_memory_items=CACHE_MEMORY_ITEMS,
+        max_disk_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+        ttl=CACHE_TTL_HOURS * 3600,
+    )
+
+
+@st.cache_resource
+def get_semantic_cache():
+    """Return the question-embedding index shared by every Streamlit session."""
+    from ayurparam.semantic import SemanticCache
+
+    return SemanticCache(SEMANTIC_CACHE_PATH or None, EMBED_MODEL, SEMANTIC_THRESHOLD, SEMANTIC_MAX_ENTRIES)
+
+
+@st.cache_resource
+def get_embedder():
+    """Return the client for the Ollama embedding model."""
+    from ayurparam.semantic import Embedder
+
+    return Embedder(get_http_session(), EMBED_MODEL)
+
+
+@st.cache_resource
+def get_passage_index():
+    """Return the index of classical text passages shared by every session."""
+    from ayurparam.retrieval import PassageIndex
+
+    return PassageIndex(INDEX_DIR)
+
+
+@st.cache_resource
+def get_ingest_scheduler():
+    """Return the background job that indexes new texts in the corpus directory."""
+    from ayurparam.retrieval import IngestScheduler
+
+    return IngestScheduler(get_passage_index(), CORPUS_DIR, CORPUS_SCAN_INTERVAL)
+
+
+@st.cache_resource
+def get_history_store():
+    """Return the answer history of every session in the process."""
+    from ayurparam.history import HistoryStore
+
+    return HistoryStore(HISTORY_DIR or None, max_entries=HISTORY_MAX_ENTRIES, idle_ttl=HISTORY_IDLE_TTL)
+
+
+@st.cache_resource
+def get_single_flight():
+    """Return the registry of in-flight generations shared by every session."""
+    from ayurparam.singleflight import SingleFlight
+
+    return SingleFlight()
+
+
+@st.cache_resource
+def get_admission_controller():
+    """Return the upstream concurrency limit and queue shared by every session."""
+    from ayurparam.admission import AdmissionController
+
+    return AdmissionController(MAX_CONCURRENT, MAX_QUEUE_WAIT)
+
+
+@st.cache_resource
+def get_prewarmer(prompts: tuple):
+    """Return the background job that caches answers to the starting questions, or ``None`` if disabled.
+
+    ``prompts`` are the app's starting questions; ``AYURPARAM_PREWARM_FILE``
+    replaces them. Answers are generated on the ``AYURPARAM_OLLAMA_URL``
+    servers only, never on a URL typed into a session's sidebar.
+    """
+    from ayurparam.pipeline import DEFAULT_MODEL, parse_urls
+    from ayurparam.prewarm import Prewarmer, load_prompts
+
+    if PREWARM_FILE:
+        try:
+            prompts = load_prompts(PREWARM_FILE)
+        except OSError:
+            pass
+    ollama_urls = parse_urls(OLLAMA_URLS)
+    if PREWARM_INTERVAL <= 0 or not prompts or not ollama_urls:
+        return None
+    prewarmer = Prewarmer(
+        prompts,
+        get_response_cache(),
+        get_single_flight(),
+        get_http_session(),
+        get_backend_registry(),
+        interval=PREWARM_INTERVAL,
+        refresh=PREWARM_REFRESH_HOURS * 3600,
+        admission=get_admission_controller(),
+        metrics=get_generation_metrics(),
+        index=get_passage_index(),
+        embedder=get_embedder() if EMBED_MODEL else None,
+        retrieval_top_k=RETRIEVAL_TOP_K,
+        budget=get_token_budget(),
+    )
+    prewarmer.configure(ollama_urls, PREWARM_MODEL or DEFAULT_MODEL)
+    return prewarmer
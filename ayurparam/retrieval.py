@@ -0,0 +1,388 @@
+"""Retrieval of passages from a local corpus of classical texts.
+
+``PassageIndex`` keeps an on-disk hybrid index in one directory:
+
+- ``passages.sqlite3``: documents, chunk text and an FTS5 table ranked with
+  BM25;
+- ``vectors.f32``: chunk embeddings as raw float32 rows, appended as chunks
+  are ingested and memory-mapped for search.
+
+Ingestion streams each file paragraph by paragraph, so memory use does not
+depend on the size of a text, and only files that are new or changed
+(by size and modification time) are processed. To index from the shell:
+
+    python -m ayurparam.retrieval corpus/ --ollama http://localhost:11434
+
+The vector file is only mapped, and NumPy only imported, by the first
+search that brings a query embedding.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CORPUS_SUFFIXES = (".txt", ".md")
+# Constant of reciprocal rank fusion; larger values flatten the rank curve.
+RRF_K = 60
+# Chunks embedded per request during ingestion
+EMBED_BATCH = 32
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Passage(NamedTuple):
+    title: str
+    text: str
+    score: float
+
+
+def iter_chunks(lines: Iterable[str], chunk_chars: int = 1200, overlap_chars: int = 200) -> Iterator[str]:
+    """Split text into chunks of about ``chunk_chars`` along paragraph breaks.
+
+    Consecutive chunks share up to ``overlap_chars`` of trailing paragraphs
+    so a passage cut at a boundary is still found whole in one of them. A
+    paragraph longer than ``chunk_chars`` becomes a chunk of its own.
+    """
+    paragraphs, current, size, fresh = [], [], 0, False
+    for line in itertools.chain(lines, [""]):
+        if line.strip():
+            current.append(line.strip())
+            continue
+        if not current:
+            continue
+        paragraphs.append(" ".join(current))
+        size += len(paragraphs[-1])
+        current, fresh = [], True
+        if size >= chunk_chars:
+            yield "\n\n".join(paragraphs)
+            # Carry the last paragraphs over as overlap
+            kept, size = [], 0
+            for paragraph in reversed(paragraphs):
+                if size + len(paragraph) > overlap_chars:
+                    break
+                kept.insert(0, paragraph)
+                size += len(paragraph)
+            paragraphs, fresh = kept, False
+    if fresh:
+        yield "\n\n".join(paragraphs)
+
+
+def match_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching any of its words."""
+    words = {word.lower() for word in _WORD_RE.findall(text) if len(word) > 1}
+    return " OR ".join(f'"{word}"' for word in sorted(words)) or None
+
+
+def document_title(path: str) -> str:
+    """Readable title for a corpus file: ``charaka_samhita.txt`` -> ``Charaka Samhita``."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[_\-]+", " ", name).strip().title()
+
+
+class PassageIndex:
+    """Hybrid BM25 + embedding index over chunks of a text corpus.
+
+    ``search`` ranks chunks with BM25 and, when a query vector is given, by
+    cosine similarity too, then merges both rankings with reciprocal rank
+    fusion. Chunks ingested while no embedding model was reachable are
+    searched by BM25 only. Ingestion writes through a connection of its
+    own, so a search running meanwhile sees each file either before or
+    after it was replaced.
+    """
+
+    def __init__(self, path: str, chunk_chars: int = 1200, overlap_chars: int = 200):
+        self.path = path
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self._lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        self._vectors = None
+        self._rows = None
+        self._row_chunks = None
+        self._vectors_stale = True
+
+        os.makedirs(path, exist_ok=True)
+        self._vector_path = os.path.join(path, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(path, "passages.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT UNIQUE NOT NULL,"
+            " title TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY,"
+            " document INTEGER NOT NULL REFERENCES documents (id),"
+            " text TEXT NOT NULL,"
+            " vector_row INTEGER);"
+            "CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+            " text, content='chunks', content_rowid='id', tokenize='porter unicode61');"
+            "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self._db.commit()
+        self._writer = sqlite3.connect(os.path.join(path, "passages.sqlite3"), check_same_thread=False)
+
+    @property
+    def dim(self) -> Optional[int]:
+        with self._lock:
+            return self._dim(self._db)
+
+    def ingest(self, corpus_dir: str, embed: Optional[Callable[[List[str]], Optional[np.ndarray]]] = None, on_progress: Optional[Callable[[str], None]] = None) -> dict:
+        """Index new and changed files under ``corpus_dir`` and drop deleted ones.
+
+        ``embed(texts)`` returns one unit-length row per text, or ``None`` if
+        embeddings are unavailable. Each file is committed on its own, so an
+        interrupted run keeps what it finished. Returns counts of what changed.
+        """
+        with self._ingest_lock:
+            return self._ingest(corpus_dir, embed, on_progress)
+
+    def _ingest(self, corpus_dir: str, embed, on_progress) -> dict:
+        seen, added, removed, chunks = set(), 0, 0, 0
+        for root, _, files in os.walk(corpus_dir):
+            for name in sorted(files):
+                if not name.lower().endswith(CORPUS_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                key = os.path.relpath(path, corpus_dir)
+                seen.add(key)
+                row = self._writer.execute("SELECT size, mtime FROM documents WHERE path = ?", (key,)).fetchone()
+                if row == (stat.st_size, stat.st_mtime):
+                    continue
+                if on_progress is not None:
+                    on_progress(key)
+                chunks += self._ingest_file(path, key, stat, embed)
+                added += 1
+        for (key,) in self._writer.execute("SELECT path FROM documents").fetchall():
+            if key not in seen:
+                self._remove_document(key)
+                removed += 1
+        self._commit()
+        if embed is not None:
+            self._backfill(embed)
+        return {"documents": added, "removed": removed, "chunks": chunks}
+
+    def search(self, query: str, k: int = 4, vector: Optional[np.ndarray] = None, candidates: int = 50) -> List[Passage]:
+        """Return the ``k`` best passages for ``query``."""
+        if vector is not None:
+            import numpy as np
+        ranked = {}
+        expression = match_query(query)
+        with self._lock:
+            if expression:
+                rows = self._db.execute(
+                    "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                    (expression, candidates),
+                ).fetchall()
+                for rank, (chunk_id,) in enumerate(rows):
+                    ranked[chunk_id] = ranked.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+            if vector is not None and self._vectors_stale:
+                self._load_vectors()
+            if vector is not None and self._vectors is not None and vector.shape[0] == self._vectors.shape[1] and len(self._rows):
+                # Multiply the mapped file as is; fancy-indexing it first would copy every row
+                scores = (self._vectors @ vector)[self._rows]
+                top = np.argpartition(-scores, min(candidates, len(scores)) - 1)[:candidates]
+                for rank, index in enumerate(top[np.argsort(-scores[top])]):
+                    chunk_id = int(self._row_chunks[index])
+                    ranked[chunk_id] = ranked.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+            best = sorted(ranked.items(), key=lambda item: -item[1])[:k]
+            passages = []
+            for chunk_id, score in best:
+                row = self._db.execute(
+                    "SELECT documents.title, chunks.text FROM chunks JOIN documents ON documents.id = chunks.document WHERE chunks.id = ?",
+                    (chunk_id,),
+                ).fetchone()
+                # The vector map can trail a file that was replaced since it was loaded
+                if row is not None:
+                    passages.append(Passage(row[0], row[1], score))
+        return passages
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+            chunks, embedded = self._db.execute("SELECT COUNT(*), COUNT(vector_row) FROM chunks").fetchone()
+        return {"documents": documents, "chunks": chunks, "embedded": embedded}
+
+    def _ingest_file(self, path: str, key: str, stat, embed) -> int:
+        """Replace a file's chunks in one transaction, rolled back if anything fails."""
+        try:
+            self._remove_document(key)
+            # Size and mtime are filled in once the chunks are in, so a
+            # half-ingested file never looks up to date
+            document = self._writer.execute(
+                "INSERT INTO documents (path, title, size, mtime) VALUES (?, ?, -1, 0)",
+                (key, document_title(path)),
+            ).lastrowid
+            count = 0
+            batch = []
+            with open(path, encoding="utf-8", errors="replace") as lines:
+                for text in iter_chunks(lines, self.chunk_chars, self.overlap_chars):
+                    batch.append(text)
+                    if len(batch) == EMBED_BATCH:
+                        count += self._add_chunks(document, batch, embed)
+                        batch = []
+            if batch:
+                count += self._add_chunks(document, batch, embed)
+            self._writer.execute("UPDATE documents SET size = ?, mtime = ? WHERE id = ?", (stat.st_size, stat.st_mtime, document))
+            self._commit()
+        except Exception:
+            self._writer.rollback()
+            raise
+        return count
+
+    def _add_chunks(self, document: int, texts: List[str], embed) -> int:
+        vectors = embed(texts) if embed is not None else None
+        rows = self._append_vectors(vectors) if vectors is not None else [None] * len(texts)
+        for text, row in zip(texts, rows):
+            chunk_id = self._writer.execute(
+                "INSERT INTO chunks (document, text, vector_row) VALUES (?, ?, ?)", (document, text, row)
+            ).lastrowid
+            self._writer.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (chunk_id, text))
+        return len(texts)
+
+    def _commit(self):
+        """Commit the ingest connection and have the next search remap the vectors."""
+        with self._lock:
+            self._writer.commit()
+            self._vectors_stale = True
+
+    def _backfill(self, embed):
+        """Embed chunks ingested while embeddings were unavailable."""
+        while True:
+            missing = self._writer.execute("SELECT id, text FROM chunks WHERE vector_row IS NULL LIMIT ?", (EMBED_BATCH,)).fetchall()
+            if not missing:
+                return
+            vectors = embed([text for _, text in missing])
+            if vectors is None:
+                return
+            rows = self._append_vectors(vectors)
+            self._writer.executemany("UPDATE chunks SET vector_row = ? WHERE id = ?", [(row, chunk_id) for row, (chunk_id, _) in zip(rows, missing)])
+            self._commit()
+
+    def _append_vectors(self, vectors: np.ndarray) -> List[int]:
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        dim = self._dim(self._writer)
+        if dim is None:
+            dim = vectors.shape[1]
+            self._writer.execute("INSERT INTO settings (name, value) VALUES ('dim', ?)", (str(dim),))
+        elif dim != vectors.shape[1]:
+            raise ValueError(f"Embedding size changed from {dim} to {vectors.shape[1]}; delete the index to rebuild it")
+        with open(self._vector_path, "ab") as f:
+            start = f.tell() // (4 * dim)
+            f.write(vectors.tobytes())
+        return list(range(start, start + len(vectors)))
+
+    def _remove_document(self, key: str):
+        row = self._writer.execute("SELECT id FROM documents WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return
+        # Vector rows of removed chunks stay in the file but are no longer referenced
+        for chunk_id, text in self._writer.execute("SELECT id, text FROM chunks WHERE document = ?", row).fetchall():
+            self._writer.execute("INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)", (chunk_id, text))
+        self._writer.execute("DELETE FROM chunks WHERE document = ?", row)
+        self._writer.execute("DELETE FROM documents WHERE id = ?", row)
+
+    @staticmethod
+    def _dim(db: sqlite3.Connection) -> Optional[int]:
+        row = db.execute("SELECT value FROM settings WHERE name = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _load_vectors(self):
+        """Map the vector file; called with the lock held."""
+        import numpy as np
+
+        self._vectors_stale = False
+        dim = self._dim(self._db)
+        if dim is None or not os.path.exists(self._vector_path):
+            self._vectors = None
+            return
+        rows = os.path.getsize(self._vector_path) // (4 * dim)
+        self._vectors = np.memmap(self._vector_path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else None
+        live = np.array(self._db.execute("SELECT vector_row, id FROM chunks WHERE vector_row IS NOT NULL").fetchall(), dtype=np.int64).reshape(-1, 2)
+        self._rows, self._row_chunks = live[:, 0], live[:, 1]
+
+
+class IngestScheduler:
+    """Keep an index in step with a corpus directory from a daemon thread.
+
+    ``request(embed)`` starts an incremental ``ingest`` unless one is running
+    or the last one started less than ``interval`` seconds ago, so it is
+    cheap to call on every page view.
+    """
+
+    def __init__(self, index: PassageIndex, corpus_dir: str, interval: float = 300.0):
+        self.index = index
+        self.corpus_dir = corpus_dir
+        self.interval = interval
+        self.running = False
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def request(self, embed=None) -> bool:
+        """Start a background ingest if one is due; returns whether it started."""
+        with self._lock:
+            if self.running or not os.path.isdir(self.corpus_dir):
+                return False
+            if self.last_run is not None and time.monotonic() - self.last_run < self.interval:
+                return False
+            self.running = True
+            self.last_run = time.monotonic()
+        threading.Thread(target=self._run, args=(embed,), name="ayurparam-ingest", daemon=True).start()
+        return True
+
+    def _run(self, embed):
+        try:
+            self.last_result = self.index.ingest(self.corpus_dir, embed)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            with self._lock:
+                self.running = False
+
+
+def main():
+    import argparse
+
+    import requests
+
+    from ayurparam.semantic import Embedder
+
+    parser = argparse.ArgumentParser(description="Index a directory of .txt/.md texts for retrieval.")
+    parser.add_argument("corpus", help="directory of text files")
+    parser.add_argument("--index", default=os.path.join(".cache", "index"), help="index directory")
+    parser.add_argument("--ollama", default="http://localhost:11434", help="Ollama base URL used for embeddings")
+    parser.add_argument("--embed-model", default="nomic-embed-text", help="embedding model; empty for BM25 only")
+    args = parser.parse_args()
+
+    index = PassageIndex(args.index)
+    embed = None
+    if args.embed_model:
+        embedder = Embedder(requests.Session(), args.embed_model, timeout=120.0, retry_after=0.0)
+        embed = functools.partial(embedder.embed_many, args.ollama.rstrip("/"))
+    start = time.perf_counter()
+    result = index.ingest(args.corpus, embed, on_progress=lambda path: print(f"indexing {path}", flush=True))
+    print(f"{result['documents']} new or changed, {result['removed']} removed, {result['chunks']} chunks "
+          f"in {time.perf_counter() - start:.1f}s; index now has {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
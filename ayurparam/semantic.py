@@ -0,0 +1,201 @@
+"""Semantic answer cache: reuse answers to differently worded questions.
+
+NumPy and ``requests`` are imported on first use, so importing this module
+(for ``scope_id``) stays cheap on a cold start.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+    import requests
+
+# Key length of ResponseCache entries (hex SHA-256)
+KEY_BYTES = 64
+
+
+def scope_id(*parts) -> int:
+    """Hash the generation settings an answer depends on into an int64."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+class Embedder:
+    """Embed text with an Ollama embedding model.
+
+    Uses ``/api/embed`` and falls back to the older ``/api/embeddings``.
+    After a failure a server is skipped for ``retry_after`` seconds, so a
+    missing embedding model costs one request rather than one per question.
+    """
+
+    def __init__(self, session: requests.Session, model: str, timeout: float = 10.0, retry_after: float = 60.0):
+        self.session = session
+        self.model = model
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._failed = {}
+
+    def embed(self, base_url: str, text: str) -> Optional[np.ndarray]:
+        """Return the unit-length embedding of ``text``, or ``None`` on failure."""
+        vectors = self.embed_many(base_url, [text])
+        return None if vectors is None else vectors[0]
+
+    def embed_many(self, base_url: str, texts: List[str]) -> Optional[np.ndarray]:
+        """Return one unit-length row per text, or ``None`` on failure."""
+        import numpy as np
+        import requests
+
+        if time.monotonic() - self._failed.get(base_url, float("-inf")) < self.retry_after:
+            return None
+        try:
+            response = self.session.post(f"{base_url}/api/embed", json={"model": self.model, "input": texts}, timeout=self.timeout)
+            if response.status_code == 404 and "model" not in response.text:
+                vectors = []
+                for text in texts:
+                    response = self.session.post(f"{base_url}/api/embeddings", json={"model": self.model, "prompt": text}, timeout=self.timeout)
+                    response.raise_for_status()
+                    vectors.append(response.json()["embedding"])
+            else:
+                response.raise_for_status()
+                vectors = response.json()["embeddings"]
+        except (requests.RequestException, KeyError, IndexError, ValueError):
+            self._failed[base_url] = time.monotonic()
+            return None
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        if len(vectors) != len(texts) or not norms.all():
+            return None
+        return vectors / norms
+
+
+class Match(NamedTuple):
+    key: str
+    similarity: float
+
+
+class SemanticCache:
+    """Index of question embeddings pointing at ``ResponseCache`` keys.
+
+    Vectors are unit length and stored as rows of a float32 matrix, so a
+    lookup is one matrix-vector product (cosine similarity against every
+    entry) plus an argmax. With ``path`` set the matrix, keys and scopes are
+    memory-mapped ``.npy`` files in that directory and survive restarts.
+    Once ``max_entries`` is reached the oldest entries are overwritten.
+
+    Entries only match within the same ``scope`` (model and generation
+    options), and only at ``threshold`` cosine similarity or above.
+    """
+
+    def __init__(self, path: Optional[str] = None, embed_model: str = "", threshold: float = 0.92, max_entries: int = 100_000):
+        self.path = path
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.added = 0
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None
+        self._keys = None
+        self._scopes = None
+        self._lock = threading.Lock()
+        # Only state.json is read up front; the arrays are mapped on first use
+        self._pending_load = bool(path) and self._load_state()
+
+    @property
+    def size(self) -> int:
+        return min(self.added, self.max_entries)
+
+    def lookup(self, vector: np.ndarray, scope: int) -> Optional[Match]:
+        """Return the most similar entry in ``scope`` if it clears the threshold."""
+        import numpy as np
+
+        with self._lock:
+            self._load_arrays()
+            size = self.size
+            if size == 0 or vector.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._vectors[:size] @ vector
+            scores[self._scopes[:size] != scope] = -1.0
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return Match(self._keys[best].decode("ascii"), similarity)
+
+    def add(self, vector: np.ndarray, key: str, scope: int):
+        """Index ``vector`` as a question whose answer is cached under ``key``."""
+        with self._lock:
+            self._load_arrays()
+            if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+                # First entry, or the embedding model changed size: start over
+                self._allocate(vector.shape[0])
+            row = self.added % self.max_entries
+            self._vectors[row] = vector
+            self._keys[row] = key.encode("ascii")
+            self._scopes[row] = scope
+            self.added += 1
+            if self.path:
+                self._save_state()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": self.size, "hits": self.hits, "misses": self.misses}
+
+    def _files(self):
+        return (os.path.join(self.path, name) for name in ("vectors.npy", "keys.npy", "scopes.npy"))
+
+    def _allocate(self, dim: int):
+        import numpy as np
+
+        shapes = ((self.max_entries, dim), np.float32), ((self.max_entries,), f"S{KEY_BYTES}"), ((self.max_entries,), np.int64)
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            arrays = [np.lib.format.open_memmap(file, mode="w+", dtype=dtype, shape=shape) for file, (shape, dtype) in zip(self._files(), shapes)]
+        else:
+            arrays = [np.zeros(shape, dtype=dtype) for shape, dtype in shapes]
+        self._vectors, self._keys, self._scopes = arrays
+        self.added = 0
+
+    def _load_state(self) -> bool:
+        """Read the entry count; return whether there are arrays to map."""
+        try:
+            with open(os.path.join(self.path, "state.json"), encoding="utf-8") as f:
+                state = json.load(f)
+            if state["embed_model"] != self.embed_model:
+                return False
+            self.added = int(state["added"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def _load_arrays(self):
+        if not self._pending_load:
+            return
+        import numpy as np
+
+        self._pending_load = False
+        try:
+            arrays = [np.load(file, mmap_mode="r+") for file in self._files()]
+        except (OSError, ValueError):
+            arrays = None
+        if arrays is None or arrays[0].shape[0] != self.max_entries:
+            self.added = 0
+            return
+        self._vectors, self._keys, self._scopes = arrays
+
+    def _save_state(self):
+        state_path = os.path.join(self.path, "state.json")
+        tmp = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"embed_model": self.embed_model, "added": self.added}, f)
+        os.replace(tmp, state_path)
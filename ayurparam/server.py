@@ -0,0 +1,552 @@
+"""Headless HTTP API for the answering pipeline, built on asyncio.
+
+Serves the same pipeline as the Streamlit app (answer bank, prompt format,
+single-flight generation, admission control, response cache, optional
+grounding) without a browser session per request:
+
+- ``POST /v1/answer`` takes ``{"question": ...}`` plus optional ``model``,
+  ``max_tokens``, ``temperature``, ``top_p``, ``top_k``, ``cache``,
+  ``ground`` and ``faq`` (false to skip the answer bank). With ``"stream": true`` the answer is sent as NDJSON lines
+  ``{"response": text}`` followed by one ``{"done": true, ...}`` record;
+  otherwise one JSON object is returned.
+- ``POST /v1/batch`` takes a JSONL body (or CSV with ``Content-Type:
+  text/csv``) in the format of the app's batch upload and streams one NDJSON
+  record per question as answers finish. Options go in the query string,
+  e.g. ``?concurrency=8&temperature=0``.
+- ``GET /health`` reports the backends and queue; ``GET /metrics`` serves
+  the Prometheus metrics.
+
+HTTP/1.1 keep-alive and chunked responses are handled directly on asyncio
+streams. Generations run on the pipeline's threads; a client that
+disconnects mid-stream leaves its generation, which is cancelled unless
+another request shares it. Start it with:
+
+    python -m ayurparam.server --ollama http://localhost:11434 --port 8600
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from ayurparam.batch import iter_questions, run_batch
+from ayurparam.cache import make_key
+from ayurparam.cleaning import StreamCleaner
+from ayurparam.metrics import summarize
+from ayurparam.pipeline import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_K,
+    DEFAULT_TOP_P,
+    FOLLOW_HEARTBEAT,
+    answer_question,
+    format_prompt,
+    ground_question,
+    start_generation,
+)
+from ayurparam.settings import (
+    ADAPTIVE_OUTPUT,
+    BUDGET_LOG,
+    BATCH_MAX_CONCURRENCY,
+    CACHE_MAX_MB,
+    CACHE_MEMORY_ITEMS,
+    CACHE_PATH,
+    CACHE_TTL_HOURS,
+    EMBED_MODEL,
+    FAQ_DB,
+    FAQ_FILE,
+    FAQ_MIN_OVERLAP,
+    HEALTH_INTERVAL,
+    HEDGE,
+    HEDGE_MAX_RATE,
+    HEDGE_PERCENTILE,
+    INDEX_DIR,
+    KEEP_ALIVE,
+    MAX_CONCURRENT,
+    MAX_NUM_CTX,
+    MAX_QUEUE_WAIT,
+    METRICS_FILE,
+    NUM_CTX,
+    OLLAMA_URLS,
+    RETRIEVAL_TOP_K,
+    SERVER_HOST,
+    SERVER_PORT,
+    WARMUP_INTERVAL,
+)
+
+# Largest request body accepted (batch files included)
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Service:
+    """The pipeline plus the resources one server process shares."""
+
+    def __init__(self, ollama_urls: tuple, model: str = DEFAULT_MODEL, use_cache: bool = True, workers: int = 64):
+        from ayurparam.admission import AdmissionController
+        from ayurparam.backends import BackendRegistry, base_url
+        from ayurparam.budget import TokenBudget
+        from ayurparam.cache import ResponseCache
+        from ayurparam.faq import FaqBank
+        from ayurparam.hedging import Hedger
+        from ayurparam.metrics import GenerationMetrics
+        from ayurparam.pipeline import create_session
+        from ayurparam.singleflight import SingleFlight
+        from ayurparam.warmup import ModelWarmer
+
+        self.ollama_urls = ollama_urls
+        self.model = model
+        self.session = create_session(pool_size=max(workers, 10))
+        self.registry = BackendRegistry(self.session, health_interval=HEALTH_INTERVAL)
+        self.flights = SingleFlight()
+        self.admission = AdmissionController(MAX_CONCURRENT, MAX_QUEUE_WAIT)
+        self.metrics = GenerationMetrics(METRICS_FILE or None)
+        self.cache = ResponseCache(CACHE_PATH, max_memory_items=CACHE_MEMORY_ITEMS, max_disk_bytes=int(CACHE_MAX_MB * 1024 * 1024), ttl=CACHE_TTL_HOURS * 3600) if use_cache else None
+        self.budget = TokenBudget(self.session, num_ctx=NUM_CTX, max_num_ctx=MAX_NUM_CTX, adaptive=ADAPTIVE_OUTPUT, log_path=BUDGET_LOG or None)
+        self.warmer = ModelWarmer(self.session, keep_alive=KEEP_ALIVE, interval=WARMUP_INTERVAL, budget=self.budget)
+        self.hedger = Hedger(percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE) if HEDGE else None
+        self.faq = FaqBank(FAQ_DB, min_overlap=FAQ_MIN_OVERLAP, metrics=self.metrics) if FAQ_FILE or os.path.exists(FAQ_DB) else None
+        if self.faq is not None and FAQ_FILE:
+            self.faq.start_load(FAQ_FILE)
+        # Following a generation blocks, so each active request holds one worker
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ayurparam-server")
+        self._index = None
+        self._embedder = None
+        for url in ollama_urls:
+            self.registry.get(url)
+            self.warmer.watch(base_url(url), model)
+
+    def options(self, values: dict) -> dict:
+        """Validate generation options, filling in the app's defaults."""
+        try:
+            return {
+                "model": str(values.get("model") or self.model),
+                "max_tokens": int(values.get("max_tokens", DEFAULT_MAX_TOKENS)),
+                "temperature": float(values.get("temperature", DEFAULT_TEMPERATURE)),
+                "top_p": float(values.get("top_p", DEFAULT_TOP_P)),
+                "top_k": int(values.get("top_k", DEFAULT_TOP_K)),
+            }
+        except (TypeError, ValueError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid option: {e}")
+
+    def use_cache(self, options: dict, values: dict) -> bool:
+        # Same rule as the app: greedy answers are always cached, sampled ones on request
+        return self.cache is not None and (options["temperature"] == 0 or flag(values.get("cache")))
+
+    def search(self, question: str) -> list:
+        """Return grounding passages for ``question``; blocking."""
+        from ayurparam.retrieval import PassageIndex
+        from ayurparam.semantic import Embedder
+
+        if self._index is None:
+            self._index = PassageIndex(INDEX_DIR)
+            self._embedder = Embedder(self.session, EMBED_MODEL) if EMBED_MODEL else None
+        vector = None
+        if self._embedder is not None:
+            vector = self._embedder.embed(self.registry.pick(self.ollama_urls).base_url, question)
+        return self._index.search(question, RETRIEVAL_TOP_K, vector)
+
+    def validate(self, values: dict) -> tuple:
+        """Return ``(question, options)`` for an answer request, or raise ``HTTPError``."""
+        question = str(values.get("question") or "").strip()
+        if not question:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing 'question'")
+        return question, self.options(values)
+
+    async def answer(self, values: dict, owner: str, on_text=None) -> dict:
+        """Answer one request; ``on_text(delta)`` is awaited for each piece of cleaned text.
+
+        Returns the final record: the full answer with timings, or an error.
+        """
+        loop = asyncio.get_running_loop()
+        question, options = self.validate(values)
+        if self.faq is not None and flag(values.get("faq", True)):
+            match = await loop.run_in_executor(self.pool, self.faq.lookup, question)
+            if match is not None:
+                if on_text is not None:
+                    await on_text(match.answer)
+                return {"answer": match.answer, "cached": False, "faq": {"question": match.question, "source": match.source, "score": round(match.score, 3)}, "sources": []}
+        passages = await loop.run_in_executor(self.pool, self.search, question) if flag(values.get("ground")) else []
+        sources = [{"title": p.title, "text": p.text} for p in passages]
+        prompt = format_prompt(ground_question(question, passages))
+        use_cache = self.use_cache(options, values)
+        key = make_key(options["model"], prompt, options["max_tokens"], options["temperature"], options["top_p"], options["top_k"])
+        if use_cache:
+            cached = await loop.run_in_executor(self.pool, self.cache.get, key)
+            if cached is not None:
+                if on_text is not None:
+                    await on_text(cached)
+                return {"answer": cached, "cached": True, "sources": sources}
+
+        flight = start_generation(
+            prompt, self.ollama_urls, options["model"], options["max_tokens"], options["temperature"], options["top_p"], options["top_k"],
+            self.flights, self.session, self.registry, metrics=self.metrics, admission=self.admission, owner=owner, budget=self.budget, hedger=self.hedger,
+        )
+        chunks = asyncio.Queue()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for chunk in flight.follow(heartbeat=FOLLOW_HEARTBEAT):
+                    if stop.is_set():
+                        return
+                    if chunk:
+                        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+
+        pumping = loop.run_in_executor(self.pool, pump)
+        cleaner = StreamCleaner()
+        parts = []
+        try:
+            while (chunk := await chunks.get()) is not None:
+                text = cleaner.feed(chunk)
+                if text:
+                    parts.append(text)
+                    if on_text is not None:
+                        await on_text(text)
+            if flight.error:
+                return {"error": flight.error}
+            text = cleaner.flush()
+            if text:
+                parts.append(text)
+                if on_text is not None:
+                    await on_text(text)
+        finally:
+            # Also runs when the client went away: the last follower to leave
+            # cancels the upstream generation
+            stop.set()
+            self.flights.leave(flight)
+            await asyncio.shield(pumping)
+
+        answer = "".join(parts)
+        meta = flight.meta
+        if "backend_url" in meta:
+            from ayurparam.backends import base_url
+
+            self.warmer.observe(base_url(meta["backend_url"]), options["model"], meta)
+        if use_cache:
+            await loop.run_in_executor(self.pool, self.cache.put, key, answer)
+        return {"answer": answer, "cached": False, "timings": summarize(meta), "budget": meta.get("budget"), "hedged": meta.get("hedged", False), "sources": sources}
+
+    def health(self) -> dict:
+        backends = self.registry.snapshot(self.ollama_urls)
+        return {
+            "status": "ok" if any(b["healthy"] for b in backends) else "degraded",
+            "model": self.model,
+            "backends": backends,
+            "generations": self.flights.stats(),
+            "queue": self.admission.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "budget": self.budget.stats(),
+            "hedging": self.hedger.stats() if self.hedger is not None else None,
+            "faq": self.faq.stats() if self.faq is not None else None,
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.registry.close()
+        self.warmer.close()
+
+
+def flag(value) -> bool:
+    """Interpret a JSON or query-string flag."""
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+class _QueueWriter:
+    """File-like ``out`` for ``run_batch`` that hands records to the event loop."""
+
+    def __init__(self, loop, queue: asyncio.Queue, stop: threading.Event):
+        self.loop = loop
+        self.queue = queue
+        self.stop = stop
+
+    def write(self, text: str):
+        if self.stop.is_set():
+            # Unwinds run_batch, which drops queued questions and sets ``stop``
+            raise ConnectionError("client disconnected")
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+    def flush(self):
+        pass
+
+
+class Server:
+    """A minimal HTTP/1.1 server exposing a ``Service``."""
+
+    def __init__(self, service: Service):
+        self.service = service
+        # Connections whose current response has sent its headers
+        self._streaming = set()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if isinstance(peer, tuple) else "local"
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    await self.send_json(writer, HTTPStatus.LENGTH_REQUIRED, {"error": "Send the body with a Content-Length"}, False)
+                    break
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.send_json(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"Body larger than {MAX_BODY_BYTES} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                # Fair queueing is per client: an explicit id, or the address
+                owner = headers.get("x-client-id") or client
+                try:
+                    await self.dispatch(reader, writer, method, target, headers, body, owner, keep_alive)
+                except HTTPError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    traceback.print_exc(file=sys.stderr)
+                    # Half a stream cannot be followed by a status line; closing ends it
+                    if writer not in self._streaming:
+                        await self.send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Error: {e}"}, False)
+                    break
+                finally:
+                    self._streaming.discard(writer)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._streaming.discard(writer)
+            writer.close()
+
+    async def dispatch(self, reader, writer, method: str, target: str, headers: dict, body: bytes, owner: str, keep_alive: bool):
+        url = urlsplit(target)
+        routes = {
+            "/v1/answer": ("POST", self.answer),
+            "/v1/batch": ("POST", self.batch),
+            "/health": ("GET", self.health),
+            "/metrics": ("GET", self.metrics),
+        }
+        if url.path not in routes:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown path {url.path}")
+        allowed, handler = routes[url.path]
+        if method != allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {allowed} for {url.path}")
+        await handler(reader, writer, dict(parse_qsl(url.query)), headers, body, owner, keep_alive)
+
+    async def answer(self, reader, writer, query: dict, headers: dict, body: bytes, owner: str, keep_alive: bool):
+        try:
+            values = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        if not isinstance(values, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        if not flag(values.get("stream")):
+            result = await self.until_disconnect(reader, self.service.answer(values, owner))
+            await self.send_json(writer, error_status(result.get("error")), result, keep_alive)
+            return
+
+        # Bad requests are refused before the 200 and the stream headers go out
+        self.service.validate(values)
+        await self.start_stream(writer, "application/x-ndjson", keep_alive)
+
+        async def send_text(text):
+            await self.send_chunk(writer, json.dumps({"response": text}, ensure_ascii=False) + "\n")
+
+        try:
+            result = await self.service.answer(values, owner, send_text)
+        except HTTPError as e:
+            result = {"error": str(e)}
+        except ConnectionError:
+            raise
+        except Exception as e:
+            result = {"error": f"Error: {e}"}
+        result["done"] = True
+        await self.send_chunk(writer, json.dumps(result, ensure_ascii=False) + "\n")
+        await self.end_stream(writer)
+
+    async def until_disconnect(self, reader, coroutine):
+        """Await ``coroutine``, cancelling it if the client closes the connection first.
+
+        A streamed answer notices a departed client when a write fails; a
+        plain one writes nothing until it is done, so the connection is
+        watched instead.
+        """
+        task = asyncio.ensure_future(coroutine)
+        try:
+            while True:
+                done, _ = await asyncio.wait((task,), timeout=FOLLOW_HEARTBEAT)
+                if done:
+                    return task.result()
+                if reader.at_eof() or reader.exception() is not None:
+                    raise ConnectionError("client disconnected")
+        finally:
+            if not task.done():
+                # Leaving the flight cancels the generation unless another client follows it
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def batch(self, reader, writer, query: dict, headers: dict, body: bytes, owner: str, keep_alive: bool):
+        service = self.service
+        options = service.options(query)
+        try:
+            concurrency = min(max(int(query.get("concurrency", 4)), 1), BATCH_MAX_CONCURRENCY)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid concurrency")
+        filename = "batch.csv" if headers.get("content-type", "").startswith("text/csv") else "batch.jsonl"
+
+        loop = asyncio.get_running_loop()
+        records = asyncio.Queue()
+        stop = threading.Event()
+        answer = partial(
+            answer_question,
+            ollama_urls=service.ollama_urls,
+            model_name=options["model"],
+            max_tokens=options["max_tokens"],
+            temperature=options["temperature"],
+            top_p=options["top_p"],
+            top_k=options["top_k"],
+            cache=service.cache,
+            use_cache=service.use_cache(options, query),
+            flights=service.flights,
+            session=service.session,
+            registry=service.registry,
+            metrics=service.metrics,
+            stop=stop,
+            admission=service.admission,
+            # A separate queue lane, so a batch takes turns with single questions
+            owner=f"{owner}:batch",
+            budget=service.budget,
+            hedger=service.hedger,
+            faq=service.faq if flag(query.get("faq", True)) else None,
+        )
+
+        def run():
+            try:
+                return run_batch(iter_questions(io.BytesIO(body), filename), answer, _QueueWriter(loop, records, stop), concurrency, stop=stop)
+            finally:
+                loop.call_soon_threadsafe(records.put_nowait, None)
+
+        # run_batch has its own worker pool; it only needs a thread to drive it
+        running = loop.run_in_executor(None, run)
+        await self.start_stream(writer, "application/x-ndjson", keep_alive)
+        try:
+            while (record := await records.get()) is not None:
+                await self.send_chunk(writer, record)
+            await self.end_stream(writer)
+        finally:
+            stop.set()
+            try:
+                await asyncio.shield(running)
+            except ConnectionError:
+                pass
+
+    async def health(self, reader, writer, query: dict, headers: dict, body: bytes, owner: str, keep_alive: bool):
+        await self.send_json(writer, HTTPStatus.OK, self.service.health(), keep_alive)
+
+    async def metrics(self, reader, writer, query: dict, headers: dict, body: bytes, owner: str, keep_alive: bool):
+        payload = self.service.metrics.render().encode("utf-8")
+        await self.send(writer, HTTPStatus.OK, "text/plain; version=0.0.4; charset=utf-8", payload, keep_alive)
+
+    async def send(self, writer, status: int, content_type: str, payload: bytes, keep_alive: bool):
+        writer.write(self._head(status, content_type, keep_alive, f"Content-Length: {len(payload)}") + payload)
+        await writer.drain()
+
+    async def send_json(self, writer, status: int, value, keep_alive: bool):
+        await self.send(writer, status, "application/json", json.dumps(value, ensure_ascii=False).encode("utf-8"), keep_alive)
+
+    async def start_stream(self, writer, content_type: str, keep_alive: bool):
+        self._streaming.add(writer)
+        writer.write(self._head(HTTPStatus.OK, content_type, keep_alive, "Transfer-Encoding: chunked"))
+        await writer.drain()
+
+    async def send_chunk(self, writer, text: str):
+        data = text.encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def end_stream(self, writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _head(status: int, content_type: str, keep_alive: bool, length_header: str) -> bytes:
+        status = HTTPStatus(status)
+        return (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"{length_header}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1")
+
+
+def error_status(error: Optional[str]) -> int:
+    """HTTP status for a pipeline result: 503 when the queue turned it away, 502 for upstream errors."""
+    if not error:
+        return HTTPStatus.OK
+    if error.startswith("Error: Server busy"):
+        return HTTPStatus.SERVICE_UNAVAILABLE
+    return HTTPStatus.BAD_GATEWAY
+
+
+async def serve(service: Service, host: str, port: int):
+    server = await asyncio.start_server(Server(service).handle, host, port, limit=1024 * 1024)
+    print(f"Serving on http://{host}:{port} for {', '.join(service.ollama_urls)}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    import argparse
+
+    from ayurparam.pipeline import parse_urls
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ollama", default=OLLAMA_URLS, help="Ollama URL(s), comma-separated")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=64, help="requests followed at the same time")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the response cache")
+    args = parser.parse_args()
+
+    ollama_urls = parse_urls(args.ollama)
+    if not ollama_urls:
+        parser.error("pass --ollama or set AYURPARAM_OLLAMA_URL")
+    service = Service(ollama_urls, args.model, use_cache=not args.no_cache, workers=args.workers)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Settings shared by the app, the HTTP server and the CLI.
+
+Every setting can be overridden with the environment variable named next
+to it. This module does not import Streamlit, so headless entry points can
+use it.
+"""
+
+import os
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CACHE_DIR = os.path.join(_APP_DIR, ".cache")
+
+# Process-wide HTTP client settings
+HTTP_POOL_SIZE = int(os.environ.get("AYURPARAM_POOL_SIZE", "10"))
+HTTP_MAX_RETRIES = int(os.environ.get("AYURPARAM_MAX_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("AYURPARAM_BACKOFF_FACTOR", "0.5"))
+
+# Seconds between /api/tags health probes of each backend
+HEALTH_INTERVAL = float(os.environ.get("AYURPARAM_HEALTH_INTERVAL", "15"))
+
+# How long Ollama keeps the model loaded after a request, and how often the
+# warmer checks that it still is
+KEEP_ALIVE = os.environ.get("AYURPARAM_KEEP_ALIVE", "30m")
+WARMUP_INTERVAL = float(os.environ.get("AYURPARAM_WARMUP_INTERVAL", "60"))
+
+# Token budgeting: the context window requests are sent with, the largest
+# it may grow to for long prompts, whether the output length adapts to the
+# kind of question, and a JSONL log of every decision (empty to disable)
+NUM_CTX = int(os.environ.get("AYURPARAM_NUM_CTX", "4096"))
+MAX_NUM_CTX = int(os.environ.get("AYURPARAM_MAX_NUM_CTX", "16384"))
+ADAPTIVE_OUTPUT = os.environ.get("AYURPARAM_ADAPTIVE_OUTPUT", "1").lower() not in ("0", "false", "no", "off")
+BUDGET_LOG = os.environ.get("AYURPARAM_BUDGET_LOG", os.path.join(_CACHE_DIR, "budget.jsonl"))
+
+# Answer bank of vetted question/answer pairs consulted before the model:
+# a JSONL or CSV file loaded into it at startup when it has changed, the
+# database, and how many of the asked question's content words a stored
+# question must share
+FAQ_FILE = os.environ.get("AYURPARAM_FAQ_FILE", "")
+FAQ_DB = os.environ.get("AYURPARAM_FAQ_DB", os.path.join(_CACHE_DIR, "faq.sqlite3"))
+FAQ_MIN_OVERLAP = float(os.environ.get("AYURPARAM_FAQ_MIN_OVERLAP", "0.8"))
+
+# Hedged requests across backends: off by default; the percentile of recent
+# times to first token after which a second backend is tried, and the
+# largest share of requests that may be hedged
+HEDGE = os.environ.get("AYURPARAM_HEDGE", "0").lower() not in ("0", "false", "no", "off")
+HEDGE_PERCENTILE = float(os.environ.get("AYURPARAM_HEDGE_PERCENTILE", "95"))
+HEDGE_MAX_RATE = float(os.environ.get("AYURPARAM_HEDGE_MAX_RATE", "0.1"))
+
+# Metrics exposition: a Prometheus text file, and optionally an HTTP port
+METRICS_FILE = os.environ.get("AYURPARAM_METRICS_FILE", os.path.join(_CACHE_DIR, "metrics.prom"))
+METRICS_PORT = int(os.environ.get("AYURPARAM_METRICS_PORT", "0"))
+
+# Response cache settings
+CACHE_PATH = os.environ.get("AYURPARAM_CACHE_PATH", os.path.join(_CACHE_DIR, "responses.sqlite3"))
+CACHE_MEMORY_ITEMS = int(os.environ.get("AYURPARAM_CACHE_MEMORY_ITEMS", "256"))
+CACHE_MAX_MB = float(os.environ.get("AYURPARAM_CACHE_MAX_MB", "64"))
+CACHE_TTL_HOURS = float(os.environ.get("AYURPARAM_CACHE_TTL_HOURS", "168"))
+
+# Semantic cache settings
+EMBED_MODEL = os.environ.get("AYURPARAM_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_PATH = os.environ.get("AYURPARAM_SEMANTIC_CACHE_PATH", os.path.join(_CACHE_DIR, "semantic"))
+SEMANTIC_THRESHOLD = float(os.environ.get("AYURPARAM_SEMANTIC_THRESHOLD", "0.92"))
+SEMANTIC_MAX_ENTRIES = int(os.environ.get("AYURPARAM_SEMANTIC_MAX_ENTRIES", "100000"))
+
+# Retrieval settings
+CORPUS_DIR = os.environ.get("AYURPARAM_CORPUS_DIR", os.path.join(_APP_DIR, "corpus"))
+INDEX_DIR = os.environ.get("AYURPARAM_INDEX_DIR", os.path.join(_CACHE_DIR, "index"))
+RETRIEVAL_TOP_K = int(os.environ.get("AYURPARAM_RETRIEVAL_TOP_K", "4"))
+CORPUS_SCAN_INTERVAL = float(os.environ.get("AYURPARAM_CORPUS_SCAN_INTERVAL", "300"))
+
+# Admission control settings
+MAX_CONCURRENT = int(os.environ.get("AYURPARAM_MAX_CONCURRENT", "4"))
+MAX_QUEUE_WAIT = float(os.environ.get("AYURPARAM_MAX_QUEUE_WAIT", "120"))
+SESSION_RATE_LIMIT = float(os.environ.get("AYURPARAM_SESSION_RATE_LIMIT", "0"))
+
+# Answer history settings
+HISTORY_DIR = os.environ.get("AYURPARAM_HISTORY_DIR", os.path.join(_CACHE_DIR, "history"))
+HISTORY_MAX_ENTRIES = int(os.environ.get("AYURPARAM_HISTORY_MAX_ENTRIES", "20"))
+HISTORY_IDLE_TTL = float(os.environ.get("AYURPARAM_HISTORY_IDLE_TTL", "1800"))
+
+# Batch mode settings
+BATCH_DIR = os.environ.get("AYURPARAM_BATCH_DIR", os.path.join(_CACHE_DIR, "batches"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("AYURPARAM_BATCH_MAX_CONCURRENCY", "16"))
+
+# Prewarming of the starting questions: an optional file of questions (one
+# per line) replacing the built-in ones, seconds between idle checks (0 to
+# disable), the age at which answers are generated again and the model
+# warmed on the AYURPARAM_OLLAMA_URL servers (empty for the default model)
+PREWARM_FILE = os.environ.get("AYURPARAM_PREWARM_FILE", "")
+PREWARM_INTERVAL = float(os.environ.get("AYURPARAM_PREWARM_INTERVAL", "30"))
+PREWARM_REFRESH_HOURS = float(os.environ.get("AYURPARAM_PREWARM_REFRESH_HOURS", "24"))
+PREWARM_MODEL = os.environ.get("AYURPARAM_PREWARM_MODEL", "")
+
+# Headless server and CLI: default Ollama URL(s), comma-separated, and listen address
+OLLAMA_URLS = os.environ.get("AYURPARAM_OLLAMA_URL", "")
+SERVER_HOST = os.environ.get("AYURPARAM_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("AYURPARAM_SERVER_PORT", "8600"))
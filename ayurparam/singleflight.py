@@ -0,0 +1,144 @@
+"""Coalescing of identical in-flight generations into one upstream request."""
+
+import threading
+from typing import Callable, Iterator, Optional
+
+
+class Flight:
+    """One upstream generation whose chunks any number of followers can read.
+
+    Chunks are kept for the lifetime of the flight so a follower that joins
+    late first receives everything produced so far and then follows live.
+    """
+
+    __slots__ = ('key', 'chunks', 'meta', 'done', 'error', 'followers', 'cancelled', 'ticket', '_cond')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks = []
+        # Final response fields from Ollama (context, eval counts, durations)
+        self.meta = {}
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self.cancelled = threading.Event()
+        # Admission ticket while the flight is queued for an upstream slot
+        self.ticket = None
+        self._cond = threading.Condition()
+
+    def cancel(self):
+        """Ask the producer to stop; it drops the upstream request at its next chunk."""
+        self.cancelled.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def publish(self, chunk: str):
+        """Append a chunk and wake every follower."""
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: str = None):
+        """Mark the generation complete, optionally with an ``"Error: ..."`` message."""
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self, heartbeat: Optional[float] = None) -> Iterator[str]:
+        """Yield every chunk, past and future, until the flight is done.
+
+        With ``heartbeat`` set, an empty string is yielded whenever no chunk
+        arrived for that many seconds, so the caller gets a chance to notice
+        it should stop. Check ``error`` once the iterator is exhausted.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self.chunks) and not self.done:
+                    self._cond.wait(heartbeat)
+                pending = self.chunks[index:]
+                finished = self.done
+            index += len(pending)
+            if pending:
+                yield from pending
+            elif not finished:
+                yield ""
+            if finished and index >= len(self.chunks):
+                return
+
+    def result(self) -> str:
+        """Wait for the flight and return the full text, or its error message."""
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+            return self.error if self.error else "".join(self.chunks)
+
+
+class SingleFlight:
+    """Process-wide registry of running generations keyed by request identity.
+
+    ``join(key, producer)`` returns the running ``Flight`` for ``key`` or
+    starts a new one, running ``producer(flight)`` on a daemon thread. The
+    producer publishes chunks, fills ``flight.meta`` and raises on failure;
+    it should stop once ``flight.cancelled`` is set. Every ``join`` must be
+    paired with a ``leave``: when the last follower leaves an unfinished
+    flight, the flight is cancelled. Finished flights are forgotten, so
+    later identical requests start a fresh generation (or hit the response
+    cache).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+        self.cancelled = 0
+
+    def join(self, key: str, producer: Callable[[Flight], None]) -> Flight:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.joined += 1
+                return flight
+            flight = self._flights[key] = Flight(key)
+            flight.followers = 1
+            self.started += 1
+
+        threading.Thread(target=self._run, args=(flight, producer), name="ayurparam-flight", daemon=True).start()
+        return flight
+
+    def leave(self, flight: Flight):
+        """Detach one follower, cancelling the flight if nobody is left."""
+        with self._lock:
+            flight.followers -= 1
+            if flight.followers > 0 or flight.done:
+                return
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            self.cancelled += 1
+        flight.cancel()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined, "cancelled": self.cancelled}
+
+    def _run(self, flight: Flight, producer):
+        error = None
+        try:
+            producer(flight)
+        except Exception as e:
+            message = str(e)
+            error = message if message.startswith("Error:") else f"Error: {message}"
+        finally:
+            if flight.cancelled.is_set():
+                error = "Error: Generation cancelled"
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+            flight.finish(error)
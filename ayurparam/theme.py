@@ -0,0 +1,442 @@
+"""Theme colors and the precompiled stylesheet for each theme."""
+
+from functools import lru_cache
+
+THEMES = ('dark', 'light')
+
+
+def get_theme_colors(theme):
+    """Return color scheme based on selected theme"""
+    if theme == 'dark':
+        return {
+            'gradient_start': '#000000',
+            'gradient_mid': '#1a1a1a',
+            'gradient_end': '#0a0a0a',
+            'primary': '#d4af37',  # Gold
+            'accent': '#f4e4b7',   # Light gold
+            'secondary': '#00d4ff', # Cyan accent
+            'bg_overlay': 'rgba(0, 0, 0, 0.8)',
+            'glass_bg': 'rgba(255, 255, 255, 0.05)',
+            'glass_border': 'rgba(212, 175, 55, 0.3)',
+            'text_primary': '#ffffff',
+            'text_secondary': '#d1d5db',
+            'card_bg': 'rgba(255, 255, 255, 0.08)',
+            'response_bg': 'rgba(212, 175, 55, 0.1)',
+            'response_border': '#d4af37',
+        }
+    else:  # light theme
+        return {
+            'gradient_start': '#ffffff',
+            'gradient_mid': '#f0f0f0',
+            'gradient_end': '#e5e5e5',
+            'primary': '#000000',  # Black for high contrast default text
+            'accent': '#d4af37',   # Gold accent
+            'secondary': '#0ea5e9', 
+            'bg_overlay': 'rgba(255, 255, 255, 0.98)',
+            'glass_bg': 'rgba(255, 255, 255, 0.98)',
+            'glass_border': 'rgba(0, 0, 0, 0.1)',
+            'text_primary': '#000000', # Pure black for maximum readability
+            'text_secondary': '#374151', # Dark gray
+            'card_bg': '#ffffff', # Pure white background for inputs
+            'response_bg': 'rgba(240, 240, 240, 0.8)',
+            'response_border': '#d4af37',
+            'input_bg': '#ffffff', # Distinct input background
+            'input_text': '#000000', # Dark text for inputs
+            'sidebar_text': '#000000' # Sidebar text
+        }
+
+
+def build_stylesheet(theme):
+    """Return the full ``<style>`` block for ``theme``."""
+    colors = get_theme_colors(theme)
+    return f"""
+<style>
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=Playfair+Display:wght@400;500;600;700;800&display=swap');
+    
+    .stApp {{
+        background: linear-gradient(135deg, {colors['gradient_start']} 0%, {colors['gradient_mid']} 50%, {colors['gradient_end']} 100%);
+        background-attachment: fixed;
+        font-family: 'Inter', sans-serif;
+        color: {colors['text_primary']} !important;
+    }}
+    
+    /* General text visibility ensuring all labels and inputs are readable */
+    p, label, h1, h2, h3, h4, h5, h6, li, span {{
+        color: {colors['text_primary']} !important;
+    }}
+    
+    /* Sidebar specific styling */
+    section[data-testid="stSidebar"] {{
+        background: {colors['gradient_start']};
+        border-right: 1px solid {colors['glass_border']};
+    }}
+    
+    section[data-testid="stSidebar"] p, 
+    section[data-testid="stSidebar"] span, 
+    section[data-testid="stSidebar"] label {{
+        color: {colors['text_primary']} !important;
+    }}
+
+    .stApp::before {{
+        content: '';
+        position: fixed;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background: 
+            radial-gradient(ellipse at 20% 80%, {colors['response_bg']} 0%, transparent 60%),
+            radial-gradient(ellipse at 80% 20%, rgba(0, 212, 255, 0.05) 0%, transparent 60%);
+        pointer-events: none;
+        z-index: 0;
+    }}
+    
+    .main-header {{
+        text-align: center;
+        padding: 3rem 0 2rem 0;
+        border-bottom: 1px solid {colors['glass_border']};
+        margin-bottom: 2rem;
+    }}
+    
+    .main-title {{
+        font-family: 'Playfair Display', serif;
+        font-size: 4rem;
+        font-weight: 800;
+        background: linear-gradient(135deg, {colors['primary']} 0%, {colors['accent']} 50%, {colors['primary']} 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        background-clip: text;
+        margin-bottom: 0.8rem;
+        letter-spacing: 2px;
+        text-shadow: 0 4px 20px {colors['response_bg']};
+    }}
+    
+    .subtitle {{
+        font-size: 1.1rem;
+        color: {colors['text_secondary']};
+        font-weight: 400;
+        letter-spacing: 2px;
+        text-transform: uppercase;
+    }}
+    
+    .glass-card {{
+        background: {colors['glass_bg']};
+        backdrop-filter: blur(20px);
+        -webkit-backdrop-filter: blur(20px);
+        border: 1px solid {colors['glass_border']};
+        border-radius: 16px;
+        padding: 2.5rem;
+        margin: 1.5rem 0;
+        box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
+        transition: all 0.3s ease;
+    }}
+    
+    .glass-card:hover {{
+        transform: translateY(-3px);
+        box-shadow: 0 15px 50px rgba(0, 0, 0, 0.15);
+        border-color: {colors['primary']};
+    }}
+    
+    .response-area {{
+        background: {colors['response_bg']};
+        backdrop-filter: blur(15px);
+        -webkit-backdrop-filter: blur(15px);
+        border: 1px solid {colors['response_border']};
+        border-left: 4px solid {colors['primary']};
+        border-radius: 12px;
+        padding: 2rem 2.5rem;
+        margin: 2rem 0;
+        color: {colors['text_primary']};
+        font-size: 1.05rem;
+        line-height: 2;
+        box-shadow: 0 8px 30px {colors['response_bg']};
+        animation: fadeIn 0.6s ease-out;
+    }}
+    
+    .response-area h1, .response-area h2, .response-area h3,
+    .response-area h4, .response-area h5, .response-area h6 {{
+        color: {colors['text_primary']} !important;
+        margin-top: 1.8rem;
+        margin-bottom: 1rem;
+        font-weight: 700;
+    }}
+    
+    .response-area h2 {{
+        border-bottom: 2px solid {colors['primary']};
+        padding-bottom: 0.5rem;
+    }}
+    
+    .response-area p {{
+        color: {colors['text_primary']} !important;
+        margin-bottom: 1.2rem;
+    }}
+    
+    .response-area ul, .response-area ol {{
+        color: {colors['text_primary']} !important;
+        margin-left: 2rem;
+        margin-bottom: 1.5rem;
+    }}
+    
+    .response-area li {{
+        color: {colors['text_primary']} !important;
+        margin-bottom: 0.8rem;
+        padding-left: 0.5rem;
+    }}
+    
+    .response-area li::marker {{
+        color: {colors['primary']};
+    }}
+    
+    .response-area strong {{
+        color: {colors['primary']} !important;
+        font-weight: 700;
+    }}
+    
+    @keyframes fadeIn {{
+        from {{ opacity: 0; transform: translateY(15px); }}
+        to {{ opacity: 1; transform: translateY(0); }}
+    }}
+    
+    .stButton > button {{
+        background: linear-gradient(135deg, {colors['primary']} 0%, {colors['accent']} 100%) !important;
+        color: {('#000000' if theme == 'dark' else '#ffffff')} !important;
+        font-weight: 700 !important;
+        padding: 0.9rem 3rem !important;
+        border: none !important;
+        border-radius: 8px !important;
+        box-shadow: 0 6px 25px {colors['response_bg']} !important;
+        transition: all 0.3s ease !important;
+        text-transform: uppercase !important;
+        letter-spacing: 2px !important;
+        font-size: 0.9rem !important;
+    }}
+    
+    .stButton > button:hover {{
+        transform: translateY(-4px) scale(1.02) !important;
+        box-shadow: 0 10px 35px {colors['response_bg']} !important;
+    }}
+    
+    section[data-testid="stSidebar"] h2 {{
+        color: {colors['text_primary']} !important;
+        font-weight: 700 !important;
+        font-size: 1.5rem !important;
+        margin-bottom: 1.5rem !important;
+    }}
+    
+    section[data-testid="stSidebar"] h3 {{
+        color: {colors['primary']} !important;
+        font-weight: 600 !important;
+        font-size: 1.1rem !important;
+    }}
+    
+    .sidebar-section {{
+        background: {colors['card_bg']};
+        border-radius: 12px;
+        padding: 1.5rem;
+        margin: 1.2rem 0;
+        border: 1px solid {colors['glass_border']};
+        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
+    }}
+    
+    /* INPUT FIELDS STYLING - Critical for visibility */
+    .stTextInput input, .stTextArea textarea {{
+        background-color: {colors['card_bg']} !important;
+        border: 1px solid {colors['glass_border']} !important;
+        border-radius: 8px !important;
+        color: {colors['text_primary']} !important; 
+        font-size: 0.95rem !important;
+        font-weight: 500 !important;
+        padding: 0.8rem !important;
+        caret-color: {colors['primary']} !important;
+    }}
+    
+    .stTextInput input::placeholder, .stTextArea textarea::placeholder {{
+        color: {colors['text_secondary']} !important;
+        opacity: 0.7 !important;
+    }}
+    
+    .stTextInput input:focus, .stTextArea textarea:focus {{
+        border-color: {colors['primary']} !important;
+        box-shadow: 0 0 0 2px {colors['response_bg']} !important;
+        background-color: {colors['card_bg']} !important;
+        color: {colors['text_primary']} !important;
+    }}
+    
+    /* Ensure validation text is visible */
+    .stAlert {{
+        color: {colors['text_primary']} !important;
+    }}
+    
+    .stAlert p {{
+        color: {colors['text_primary']} !important;
+    }}
+
+    /* Ensure spinner text is visible */
+    .stSpinner > div > div {{
+        color: {colors['text_primary']} !important;
+    }}
+    
+    /* Ensure label text is visible */
+    label[data-testid="stWidgetLabel"] {{
+        color: {colors['text_primary']} !important;
+    }}
+
+    
+    .stSlider > div > div > div > div {{
+        background: {colors['primary']} !important;
+        box-shadow: 0 0 12px {colors['response_bg']} !important;
+    }}
+    
+
+    
+    ::-webkit-scrollbar {{
+        width: 12px;
+    }}
+    
+    ::-webkit-scrollbar-track {{
+        background: {colors['gradient_start']};
+    }}
+    
+    ::-webkit-scrollbar-thumb {{
+        background: linear-gradient(180deg, {colors['primary']}, {colors['accent']});
+        border-radius: 6px;
+    }}
+    
+    ::-webkit-scrollbar-thumb:hover {{
+        background: {colors['primary']};
+    }}
+    
+    .feature-grid {{
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 2rem;
+        margin: 2.5rem 0;
+    }}
+    
+    .feature-card {{
+        background: {colors['glass_bg']};
+        backdrop-filter: blur(10px);
+        border: 1px solid {colors['glass_border']};
+        border-radius: 16px;
+        padding: 2.5rem;
+        text-align: center;
+        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
+        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1);
+        position: relative;
+        overflow: hidden;
+    }}
+    
+    .feature-card::before {{
+        content: '';
+        position: absolute;
+        top: 0;
+        left: 0;
+        right: 0;
+        height: 3px;
+        background: linear-gradient(90deg, {colors['primary']}, {colors['secondary']});
+        transform: scaleX(0);
+        transition: transform 0.4s ease;
+    }}
+    
+    .feature-card:hover::before {{
+        transform: scaleX(1);
+    }}
+    
+    .feature-card:hover {{
+        transform: translateY(-10px);
+        border-color: {colors['primary']};
+        box-shadow: 0 15px 50px {colors['response_bg']};
+    }}
+    
+    .feature-icon {{
+        font-size: 3.5rem;
+        margin-bottom: 1.5rem;
+        filter: grayscale(20%);
+        transition: all 0.3s ease;
+    }}
+    
+    .feature-card:hover .feature-icon {{
+        transform: scale(1.1);
+        filter: grayscale(0%);
+    }}
+    
+    .feature-title {{
+        font-size: 1.3rem;
+        font-weight: 700;
+        color: {colors['primary']};
+        margin-bottom: 0.8rem;
+        font-family: 'Playfair Display', serif;
+    }}
+    
+    .feature-desc {{
+        font-size: 0.95rem;
+        color: {colors['text_primary']};
+        line-height: 1.7;
+        font-weight: 400;
+    }}
+    
+    /* Labels */
+    label {{
+        color: {colors['text_primary']} !important;
+        font-weight: 600 !important;
+        font-size: 0.9rem !important;
+        text-transform: uppercase !important;
+        letter-spacing: 0.5px !important;
+    }}
+    
+    /* Success/Warning/Error boxes */
+    .stSuccess {{
+        background: linear-gradient(135deg, rgba(34, 197, 94, 0.1), rgba(34, 197, 94, 0.05)) !important;
+        color: {colors['text_primary']} !important;
+        border-left: 4px solid #22c55e !important;
+        border-radius: 8px !important;
+    }}
+    
+    .stWarning {{
+        background: linear-gradient(135deg, rgba(251, 191, 36, 0.1), rgba(251, 191, 36, 0.05)) !important;
+        color: {colors['text_primary']} !important;
+        border-left: 4px solid #fbbf24 !important;
+        border-radius: 8px !important;
+    }}
+    
+    .stError {{
+        background: linear-gradient(135deg, rgba(239, 68, 68, 0.1), rgba(239, 68, 68, 0.05)) !important;
+        color: {colors['text_primary']} !important;
+        border-left: 4px solid #ef4444 !important;
+        border-radius: 8px !important;
+    }}
+    
+    /* Markdown headings in main area */
+    .main h1, .main h2, .main h3 {{
+        color: {colors['text_primary']} !important;
+        font-weight: 700 !important;
+    }}
+    
+    .main h3 {{
+        color: {colors['primary']} !important;
+    }}
+    
+    .main p {{
+        color: {colors['text_primary']} !important;
+    }}
+    
+    /* Divider */
+    hr {{
+        border: none;
+        height: 1px;
+        background: linear-gradient(90deg, transparent, {colors['primary']}, transparent);
+        margin: 2rem 0;
+    }}
+</style>
+"""
+
+
+@lru_cache(maxsize=len(THEMES))
+def get_stylesheet(theme):
+    """Return the stylesheet for ``theme``, built once per process.
+
+    Indentation and blank lines are stripped so every rerun sends a smaller,
+    byte-identical element to the frontend.
+    """
+    lines = (line.strip() for line in build_stylesheet(theme).splitlines())
+    return "\n".join(line for line in lines if line)
@@ -0,0 +1,138 @@
+"""Model preloading and residency tracking to avoid cold-load latency."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin
+
+if TYPE_CHECKING:
+    import requests
+
+    from ayurparam.budget import TokenBudget
+
+RESIDENT = "resident"
+COLD = "cold"
+LOADING = "loading"
+UNKNOWN = "unknown"
+
+
+def same_model(a: str, b: str) -> bool:
+    """Compare model names, treating a missing tag as ``:latest``."""
+    def normalise(name):
+        return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+    return normalise(a) == normalise(b)
+
+
+class ModelState:
+    __slots__ = ('state', 'last_used', 'last_checked', 'load_duration', 'error')
+
+    def __init__(self):
+        self.state = UNKNOWN
+        self.last_used = time.time()
+        self.last_checked = None
+        self.load_duration = None
+        self.error = None
+
+
+class ModelWarmer:
+    """Keep the configured model loaded on every backend that is in use.
+
+    ``watch(base_url, model)`` registers a backend/model pair and preloads
+    it straight away with an empty prompt. A daemon thread then checks
+    ``/api/ps`` every ``interval`` seconds and preloads the model again if
+    Ollama has unloaded it, for pairs used within the last ``idle_after``
+    seconds. Every preload (and every real request) sends ``keep_alive``;
+    with a ``budget`` preloads also send the ``num_ctx`` requests will use,
+    so the first request does not reload the model with another window.
+    """
+
+    def __init__(self, session: requests.Session, keep_alive: str = "30m", interval: float = 60.0, idle_after: float = 3600.0, timeout: float = 300.0, budget: TokenBudget = None):
+        self.session = session
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.idle_after = idle_after
+        self.timeout = timeout
+        self.budget = budget
+        self._models = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="ayurparam-warmup", daemon=True)
+        self._thread.start()
+
+    def watch(self, base_url: str, model: str):
+        """Start keeping ``model`` warm on ``base_url``; cheap when already watched."""
+        with self._lock:
+            state = self._models.get((base_url, model))
+            if state is not None:
+                state.last_used = time.time()
+                return
+            self._models[(base_url, model)] = ModelState()
+        threading.Thread(target=self.warm, args=(base_url, model), name="ayurparam-preload", daemon=True).start()
+
+    def observe(self, base_url: str, model: str, meta: dict):
+        """Update residency from the final response fields of a generation."""
+        with self._lock:
+            state = self._models.setdefault((base_url, model), ModelState())
+            state.state = RESIDENT
+            state.last_used = time.time()
+            if "load_duration" in meta:
+                state.load_duration = meta["load_duration"] / 1e9
+
+    def status(self, base_url: str, model: str) -> dict:
+        with self._lock:
+            state = self._models.get((base_url, model))
+            if state is None:
+                return {"state": UNKNOWN, "load_duration": None, "error": None}
+            return {"state": state.state, "load_duration": state.load_duration, "error": state.error}
+
+    def is_resident(self, base_url: str, model: str) -> bool:
+        """Ask ``/api/ps`` whether ``model`` is currently loaded on ``base_url``."""
+        response = self.session.get(urljoin(base_url, "/api/ps"), timeout=10)
+        response.raise_for_status()
+        return any(same_model(m.get("name", m.get("model", "")), model) for m in response.json().get("models", []))
+
+    def warm(self, base_url: str, model: str):
+        """Load ``model`` on ``base_url`` with an empty prompt and record the outcome."""
+        self._set(base_url, model, state=LOADING)
+        payload = {"model": model, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+        try:
+            if self.budget is not None:
+                payload["options"] = {"num_ctx": self.budget.base_ctx(base_url, model)}
+            response = self.session.post(urljoin(base_url, "/api/generate"), json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+            load = result.get("load_duration")
+            self._set(base_url, model, state=RESIDENT, load_duration=load / 1e9 if load else None, error=None)
+        except Exception as e:
+            self._set(base_url, model, state=COLD, error=str(e))
+
+    def close(self):
+        self._stop.set()
+
+    def _set(self, base_url: str, model: str, **fields):
+        with self._lock:
+            state = self._models.setdefault((base_url, model), ModelState())
+            state.last_checked = time.time()
+            for name, value in fields.items():
+                if name == "load_duration" and value is None:
+                    continue
+                setattr(state, name, value)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            with self._lock:
+                active = [key for key, state in self._models.items() if now - state.last_used <= self.idle_after and state.state != LOADING]
+            for base_url, model in active:
+                try:
+                    resident = self.is_resident(base_url, model)
+                except Exception as e:
+                    self._set(base_url, model, state=UNKNOWN, error=str(e))
+                    continue
+                if resident:
+                    self._set(base_url, model, state=RESIDENT, error=None)
+                else:
+                    self._set(base_url, model, state=COLD)
+                    self.warm(base_url, model)
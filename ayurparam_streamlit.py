@@ -1,7 +1,67 @@
+from __future__ import annotations
+
 import streamlit as st
-import requests
-import json
-import markdown
+import html
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import partial
+
+from ayurparam.admission import RateLimiter
+from ayurparam.backends import base_url
+from ayurparam.batch import count_questions, iter_questions, run_batch
+from ayurparam.cache import make_key
+from ayurparam.conversation import Conversation
+from ayurparam.history import HistoryEntry
+from ayurparam.cleaning import StreamCleaner, clean_response
+from ayurparam.metrics import summarize
+from ayurparam.rendering import IncrementalRenderer, render_markdown
+from ayurparam.pipeline import (
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_TOP_K,
+    DEFAULT_TOP_P,
+    answer_question,
+    format_prompt,
+    ground_question,
+    parse_urls,
+    start_generation,
+)
+from ayurparam.resources import (
+    get_admission_controller,
+    get_backend_registry,
+    get_embedder,
+    get_faq_bank,
+    get_generation_metrics,
+    get_hedger,
+    get_history_store,
+    get_http_session,
+    get_ingest_scheduler,
+    get_logo_uri,
+    get_model_warmer,
+    get_passage_index,
+    get_prewarmer,
+    get_response_cache,
+    get_semantic_cache,
+    get_single_flight,
+    get_token_budget,
+)
+from ayurparam.semantic import Embedder, scope_id
+from ayurparam.settings import (
+    BATCH_DIR,
+    BATCH_MAX_CONCURRENCY,
+    CORPUS_DIR,
+    EMBED_MODEL,
+    MAX_CONCURRENT,
+    RETRIEVAL_TOP_K,
+    SESSION_RATE_LIMIT,
+)
+from ayurparam.singleflight import Flight
+from ayurparam.warmup import COLD, LOADING, RESIDENT
+from ayurparam.theme import get_stylesheet, get_theme_colors
 
 
 # Page configuration
@@ -12,466 +72,359 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Starting questions: the example in the question box and the Quick Tips.
+# Their answers are generated in the background while the model is idle.
+DEFAULT_QUESTION = "What is the Samprapti (pathogenesis) of Amavata according to Ayurveda?"
+QUICK_TIPS = (
+    ("Ask about herbs & remedies", "What are the main uses of Ashwagandha in Ayurveda?"),
+    ("Inquire about doshas & prakruti", "What are the three doshas and how do they determine a person's prakruti?"),
+    ("Explore disease pathogenesis", DEFAULT_QUESTION),
+    ("Learn from ancient texts", "What are the major classical texts of Ayurveda and what does each cover?"),
+)
+SEED_QUESTIONS = tuple(dict.fromkeys([DEFAULT_QUESTION, *(question for _, question in QUICK_TIPS)]))
+
 # Initialize session state for theme
 if 'theme' not in st.session_state:
     st.session_state.theme = 'dark'
 
-def get_theme_colors(theme):
-    """Return color scheme based on selected theme"""
-    if theme == 'dark':
-        return {
-            'gradient_start': '#000000',
-            'gradient_mid': '#1a1a1a',
-            'gradient_end': '#0a0a0a',
-            'primary': '#d4af37',  # Gold
-            'accent': '#f4e4b7',   # Light gold
-            'secondary': '#00d4ff', # Cyan accent
-            'bg_overlay': 'rgba(0, 0, 0, 0.8)',
-            'glass_bg': 'rgba(255, 255, 255, 0.05)',
-            'glass_border': 'rgba(212, 175, 55, 0.3)',
-            'text_primary': '#ffffff',
-            'text_secondary': '#d1d5db',
-            'card_bg': 'rgba(255, 255, 255, 0.08)',
-            'response_bg': 'rgba(212, 175, 55, 0.1)',
-            'response_border': '#d4af37',
-        }
-    else:  # light theme
-        return {
-            'gradient_start': '#ffffff',
-            'gradient_mid': '#f0f0f0',
-            'gradient_end': '#e5e5e5',
-            'primary': '#000000',  # Black for high contrast default text
-            'accent': '#d4af37',   # Gold accent
-            'secondary': '#0ea5e9', 
-            'bg_overlay': 'rgba(255, 255, 255, 0.98)',
-            'glass_bg': 'rgba(255, 255, 255, 0.98)',
-            'glass_border': 'rgba(0, 0, 0, 0.1)',
-            'text_primary': '#000000', # Pure black for maximum readability
-            'text_secondary': '#374151', # Dark gray
-            'card_bg': '#ffffff', # Pure white background for inputs
-            'response_bg': 'rgba(240, 240, 240, 0.8)',
-            'response_border': '#d4af37',
-            'input_bg': '#ffffff', # Distinct input background
-            'input_text': '#000000', # Dark text for inputs
-            'sidebar_text': '#000000' # Sidebar text
-        }
+def toggle_theme():
+    """Switch theme from the sidebar checkbox before the script reruns."""
+    st.session_state.theme = 'dark' if st.session_state.dark_mode else 'light'
 
 # Get current theme colors
 colors = get_theme_colors(st.session_state.theme)
 
-# Dynamic CSS based on theme
-st.markdown(f"""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=Playfair+Display:wght@400;500;600;700;800&display=swap');
-    
-    .stApp {{
-        background: linear-gradient(135deg, {colors['gradient_start']} 0%, {colors['gradient_mid']} 50%, {colors['gradient_end']} 100%);
-        background-attachment: fixed;
-        font-family: 'Inter', sans-serif;
-        color: {colors['text_primary']} !important;
-    }}
-    
-    /* General text visibility ensuring all labels and inputs are readable */
-    p, label, h1, h2, h3, h4, h5, h6, li, span {{
-        color: {colors['text_primary']} !important;
-    }}
-    
-    /* Sidebar specific styling */
-    section[data-testid="stSidebar"] {{
-        background: {colors['gradient_start']};
-        border-right: 1px solid {colors['glass_border']};
-    }}
-    
-    section[data-testid="stSidebar"] p, 
-    section[data-testid="stSidebar"] span, 
-    section[data-testid="stSidebar"] label {{
-        color: {colors['text_primary']} !important;
-    }}
-
-    .stApp::before {{
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: 
-            radial-gradient(ellipse at 20% 80%, {colors['response_bg']} 0%, transparent 60%),
-            radial-gradient(ellipse at 80% 20%, rgba(0, 212, 255, 0.05) 0%, transparent 60%);
-        pointer-events: none;
-        z-index: 0;
-    }}
-    
-    .main-header {{
-        text-align: center;
-        padding: 3rem 0 2rem 0;
-        border-bottom: 1px solid {colors['glass_border']};
-        margin-bottom: 2rem;
-    }}
-    
-    .main-title {{
-        font-family: 'Playfair Display', serif;
-        font-size: 4rem;
-        font-weight: 800;
-        background: linear-gradient(135deg, {colors['primary']} 0%, {colors['accent']} 50%, {colors['primary']} 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        margin-bottom: 0.8rem;
-        letter-spacing: 2px;
-        text-shadow: 0 4px 20px {colors['response_bg']};
-    }}
-    
-    .subtitle {{
-        font-size: 1.1rem;
-        color: {colors['text_secondary']};
-        font-weight: 400;
-        letter-spacing: 2px;
-        text-transform: uppercase;
-    }}
-    
-    .glass-card {{
-        background: {colors['glass_bg']};
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border: 1px solid {colors['glass_border']};
-        border-radius: 16px;
-        padding: 2.5rem;
-        margin: 1.5rem 0;
-        box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
-        transition: all 0.3s ease;
-    }}
-    
-    .glass-card:hover {{
-        transform: translateY(-3px);
-        box-shadow: 0 15px 50px rgba(0, 0, 0, 0.15);
-        border-color: {colors['primary']};
-    }}
-    
-    .response-area {{
-        background: {colors['response_bg']};
-        backdrop-filter: blur(15px);
-        -webkit-backdrop-filter: blur(15px);
-        border: 1px solid {colors['response_border']};
-        border-left: 4px solid {colors['primary']};
-        border-radius: 12px;
-        padding: 2rem 2.5rem;
-        margin: 2rem 0;
-        color: {colors['text_primary']};
-        font-size: 1.05rem;
-        line-height: 2;
-        box-shadow: 0 8px 30px {colors['response_bg']};
-        animation: fadeIn 0.6s ease-out;
-    }}
-    
-    .response-area h1, .response-area h2, .response-area h3,
-    .response-area h4, .response-area h5, .response-area h6 {{
-        color: {colors['text_primary']} !important;
-        margin-top: 1.8rem;
-        margin-bottom: 1rem;
-        font-weight: 700;
-    }}
-    
-    .response-area h2 {{
-        border-bottom: 2px solid {colors['primary']};
-        padding-bottom: 0.5rem;
-    }}
-    
-    .response-area p {{
-        color: {colors['text_primary']} !important;
-        margin-bottom: 1.2rem;
-    }}
-    
-    .response-area ul, .response-area ol {{
-        color: {colors['text_primary']} !important;
-        margin-left: 2rem;
-        margin-bottom: 1.5rem;
-    }}
-    
-    .response-area li {{
-        color: {colors['text_primary']} !important;
-        margin-bottom: 0.8rem;
-        padding-left: 0.5rem;
-    }}
-    
-    .response-area li::marker {{
-        color: {colors['primary']};
-    }}
-    
-    .response-area strong {{
-        color: {colors['primary']} !important;
-        font-weight: 700;
-    }}
-    
-    @keyframes fadeIn {{
-        from {{ opacity: 0; transform: translateY(15px); }}
-        to {{ opacity: 1; transform: translateY(0); }}
-    }}
-    
-    .stButton > button {{
-        background: linear-gradient(135deg, {colors['primary']} 0%, {colors['accent']} 100%) !important;
-        color: {('#000000' if st.session_state.theme == 'dark' else '#ffffff')} !important;
-        font-weight: 700 !important;
-        padding: 0.9rem 3rem !important;
-        border: none !important;
-        border-radius: 8px !important;
-        box-shadow: 0 6px 25px {colors['response_bg']} !important;
-        transition: all 0.3s ease !important;
-        text-transform: uppercase !important;
-        letter-spacing: 2px !important;
-        font-size: 0.9rem !important;
-    }}
-    
-    .stButton > button:hover {{
-        transform: translateY(-4px) scale(1.02) !important;
-        box-shadow: 0 10px 35px {colors['response_bg']} !important;
-    }}
-    
-    section[data-testid="stSidebar"] h2 {{
-        color: {colors['text_primary']} !important;
-        font-weight: 700 !important;
-        font-size: 1.5rem !important;
-        margin-bottom: 1.5rem !important;
-    }}
-    
-    section[data-testid="stSidebar"] h3 {{
-        color: {colors['primary']} !important;
-        font-weight: 600 !important;
-        font-size: 1.1rem !important;
-    }}
-    
-    .sidebar-section {{
-        background: {colors['card_bg']};
-        border-radius: 12px;
-        padding: 1.5rem;
-        margin: 1.2rem 0;
-        border: 1px solid {colors['glass_border']};
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
-    }}
-    
-    /* INPUT FIELDS STYLING - Critical for visibility */
-    .stTextInput input, .stTextArea textarea {{
-        background-color: {colors['card_bg']} !important;
-        border: 1px solid {colors['glass_border']} !important;
-        border-radius: 8px !important;
-        color: {colors['text_primary']} !important; 
-        font-size: 0.95rem !important;
-        font-weight: 500 !important;
-        padding: 0.8rem !important;
-        caret-color: {colors['primary']} !important;
-    }}
-    
-    .stTextInput input::placeholder, .stTextArea textarea::placeholder {{
-        color: {colors['text_secondary']} !important;
-        opacity: 0.7 !important;
-    }}
-    
-    .stTextInput input:focus, .stTextArea textarea:focus {{
-        border-color: {colors['primary']} !important;
-        box-shadow: 0 0 0 2px {colors['response_bg']} !important;
-        background-color: {colors['card_bg']} !important;
-        color: {colors['text_primary']} !important;
-    }}
-    
-    /* Ensure validation text is visible */
-    .stAlert {{
-        color: {colors['text_primary']} !important;
-    }}
-    
-    .stAlert p {{
-        color: {colors['text_primary']} !important;
-    }}
-
-    /* Ensure spinner text is visible */
-    .stSpinner > div > div {{
-        color: {colors['text_primary']} !important;
-    }}
-    
-    /* Ensure label text is visible */
-    label[data-testid="stWidgetLabel"] {{
-        color: {colors['text_primary']} !important;
-    }}
+# Precompiled CSS for the current theme
+st.markdown(get_stylesheet(st.session_state.theme), unsafe_allow_html=True)
 
-    
-    .stSlider > div > div > div > div {{
-        background: {colors['primary']} !important;
-        box-shadow: 0 0 12px {colors['response_bg']} !important;
-    }}
-    
+def embed_question(question: str, ollama_urls: tuple):
+    """Embed a question on the least-loaded backend; ``None`` if embeddings are unavailable."""
+    if not EMBED_MODEL:
+        return None
+    return get_embedder().embed(get_backend_registry().pick(ollama_urls).base_url, question.strip())
 
+def refresh_corpus_index(ollama_urls: tuple):
+    """Index new or changed corpus files in the background, if a scan is due."""
+    embed = None
+    if EMBED_MODEL:
+        # Ingestion embeds many chunks per request, so allow it more time
+        embedder = Embedder(get_http_session(), EMBED_MODEL, timeout=120.0)
+        embed = partial(embedder.embed_many, get_backend_registry().pick(ollama_urls).base_url)
+    get_ingest_scheduler().request(embed)
+
+def get_session_id() -> str:
+    """Return an id for this browser session, used to queue its requests fairly."""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def check_rate_limit() -> bool:
+    """Apply the per-session rate limit, warning the user when it is exceeded."""
+    if SESSION_RATE_LIMIT <= 0:
+        return True
+    if 'rate_limiter' not in st.session_state:
+        st.session_state.rate_limiter = RateLimiter(SESSION_RATE_LIMIT)
+    limiter = st.session_state.rate_limiter
+    if limiter.allow():
+        return True
+    st.warning(f"⏳ You are asking questions too quickly. Please wait {limiter.retry_after():.0f}s and try again.")
+    return False
+
+def render_response(placeholder, text: str):
+    """Render response text into the styled response area."""
+    # Convert markdown response to HTML
+    render_response_html(placeholder, render_markdown(text))
+
+def render_response_html(placeholder, html_response: str):
+    """Show already rendered HTML in the styled response area."""
+    # Style the HTML content to match theme
+    placeholder.markdown(f"""
+        <div class="response-area">
+            {html_response}
+        </div>
+    """, unsafe_allow_html=True)
+
+# Minimum seconds between UI refreshes while streaming
+STREAM_REFRESH_INTERVAL = 0.1
+# Seconds between page updates while waiting on a generation. Streamlit can
+# only stop a script (Stop button, rerun, closed tab) when it touches the page.
+WAIT_HEARTBEAT_INTERVAL = 0.5
+
+def queue_status(flight: Flight):
+    """Describe the flight's place in the admission queue, or ``None`` once admitted."""
+    ticket = flight.ticket
+    if ticket is None or not ticket.waiting:
+        return None
+    text = f"🚦 Busy right now: you are number {ticket.position} in the queue"
+    if ticket.eta is not None:
+        text += f" • about {ticket.eta:.0f}s wait"
+    return text
+
+def wait_for_flight(status, flight: Flight) -> str:
+    """Wait for a flight's full answer, showing queue position or elapsed time in ``status``."""
+    start = last_update = time.perf_counter()
+    for _ in flight.follow(heartbeat=WAIT_HEARTBEAT_INTERVAL):
+        now = time.perf_counter()
+        if now - last_update >= WAIT_HEARTBEAT_INTERVAL:
+            status.caption(queue_status(flight) or f"⏳ {now - start:.0f}s elapsed")
+            last_update = now
+    status.empty()
+    return flight.result()
+
+def ask_question(question: str):
+    """Callback for the Quick Tips buttons: ask ``question`` in this run."""
+    st.session_state.pending_question = question
+
+def request_stop():
+    """Callback for the Stop button; its rerun abandons the running generation."""
+    st.session_state.generation_stopped = True
+
+def generate_streaming(placeholder, flight: Flight):
+    """Stream a flight's answer into ``placeholder``, leaving the final render in place.
+
+    Returns ``(response, time_to_first_token)``. A late joiner first receives
+    the chunks already produced, then follows live.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    last_refresh = 0.0
+    cleaner = StreamCleaner()
+    renderer = IncrementalRenderer()
+    for chunk in flight.follow(heartbeat=WAIT_HEARTBEAT_INTERVAL):
+        now = time.perf_counter()
+        if not chunk:
+            # Touch the page so Streamlit can interrupt the wait on stop or rerun
+            waiting = queue_status(flight) if first_token_at is None else None
+            if waiting:
+                placeholder.info(waiting)
+            else:
+                render_response_html(placeholder, renderer.render() + " ▌")
+            last_refresh = now
+            continue
+        if first_token_at is None:
+            first_token_at = now
+        renderer.feed(cleaner.feed(chunk))
+        if now - last_refresh >= STREAM_REFRESH_INTERVAL:
+            render_response_html(placeholder, renderer.render() + " ▌")
+            last_refresh = now
+    
+    if first_token_at is None:
+        first_token_at = time.perf_counter()
+    if flight.error:
+        return flight.error, first_token_at - start
+    renderer.feed(cleaner.flush())
+    render_response_html(placeholder, renderer.finish())
+    return renderer.text, first_token_at - start
+
+@st.fragment
+def show_batch_mode(ollama_urls: tuple, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int, use_cache: bool):
+    """Render the batch upload section and run a batch when requested.
+
+    A fragment, so uploading a file or moving the slider only reruns this
+    section.
+    """
+    with st.expander("📦 Batch Questions"):
+        uploaded = st.file_uploader(
+            "Upload questions (CSV or JSONL)",
+            type=["csv", "jsonl"],
+            help="CSV with a 'question' column, or JSONL with one question (or {\"question\": ...}) per line"
+        )
+        concurrency = st.slider(
+            "Concurrent Requests",
+            min_value=1,
+            max_value=BATCH_MAX_CONCURRENCY,
+            value=min(4, BATCH_MAX_CONCURRENCY),
+            help="How many questions are sent to Ollama at the same time"
+        )
+        
+        if uploaded is not None and st.button("▶️ Run Batch", use_container_width=True):
+            total = count_questions(uploaded, uploaded.name)
+            if total == 0:
+                st.warning("⚠️ No questions found in the uploaded file")
+                return
+            
+            os.makedirs(BATCH_DIR, exist_ok=True)
+            out_path = os.path.join(BATCH_DIR, f"batch-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.jsonl")
+            progress = st.progress(0.0, text=f"0 / {total} answered")
+            
+            def on_progress(done, errors):
+                progress.progress(done / total, text=f"{done} / {total} answered • {errors} errors")
+            
+            stop = threading.Event()
+            answer = partial(
+                answer_question,
+                ollama_urls=ollama_urls,
+                model_name=model_name,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                cache=get_response_cache(),
+                use_cache=use_cache,
+                flights=get_single_flight(),
+                session=get_http_session(),
+                registry=get_backend_registry(),
+                metrics=get_generation_metrics(),
+                stop=stop,
+                admission=get_admission_controller(),
+                # A separate queue lane, so a batch takes turns with interactive questions
+                owner=f"{get_session_id()}:batch",
+                budget=get_token_budget(),
+                hedger=get_hedger(),
+                faq=get_faq_bank(),
+            )
+            start = time.perf_counter()
+            with open(out_path, "w", encoding="utf-8") as out:
+                done, errors = run_batch(iter_questions(uploaded, uploaded.name), answer, out, concurrency, on_progress, stop)
+            st.session_state.batch_result = out_path
+            st.success(f"✅ Answered {done - errors} of {done} questions in {time.perf_counter() - start:.1f}s")
+        
+        batch_result = st.session_state.get('batch_result')
+        if batch_result and os.path.exists(batch_result):
+            with open(batch_result, "rb") as results:
+                st.download_button(
+                    "⬇️ Download Results (JSONL)",
+                    data=results,
+                    file_name=os.path.basename(batch_result),
+                    mime="application/x-ndjson",
+                    use_container_width=True
+                )
+
+MODEL_STATE_LABELS = {
+    RESIDENT: "🔥 model loaded",
+    LOADING: "⏳ loading model",
+    COLD: "❄️ model cold",
+}
+
+def show_backend_status(ollama_urls: tuple, model_name: str):
+    """Show health, load, latency and model residency of each configured backend.
+
+    Also registers the backends and starts keeping ``model_name`` warm on them.
+    """
+    registry = get_backend_registry()
+    warmer = get_model_warmer()
+    for url in ollama_urls:
+        registry.get(url)
+        if model_name:
+            warmer.watch(base_url(url), model_name)
+    lines = []
+    for backend in registry.snapshot(ollama_urls):
+        status = "🟢" if backend["healthy"] else "🔴"
+        latency = f"{backend['latency']:.1f}s avg" if backend["latency"] is not None else "no requests yet"
+        line = f"{status} {base_url(backend['url'])} • {backend['outstanding']} in flight • {latency}"
+        model_state = warmer.status(base_url(backend["url"]), model_name)
+        if model_state["state"] in MODEL_STATE_LABELS:
+            line += f" • {MODEL_STATE_LABELS[model_state['state']]}"
+        lines.append(line)
+    st.caption("  \n".join(lines))
+
+def show_conversation(conversation: Conversation):
+    """Show the earlier turns of the current conversation."""
+    st.markdown("### 💬 Conversation")
+    for turn in conversation.turns:
+        st.markdown(f"""
+            <div style="font-weight: 600; color: {colors['primary']}; margin-top: 1rem;">🙋 {html.escape(turn.question)}</div>
+        """, unsafe_allow_html=True)
+        render_response(st.empty(), turn.answer)
     
-    ::-webkit-scrollbar {{
-        width: 12px;
-    }}
-    
-    ::-webkit-scrollbar-track {{
-        background: {colors['gradient_start']};
-    }}
-    
-    ::-webkit-scrollbar-thumb {{
-        background: linear-gradient(180deg, {colors['primary']}, {colors['accent']});
-        border-radius: 6px;
-    }}
-    
-    ::-webkit-scrollbar-thumb:hover {{
-        background: {colors['primary']};
-    }}
-    
-    .feature-grid {{
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 2rem;
-        margin: 2.5rem 0;
-    }}
-    
-    .feature-card {{
-        background: {colors['glass_bg']};
-        backdrop-filter: blur(10px);
-        border: 1px solid {colors['glass_border']};
-        border-radius: 16px;
-        padding: 2.5rem;
-        text-align: center;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.1);
-        position: relative;
-        overflow: hidden;
-    }}
-    
-    .feature-card::before {{
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        height: 3px;
-        background: linear-gradient(90deg, {colors['primary']}, {colors['secondary']});
-        transform: scaleX(0);
-        transition: transform 0.4s ease;
-    }}
-    
-    .feature-card:hover::before {{
-        transform: scaleX(1);
-    }}
-    
-    .feature-card:hover {{
-        transform: translateY(-10px);
-        border-color: {colors['primary']};
-        box-shadow: 0 15px 50px {colors['response_bg']};
-    }}
-    
-    .feature-icon {{
-        font-size: 3.5rem;
-        margin-bottom: 1.5rem;
-        filter: grayscale(20%);
-        transition: all 0.3s ease;
-    }}
-    
-    .feature-card:hover .feature-icon {{
-        transform: scale(1.1);
-        filter: grayscale(0%);
-    }}
-    
-    .feature-title {{
-        font-size: 1.3rem;
-        font-weight: 700;
-        color: {colors['primary']};
-        margin-bottom: 0.8rem;
-        font-family: 'Playfair Display', serif;
-    }}
-    
-    .feature-desc {{
-        font-size: 0.95rem;
-        color: {colors['text_primary']};
-        line-height: 1.7;
-        font-weight: 400;
-    }}
-    
-    /* Labels */
-    label {{
-        color: {colors['text_primary']} !important;
-        font-weight: 600 !important;
-        font-size: 0.9rem !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.5px !important;
-    }}
-    
-    /* Success/Warning/Error boxes */
-    .stSuccess {{
-        background: linear-gradient(135deg, rgba(34, 197, 94, 0.1), rgba(34, 197, 94, 0.05)) !important;
-        color: {colors['text_primary']} !important;
-        border-left: 4px solid #22c55e !important;
-        border-radius: 8px !important;
-    }}
-    
-    .stWarning {{
-        background: linear-gradient(135deg, rgba(251, 191, 36, 0.1), rgba(251, 191, 36, 0.05)) !important;
-        color: {colors['text_primary']} !important;
-        border-left: 4px solid #fbbf24 !important;
-        border-radius: 8px !important;
-    }}
-    
-    .stError {{
-        background: linear-gradient(135deg, rgba(239, 68, 68, 0.1), rgba(239, 68, 68, 0.05)) !important;
-        color: {colors['text_primary']} !important;
-        border-left: 4px solid #ef4444 !important;
-        border-radius: 8px !important;
-    }}
+    st.caption(f"🧠 {len(conversation)} turns • ~{conversation.tokens} tokens in memory")
+    if st.button("🧹 New Conversation"):
+        conversation.clear()
+        st.rerun()
+
+def timings_caption(meta: dict) -> str | None:
+    """Return Ollama's throughput and latency breakdown for one answer."""
+    timings = summarize(meta)
+    if timings is None:
+        return None
+    return (
+        f"⚡ {timings['tokens_per_second']:.1f} tokens/s ({timings['output_tokens']} tokens) • "
+        f"Load {timings['load']:.2f}s • "
+        f"Prompt {timings['prompt_eval']:.2f}s ({timings['prompt_tokens']} tokens) • "
+        f"Generation {timings['eval']:.2f}s • "
+        f"Server total {timings['total']:.2f}s"
+    )
+
+def budget_caption(meta: dict) -> str | None:
+    """Return the output and context sizes the token budget chose for one answer."""
+    budget = meta.get("budget")
+    if budget is None:
+        return None
+    caption = f"🎯 Output budget {budget['num_predict']} of {budget['requested']} tokens ({budget['kind']} question)"
+    if meta.get("done_reason") == "length":
+        caption += " • reached the limit"
+    caption += f" • Context window {budget['num_ctx']}"
+    if budget["grown"]:
+        caption += " (enlarged for a long prompt)"
+    return caption
+
+def show_sources(sources: list):
+    """List the ``(title, text)`` passages an answer was grounded in."""
+    with st.expander(f"📚 Sources ({len(sources)} passages)"):
+        for i, (title, text) in enumerate(sources, 1):
+            excerpt = text if len(text) <= 400 else text[:400] + "…"
+            st.markdown(f"**[{i}] {title}**")
+            st.caption(excerpt)
+
+def show_answer(entry: HistoryEntry):
+    """Show an answer kept from an earlier run, with its captions and sources."""
+    show_response_header()
+    render_response(st.empty(), entry.answer)
+    for caption in entry.captions:
+        st.caption(caption)
+    sources = entry.sources
+    if sources:
+        show_sources(sources)
+
+def show_history(entries: list):
+    """List earlier answers of this session, newest first."""
+    with st.expander(f"🕘 Earlier Answers ({len(entries)})"):
+        for entry in entries:
+            st.markdown(f"""
+                <div style="font-weight: 600; color: {colors['primary']}; margin-top: 1rem;">🙋 {html.escape(entry.question)}</div>
+            """, unsafe_allow_html=True)
+            st.caption(f"{datetime.fromtimestamp(entry.created):%d %b %H:%M}")
+            render_response(st.empty(), entry.answer)
+
+@st.fragment
+def show_question_input():
+    """Render the question box and Generate button.
+
+    A fragment, so editing the question reruns only this part of the page.
+    Generate hands the question to a full app run: a click inside a fragment
+    cannot interrupt a running script, so the Stop button must live outside.
+    """
+    st.markdown("### 🔮 Ask Your Ayurvedic Question")
     
-    /* Markdown headings in main area */
-    .main h1, .main h2, .main h3 {{
-        color: {colors['text_primary']} !important;
-        font-weight: 700 !important;
-    }}
+    user_input = st.text_area(
+        "Enter your query",
+        placeholder=DEFAULT_QUESTION,
+        height=130,
+        help="Type your question about Ayurveda"
+    )
     
-    .main h3 {{
-        color: {colors['primary']} !important;
-    }}
+    # Generate Button
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        generate_btn = st.button("✨ Generate Answer", type="primary", use_container_width=True)
     
-    .main p {{
-        color: {colors['text_primary']} !important;
-    }}
+    if generate_btn:
+        if not user_input.strip():
+            st.warning("⚠️ Please enter a question to receive an answer")
+        else:
+            st.session_state.pending_question = user_input
+            st.rerun()
+
+def show_response_header():
+    """Render the heading shown above an answer."""
+    st.markdown("### 📖 Response")
     
-    /* Divider */
-    hr {{
-        border: none;
-        height: 1px;
-        background: linear-gradient(90deg, transparent, {colors['primary']}, transparent);
-        margin: 2rem 0;
-    }}
-</style>
-""", unsafe_allow_html=True)
-
-def clean_response(text: str) -> str:
-    """Clean unwanted Unicode escape sequences from the response."""
-    import re
-    cleaned = re.sub(r'\s*\([\\u0-9a-fA-F]+\)', '', text)
-    return cleaned
-
-def query_ollama(prompt: str, ollama_url: str, model_name: str, max_tokens: int, temperature: float, top_p: float, top_k: int) -> str:
-    """Send a request to Ollama API and return the response."""
-    try:
-        payload = {
-            "model": model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-                "top_k": top_k
-            }
-        }
-        
-        response = requests.post(ollama_url, json=payload, timeout=300)
-        response.raise_for_status()
-        
-        result = response.json()
-        raw_response = result.get("response", "")
-        cleaned_response = clean_response(raw_response)
-        return cleaned_response
-        
-    except Exception as e:
-        return f"Error: {str(e)}"
+    st.markdown(f"""
+        <div style="display: flex; align-items: center; margin-bottom: 1.5rem; padding: 1.5rem; background: {colors['response_bg']}; border-radius: 12px; border: 1px solid {colors['response_border']}; border-left: 4px solid {colors['primary']};">
+            <span style="font-size: 2rem; margin-right: 1rem;">🌿</span>
+            <span style="font-weight: 700; color: {colors['primary']}; font-size: 1.2rem; font-family: 'Playfair Display', serif;">Ayurveda's Wisdom</span>
+        </div>
+    """, unsafe_allow_html=True)
 
 def main():
     # Header without logo (logo only in sidebar)
@@ -488,7 +441,7 @@ def main():
     """, unsafe_allow_html=True)
     
     # Feature Cards
-    st.markdown(f"""
+    st.markdown("""
         <div class="feature-grid">
             <div class="feature-card">
                 <div class="feature-icon">🍃</div>
@@ -513,9 +466,10 @@ def main():
         # Logo and branding in sidebar - left aligned using columns for proper vertical alignment
         logo_col, text_col = st.columns([1, 4])
         with logo_col:
-            try:
-                st.image("logo.jpg", width=50)
-            except:
+            logo_uri = get_logo_uri()
+            if logo_uri:
+                st.markdown(f'<img src="{logo_uri}" width="50" alt="Bettrlabs logo">', unsafe_allow_html=True)
+            else:
                 st.write("🌿")
         
         with text_col:
@@ -530,18 +484,14 @@ def main():
             <h3 style="color: {colors['primary']} !important; margin: 0; padding: 0;">⚙️ Configuration</h3>
         </div>''', unsafe_allow_html=True)
         
-        # Theme Toggle - Simple checkbox
-        theme_toggle = st.checkbox(
+        # Theme Toggle - Simple checkbox, applied by its callback before the rerun
+        st.checkbox(
             "🌙 Dark Mode" if st.session_state.theme == 'light' else "☀️ Light Mode",
             value=(st.session_state.theme == 'dark'),
+            key='dark_mode',
+            on_change=toggle_theme,
             help="Toggle between dark and light themes"
         )
-        
-        # Update theme based on checkbox
-        new_theme = 'dark' if theme_toggle else 'light'
-        if new_theme != st.session_state.theme:
-            st.session_state.theme = new_theme
-            st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
         
         
@@ -550,71 +500,166 @@ def main():
             <h3 style="color: {colors['primary']} !important; margin: 0; padding: 0;">🤖 Ollama Settings</h3>
         </div>''', unsafe_allow_html=True)
         
-        ollama_url = st.text_input(
-            "Ollama API URL",
-            value="",
-            placeholder="http://your-server:port/api/generate",
-            help="Enter your Ollama API endpoint URL"
-        )
+        # Forms submit their fields together, so typing does not rerun the app
+        with st.form("ollama_settings", border=False):
+            ollama_urls = parse_urls(st.text_area(
+                "Ollama API URL",
+                value="",
+                placeholder="http://your-server:port/api/generate",
+                height=80,
+                help="Enter your Ollama API endpoint URL. Add one URL per line to spread requests over several servers."
+            ))
+            
+            model_name = st.text_input(
+                "Model Name",
+                value=DEFAULT_MODEL,
+                help="Specify the Ollama model name"
+            )
+            st.form_submit_button("🔌 Connect", use_container_width=True)
         
-        model_name = st.text_input(
-            "Model Name",
-            value="Jayasimma/Ayurveda-8b",
-            help="Specify the Ollama model name"
-        )
+        if ollama_urls:
+            show_backend_status(ollama_urls, model_name)
         
         # Generation Parameters
         st.markdown(f'''<div class="sidebar-section">
             <h3 style="color: {colors['primary']} !important; margin: 0; padding: 0;">🎛️ Generation Parameters</h3>
         </div>''', unsafe_allow_html=True)
         
-        max_new_tokens = st.slider(
-            "Max Output Length",
-            min_value=50,
-            max_value=1000,
-            value=700,
-            help="Maximum tokens to generate"
+        with st.form("generation_parameters", border=False):
+            max_new_tokens = st.slider(
+                "Max Output Length",
+                min_value=50,
+                max_value=1000,
+                value=DEFAULT_MAX_TOKENS,
+                help="Maximum tokens to generate. Short factual questions get a smaller share of this, and long prompts may get less to fit the model's context window"
+            )
+            
+            temperature = st.slider(
+                "Temperature",
+                min_value=0.0,
+                max_value=1.0,
+                value=DEFAULT_TEMPERATURE,
+                step=0.1,
+                help="Higher = more creative, Lower = more focused"
+            )
+            
+            top_p = st.slider(
+                "Top-p",
+                min_value=0.0,
+                max_value=1.0,
+                value=DEFAULT_TOP_P,
+                step=0.05,
+                help="Nucleus sampling threshold"
+            )
+            
+            top_k = st.slider(
+                "Top-k",
+                min_value=1,
+                max_value=100,
+                value=DEFAULT_TOP_K,
+                help="Number of top tokens to consider"
+            )
+            
+            chat_budget = st.slider(
+                "Conversation Memory (tokens)",
+                min_value=512,
+                max_value=8192,
+                value=4096,
+                step=256,
+                help="Used in Conversation Mode: oldest turns are forgotten once the conversation would exceed this many tokens"
+            )
+            st.form_submit_button("✅ Apply Parameters", use_container_width=True)
+        
+        stream_tokens = st.checkbox(
+            "Stream Tokens",
+            value=True,
+            help="Show the answer as it is generated instead of waiting for the full response"
         )
         
-        temperature = st.slider(
-            "Temperature",
-            min_value=0.0,
-            max_value=1.0,
-            value=0.7,
-            step=0.1,
-            help="Higher = more creative, Lower = more focused"
+        chat_mode = st.checkbox(
+            "Conversation Mode",
+            value=False,
+            help="Keep earlier questions and answers so you can ask follow-ups"
         )
         
-        top_p = st.slider(
-            "Top-p",
-            min_value=0.0,
-            max_value=1.0,
-            value=0.95,
-            step=0.05,
-            help="Nucleus sampling threshold"
+        cache_sampled = st.checkbox(
+            "Cache Sampled Answers",
+            value=False,
+            help="Answers at temperature 0 are always cached; enable to also reuse answers generated with sampling"
         )
         
-        top_k = st.slider(
-            "Top-k",
-            min_value=1,
-            max_value=100,
-            value=50,
-            help="Number of top tokens to consider"
+        index_stats = get_passage_index().stats()
+        use_retrieval = st.checkbox(
+            "Ground in Classical Texts",
+            value=index_stats["chunks"] > 0,
+            disabled=index_stats["chunks"] == 0,
+            help=f"Add the {RETRIEVAL_TOP_K} most relevant passages from the indexed texts to the prompt. Put .txt/.md files in {CORPUS_DIR} to index them"
         )
+        if index_stats["documents"]:
+            st.caption(f"📚 {index_stats['documents']} texts • {index_stats['chunks']} passages indexed ({index_stats['embedded']} with embeddings)")
+        
+        cache_stats = get_response_cache().stats()
+        flight_stats = get_single_flight().stats()
+        queue_stats = get_admission_controller().stats()
+        semantic_stats = get_semantic_cache().stats()
+        history_stats = get_history_store().stats()
+        budget_stats = get_token_budget().stats()
+        st.caption(
+            f"🗄️ Cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits "
+            f"({cache_stats['memory_hits']} memory / {cache_stats['disk_hits']} disk) • "
+            f"{cache_stats['misses']} misses • {semantic_stats['hits']} near-matches from {semantic_stats['entries']} questions  \n"
+            f"🔗 Shared generations: {flight_stats['joined']} joined • {flight_stats['in_flight']} running • {flight_stats['cancelled']} cancelled  \n"
+            f"🚦 Queue: {queue_stats['active']}/{MAX_CONCURRENT} running • {queue_stats['waiting']} waiting • {queue_stats['rejected']} turned away  \n"
+            f"🕘 History: {history_stats['sessions']} sessions • {history_stats['memory_bytes'] / 1024:.0f} KB in memory "
+            f"(~{history_stats['bytes_per_session'] / 1024:.1f} KB each) • {history_stats['on_disk']} idle on disk"
+        )
+        if budget_stats['used_share'] is not None:
+            st.caption(
+                f"🎯 Token budget: {budget_stats['used_share']:.0%} of reserved output used • "
+                f"{budget_stats['truncated']} reached the limit • {budget_stats['refused']} too long"
+            )
+        faq = get_faq_bank()
+        if faq is not None:
+            faq_stats = faq.stats()
+            faq_caption = f"📗 Answer bank: {faq_stats['entries']} answers"
+            if faq_stats["lookups"]:
+                faq_caption += (
+                    f" • {faq_stats['hit_rate']:.0%} of {faq_stats['lookups']} questions answered from it • "
+                    f"p95 lookup {faq_stats['p95_ms']:.1f} ms"
+                )
+            if faq_stats["last_error"]:
+                faq_caption += f" • ⚠️ {faq_stats['last_error']}"
+            st.caption(faq_caption)
+        hedger = get_hedger()
+        if hedger is not None:
+            hedge_stats = hedger.stats()
+            if hedge_stats["requests"]:
+                st.caption(
+                    f"🔀 Hedging: {hedge_stats['hedge_rate']:.0%} of {hedge_stats['requests']} requests sent to a second backend • "
+                    f"{hedge_stats['win_rate']:.0%} of those answered first there"
+                )
         
         # Info
         st.markdown(f'''<div class="sidebar-section">
-            <h3 style="color: {colors['primary']} !important; margin: 0; padding-bottom: 10px;">💡 Quick Tips</h3>
-            <div style="color: {colors['text_primary']}; font-size: 0.9rem; line-height: 1.8; font-weight: 400;">
-                • Ask about herbs & remedies<br>
-                • Inquire about doshas & prakruti<br>
-                • Explore disease pathogenesis<br>
-                • Learn from ancient texts
-            </div>
+            <h3 style="color: {colors['primary']} !important; margin: 0; padding: 0;">💡 Quick Tips</h3>
         </div>''', unsafe_allow_html=True)
+        for label, question in QUICK_TIPS:
+            st.button(
+                f"• {label}",
+                key=f"tip_{label}",
+                on_click=ask_question,
+                args=(question,),
+                disabled=not ollama_urls,
+                help=question,
+                use_container_width=True
+            )
+        prewarmer = get_prewarmer(SEED_QUESTIONS)
+        if prewarmer is not None and ollama_urls:
+            prewarm_stats = prewarmer.stats()
+            st.caption(f"🔥 {prewarm_stats['ready']}/{prewarm_stats['prompts']} starting questions answered in advance")
     
     # Validation
-    if not ollama_url:
+    if not ollama_urls:
         st.markdown(f"""
             <div style="background: {colors['response_bg']}; padding: 1.5rem; border-radius: 12px; border: 1px solid {colors['response_border']}; border-left: 4px solid #fbbf24; display: flex; align-items: center;">
                 <span style="font-size: 1.5rem; margin-right: 1rem;">⚠️</span>
@@ -627,63 +672,181 @@ def main():
         return
     
     st.success("✅ Ollama configured successfully! Ready to answer your questions.")
+    refresh_corpus_index(ollama_urls)
     
-    # Question Input
-    st.markdown(f"### 🔮 Ask Your Ayurvedic Question")
+    if 'conversation' not in st.session_state:
+        st.session_state.conversation = Conversation()
+    conversation = st.session_state.conversation
     
-    default_prompt = "What is the Samprapti (pathogenesis) of Amavata according to Ayurveda?"
-    user_input = st.text_area(
-        "Enter your query",
-        placeholder=default_prompt,
-        height=130,
-        help="Type your question about Ayurveda"
-    )
+    if chat_mode and conversation.turns:
+        show_conversation(conversation)
     
-    
-    # Generate Button
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        generate_btn = st.button("✨ Generate Answer", type="primary", use_container_width=True)
+    show_question_input()
     
     # Response Generation
-    if generate_btn:
-        if not user_input.strip():
-            st.warning("⚠️ Please enter a question to receive an answer")
+    user_input = st.session_state.pop('pending_question', None)
+    if st.session_state.pop('generation_stopped', False) and user_input is None:
+        st.info("⏹ Generation stopped")
+    
+    history = get_history_store()
+    history.touch(get_session_id())
+    if user_input is None:
+        # Reruns keep the last answer on screen; in Conversation Mode it is
+        # already shown as the latest turn
+        if st.session_state.get('show_last_answer') and not chat_mode:
+            latest = history.latest(get_session_id())
+            if latest is not None:
+                show_answer(latest)
+    else:
+        st.session_state.show_last_answer = False
+        # Vetted answers come first, except in Conversation Mode where the
+        # model has to see every turn
+        faq = get_faq_bank()
+        faq_match = None
+        if faq is not None and not chat_mode:
+            lookup_start = time.perf_counter()
+            faq_match = faq.lookup(user_input)
+            lookup_ms = (time.perf_counter() - lookup_start) * 1000
+        question_vector = None
+        passages = []
+        if use_retrieval and faq_match is None:
+            question_vector = embed_question(user_input, ollama_urls)
+            passages = get_passage_index().search(user_input, RETRIEVAL_TOP_K, question_vector)
+        question = ground_question(user_input, passages)
+        if chat_mode:
+            formatted_prompt, context = conversation.prepare(question, format_prompt, max_new_tokens, chat_budget)
         else:
-            with st.spinner("🔄 Consulting ancient Ayurvedic wisdom..."):
-                formatted_prompt = f"<user> {user_input} <assistant>"
-                
-                response = query_ollama(
-                    formatted_prompt,
-                    ollama_url,
-                    model_name,
-                    max_new_tokens,
-                    temperature,
-                    top_p,
-                    top_k
-                )
-                
-                if response.startswith("Error:"):
-                    st.error(f"❌ {response}")
-                else:
-                    st.markdown("### 📖 Response")
-                    
-                    st.markdown(f"""
-                        <div style="display: flex; align-items: center; margin-bottom: 1.5rem; padding: 1.5rem; background: {colors['response_bg']}; border-radius: 12px; border: 1px solid {colors['response_border']}; border-left: 4px solid {colors['primary']};">
-                            <span style="font-size: 2rem; margin-right: 1rem;">🌿</span>
-                            <span style="font-weight: 700; color: {colors['primary']}; font-size: 1.2rem; font-family: 'Playfair Display', serif;">Ayurveda's Wisdom</span>
-                        </div>
-                    """, unsafe_allow_html=True)
+            formatted_prompt, context = format_prompt(question), None
+        meta = {}
+        
+        # Starting questions are answered in advance, so their answers are
+        # reused even when sampled
+        use_cache = temperature == 0 or cache_sampled or (prewarmer is not None and prewarmer.is_seed(user_input))
+        cache_key = make_key(model_name, formatted_prompt, max_new_tokens, temperature, top_p, top_k, context)
+        cached = get_response_cache().get(cache_key) if use_cache and faq_match is None else None
+        cache_label = "⚡ Served from cache"
+        
+        # Reworded questions can reuse an answer, except mid-conversation
+        # where the answer also depends on earlier turns, and for grounded
+        # questions whose answer was written from other passages
+        semantic_scope = None
+        if use_cache and cached is None and faq_match is None and not passages and not (chat_mode and conversation.turns):
+            if question_vector is None:
+                question_vector = embed_question(user_input, ollama_urls)
+            semantic_scope = scope_id(model_name, max_new_tokens, temperature, top_p, top_k)
+        if question_vector is not None and semantic_scope is not None:
+            match = get_semantic_cache().lookup(question_vector, semantic_scope)
+            if match is not None:
+                cached = get_response_cache().get(match.key)
+                cache_label = f"⚡ Served from cache • near-match of an earlier question ({match.similarity:.0%} similar)"
+        
+        if faq_match is not None:
+            response = faq_match.answer
+            faq_label = f"📗 From the answer bank in {lookup_ms:.1f} ms • matched “{faq_match.question}”"
+            if faq_match.source:
+                faq_label += f" • {faq_match.source}"
+            captions = [faq_label]
+            show_response_header()
+            render_response(st.empty(), response)
+            st.caption(faq_label)
+        elif cached is not None:
+            response = cached
+            captions = [cache_label]
+            show_response_header()
+            render_response(st.empty(), response)
+            st.caption(cache_label)
+        elif not check_rate_limit():
+            response = "Error: Rate limit reached"
+        else:
+            flight = start_generation(
+                formatted_prompt,
+                ollama_urls,
+                model_name,
+                max_new_tokens,
+                temperature,
+                top_p,
+                top_k,
+                get_single_flight(),
+                get_http_session(),
+                get_backend_registry(),
+                context=context,
+                metrics=get_generation_metrics(),
+                admission=get_admission_controller(),
+                owner=get_session_id(),
+                budget=get_token_budget(),
+                hedger=get_hedger()
+            )
+            start = time.perf_counter()
+            stop_slot = st.empty()
+            stop_slot.button("⏹ Stop", key="stop_generation", on_click=request_stop)
+            
+            try:
+                if stream_tokens:
+                    show_response_header()
+                    placeholder = st.empty()
+                    with st.spinner("🔄 Consulting ancient Ayurvedic wisdom..."):
+                        response, ttft = generate_streaming(placeholder, flight)
+                    elapsed = time.perf_counter() - start
                     
-                    # Convert markdown response to HTML
-                    html_response = markdown.markdown(response)
+                    if response.startswith("Error:"):
+                        placeholder.empty()
+                        st.error(f"❌ {response}")
+                else:
+                    with st.spinner("🔄 Consulting ancient Ayurvedic wisdom..."):
+                        response = wait_for_flight(st.empty(), flight)
+                        elapsed = ttft = time.perf_counter() - start
                     
-                    # Style the HTML content to match theme
-                    st.markdown(f"""
-                        <div class="response-area">
-                            {html_response}
-                        </div>
-                    """, unsafe_allow_html=True)
+                    if response.startswith("Error:"):
+                        st.error(f"❌ {response}")
+                    else:
+                        response = clean_response(response)
+                        show_response_header()
+                        render_response(st.empty(), response)
+            finally:
+                # Runs on Stop, rerun and closed sessions too; the last
+                # follower to leave cancels the upstream generation
+                get_single_flight().leave(flight)
+            stop_slot.empty()
+            
+            if not response.startswith("Error:"):
+                meta = flight.meta
+                if "backend_url" in meta:
+                    get_model_warmer().observe(base_url(meta["backend_url"]), model_name, meta)
+                caption = f"⏱️ First token in {ttft:.2f}s • Total {elapsed:.2f}s"
+                if meta.get("load_duration", 0) >= 1e9:
+                    caption += f" • ❄️ Model load {meta['load_duration'] / 1e9:.1f}s"
+                if meta.get("hedged"):
+                    caption += " • 🔀 Hedged, " + ("the second backend answered first" if meta["hedge_won"] else "the first backend still answered first")
+                if chat_mode and "prompt_eval_count" in meta:
+                    caption += f" • 🧠 {meta['prompt_eval_count']} prompt tokens evaluated"
+                captions = [caption]
+                st.caption(caption)
+                for extra in (timings_caption(meta), budget_caption(meta)):
+                    if extra:
+                        captions.append(extra)
+                        st.caption(extra)
+                if use_cache:
+                    get_response_cache().put(cache_key, response)
+                    if question_vector is not None and semantic_scope is not None:
+                        get_semantic_cache().add(question_vector, cache_key, semantic_scope)
+        
+        sources = [(passage.title, passage.text) for passage in passages]
+        if sources and not response.startswith("Error:"):
+            show_sources(sources)
+        if not response.startswith("Error:"):
+            history.add(get_session_id(), HistoryEntry(user_input, response, captions, sources))
+            st.session_state.show_last_answer = True
+        if chat_mode and not response.startswith("Error:"):
+            conversation.record(user_input, response, formatted_prompt, meta)
+    
+    if not chat_mode:
+        earlier = history.entries(get_session_id())
+        if st.session_state.get('show_last_answer'):
+            earlier = earlier[1:]
+        if earlier:
+            show_history(earlier)
+    
+    show_batch_mode(ollama_urls, model_name, max_new_tokens, temperature, top_p, top_k, temperature == 0 or cache_sampled)
     
     st.markdown('</div>', unsafe_allow_html=True)  # Close glass-card here
     
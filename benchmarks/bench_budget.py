@@ -0,0 +1,146 @@
+"""Benchmark: output tokens reserved versus generated, with and without token budgeting.
+
+Sends a mix of brief, list and detailed questions plus one long pasted
+question through the answering pipeline against a fake Ollama server
+(``benchmarks/fake_ollama.py``), once sending the "Max Output Length" as
+``num_predict`` unchanged and once through ``TokenBudget``. Reports the
+output tokens reserved and generated, answers that hit the limit, prompts
+too long for the default context window and model reloads caused by
+``num_ctx`` changes.
+
+With ``--log`` it instead summarises a decision log written by the app
+(``AYURPARAM_BUDGET_LOG``), per kind of question:
+
+    python benchmarks/bench_budget.py
+    python benchmarks/bench_budget.py --log .cache/budget.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ollama import FakeOllamaConfig, start_server  # noqa: E402
+
+from ayurparam.backends import BackendRegistry  # noqa: E402
+from ayurparam.budget import TokenBudget  # noqa: E402
+from ayurparam.pipeline import answer_question, create_session  # noqa: E402
+from ayurparam.singleflight import SingleFlight  # noqa: E402
+
+QUESTIONS = [
+    "What is Vata?",
+    "What is Ojas?",
+    "Define Agni.",
+    "What are the types of Prakriti?",
+    "List the herbs used for Pitta.",
+    "What are the examples of Rasayana drugs?",
+    "Explain the Samprapti of Amavata.",
+    "How is Panchakarma performed for Kapha disorders?",
+    "Compare Vamana and Virechana.",
+]
+
+# A pasted case history of roughly 7000 tokens, over the 4096-token default window
+LONG_QUESTION = "Patient history: " + "joint pain with morning stiffness, poor appetite and heaviness after meals; " * 370 + "what is the diagnosis?"
+
+
+def summarize_log(path: str) -> dict:
+    """Aggregate a budget decision log per kind of question."""
+    kinds = defaultdict(lambda: {"requests": 0, "reserved": 0, "generated": 0, "truncated": 0, "grown": 0, "refused": 0, "estimate_error": []})
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            row = kinds[record["kind"]]
+            row["requests"] += 1
+            row["grown"] += record["grown"]
+            if record["outcome"] == "refused":
+                row["refused"] += 1
+                continue
+            if record.get("eval_count") is None or record["outcome"] == "cancelled":
+                continue
+            row["reserved"] += record["num_predict"]
+            row["generated"] += record["eval_count"]
+            row["truncated"] += record["outcome"] == "truncated"
+            if record.get("prompt_eval_count") and not record["context_tokens"]:
+                row["estimate_error"].append(abs(record["prompt_tokens"] - record["prompt_eval_count"]) / record["prompt_eval_count"])
+    summary = {}
+    for kind, row in sorted(kinds.items()):
+        errors = row.pop("estimate_error")
+        row["used_share"] = round(row["generated"] / row["reserved"], 3) if row["reserved"] else None
+        row["prompt_estimate_error"] = round(sum(errors) / len(errors), 3) if errors else None
+        summary[kind] = row
+    return summary
+
+
+def run(args, budgeted: bool) -> dict:
+    config = FakeOllamaConfig(token_rate=args.token_rate, latency=0.0, tokens=args.tokens, context_length=args.context_length)
+    server, config, url = start_server(config=config)
+    session = create_session()
+    registry = BackendRegistry(session)
+    log = os.path.join(tempfile.mkdtemp(), "budget.jsonl")
+    budget = TokenBudget(session, num_ctx=args.num_ctx, log_path=log) if budgeted else None
+    questions = QUESTIONS * args.repeat + [LONG_QUESTION]
+    errors = 0
+    for question in questions:
+        answer = answer_question(question, (url,), config.model, args.max_tokens, 0.7, 0.95, 50, None, False, SingleFlight(), session, registry, budget=budget)
+        errors += answer.startswith("Error:")
+    server.shutdown()
+    registry.close()
+
+    row = {"budget": budgeted, "requests": len(questions), "errors": errors, "reloads": config.reloads}
+    if budgeted:
+        kinds = summarize_log(log)
+        row["reserved"] = sum(k["reserved"] for k in kinds.values())
+        row["generated"] = sum(k["generated"] for k in kinds.values())
+        row["truncated"] = sum(k["truncated"] for k in kinds.values())
+        row["over_window"] = 0
+    else:
+        answered = len(questions) - errors
+        row["reserved"] = answered * args.max_tokens
+        row["generated"] = answered * min(args.tokens, args.max_tokens)
+        row["truncated"] = answered if args.max_tokens < args.tokens else 0
+        row["over_window"] = sum(len(q) // 4 + args.max_tokens > args.num_ctx for q in questions)
+    row["used_share"] = round(row["generated"] / row["reserved"], 3) if row["reserved"] else None
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", help="summarise this decision log instead of running the benchmark")
+    parser.add_argument("--max-tokens", type=int, default=700, help="the Max Output Length setting")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens the fake model wants to generate per answer")
+    parser.add_argument("--num-ctx", type=int, default=4096)
+    parser.add_argument("--context-length", type=int, default=8192, help="trained context length the fake model reports")
+    parser.add_argument("--token-rate", type=float, default=2000.0, help="fake server tokens per second")
+    parser.add_argument("--repeat", type=int, default=3, help="times the short question set is asked")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    if args.log:
+        summary = summarize_log(args.log)
+        if args.json:
+            print(json.dumps(summary))
+            return
+        print(f"{'kind':<10} {'requests':>8} {'reserved':>9} {'generated':>9} {'used':>6} {'truncated':>9} {'grown':>6} {'refused':>7} {'est. error':>10}")
+        for kind, row in summary.items():
+            used = f"{row['used_share']:.0%}" if row["used_share"] is not None else "-"
+            error = f"{row['prompt_estimate_error']:.0%}" if row["prompt_estimate_error"] is not None else "-"
+            print(f"{kind:<10} {row['requests']:>8} {row['reserved']:>9} {row['generated']:>9} {used:>6} {row['truncated']:>9} {row['grown']:>6} {row['refused']:>7} {error:>10}")
+        return
+
+    for budgeted in (False, True):
+        row = run(args, budgeted)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            label = "budget on" if budgeted else "budget off"
+            print(f"{label:<11} reserved {row['reserved']:>6}  generated {row['generated']:>6}  used {row['used_share']:.0%}  "
+                  f"hit limit {row['truncated']:>2}  over default window {row['over_window']}  reloads {row['reloads']}  errors {row['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Micro-benchmark: incremental StreamCleaner vs re-cleaning the whole answer.
+
+Cleaning a streamed answer with ``clean_response`` means re-running it over
+the full accumulated text whenever new chunks arrive, which is quadratic in
+answer length. This script
+times both approaches on multi-KB synthetic answers split into token-sized
+chunks and checks that their output is identical.
+
+Run from the repository root:
+
+    python benchmarks/bench_cleaner.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ayurparam.cleaning import StreamCleaner, clean_response  # noqa: E402
+
+PIECES = [
+    "Amavata", " arises", " when", " ama", " (\\u0c05)", " lodges", " in", " the", " joints", ".",
+    "\n\n", "- ", "**Vata**", " (0c06)", " aggravation", "\n", "  ", "(", "\\u0c", "07", ")",
+    " Agni", " mandya", " (cf.", " Madhava", " Nidana)", " ", "(abc", " text", ")",
+]
+
+
+def make_chunks(size: int, rng: random.Random) -> list:
+    """Return token-like chunks adding up to roughly ``size`` characters."""
+    chunks, total = [], 0
+    while total < size:
+        piece = rng.choice(PIECES)
+        # Split some pieces so escape sequences straddle chunk boundaries.
+        if len(piece) > 2 and rng.random() < 0.3:
+            cut = rng.randrange(1, len(piece))
+            chunks.extend([piece[:cut], piece[cut:]])
+        else:
+            chunks.append(piece)
+        total += len(piece)
+    return chunks
+
+
+def run_full(chunks: list) -> str:
+    raw, cleaned = "", ""
+    for chunk in chunks:
+        raw += chunk
+        cleaned = clean_response(raw)
+    return cleaned
+
+
+def run_incremental(chunks: list) -> str:
+    cleaner = StreamCleaner()
+    cleaned = ""
+    for chunk in chunks:
+        cleaned += cleaner.feed(chunk)
+    return cleaned + cleaner.flush()
+
+
+def best_of(fn, arg, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="2000,8000,32000", help="comma-separated answer sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per size")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        chunks = make_chunks(size, rng)
+        expected = clean_response("".join(chunks))
+        assert run_full(chunks) == expected
+        assert run_incremental(chunks) == expected, "StreamCleaner output differs from clean_response"
+
+        full = best_of(run_full, chunks, args.repeat)
+        incremental = best_of(run_incremental, chunks, args.repeat)
+        row = {
+            "chars": len("".join(chunks)),
+            "chunks": len(chunks),
+            "full_ms": round(full * 1000, 3),
+            "incremental_ms": round(incremental * 1000, 3),
+            "speedup": round(full / incremental, 1),
+        }
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['chars']:>7} chars {row['chunks']:>6} chunks  "
+                  f"full {row['full_ms']:>9.3f} ms  incremental {row['incremental_ms']:>7.3f} ms  "
+                  f"x{row['speedup']}")
+
+
+if __name__ == "__main__":
+    main()
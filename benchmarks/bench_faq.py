@@ -0,0 +1,93 @@
+"""Benchmark: answer bank load speed, lookup latency and match quality.
+
+Builds banks of N synthetic question/answer pairs ("Properties of
+Ashwagandha", "Dosage of Herb 512", ...) with the bulk loader, then looks
+up three kinds of questions against each:
+
+- rewordings of stored questions, which should be answered from the bank;
+- other questions about the same herbs, which should go to the model;
+- questions about two herbs at once, which should go to the model too.
+
+Reports load throughput, lookup p50/p99 and the share of each kind
+answered from the bank:
+
+    python benchmarks/bench_faq.py --sizes 1000,10000,100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ayurparam.faq import FaqBank  # noqa: E402
+
+HERBS = ("Ashwagandha", "Brahmi", "Guduchi", "Shatavari", "Triphala", "Tulsi", "Neem", "Haridra", "Amalaki", "Guggulu", "Arjuna", "Yashtimadhu")
+ASPECTS = ("properties", "uses", "dosage", "contraindications", "rasa", "virya", "vipaka", "indications", "side effects", "formulations")
+
+
+def herb(i: int) -> str:
+    return HERBS[i] if i < len(HERBS) else f"Herb{i}"
+
+
+def pairs(n: int):
+    """Yield ``n`` pairs without holding them in memory."""
+    for i in range(n):
+        name, aspect = herb(i // len(ASPECTS)), ASPECTS[i % len(ASPECTS)]
+        yield f"{aspect.capitalize()} of {name}", f"The {aspect} of {name} are described in the classical texts. " * 4, "Bhavaprakasha"
+
+
+def questions(n: int, count: int, rng: random.Random) -> dict:
+    herbs = n // len(ASPECTS)
+    picks = [(herb(rng.randrange(herbs)), rng.choice(ASPECTS), herb(rng.randrange(herbs))) for _ in range(count)]
+    return {
+        "reworded": [f"What are the {aspect} of {name}?" for name, aspect, _ in picks],
+        "other": [f"Can {name} be taken with milk during pregnancy?" for name, _, _ in picks],
+        "two herbs": [f"{aspect} of {name} and {other}" for name, aspect, other in picks],
+    }
+
+
+def run(n: int, count: int) -> dict:
+    bank = FaqBank(os.path.join(tempfile.mkdtemp(), "faq.sqlite3"))
+    result = bank.load(pairs(n))
+    row = {"entries": result["entries"], "load_seconds": round(result["seconds"], 3), "pairs_per_second": round(result["loaded"] / result["seconds"])}
+    for kind, asked in questions(n, count, random.Random(n)).items():
+        latencies, hits = [], 0
+        for question in asked:
+            start = time.perf_counter()
+            hits += bank.lookup(question) is not None
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        row[kind] = {
+            "answered": round(hits / len(asked), 3),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        }
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated bank sizes")
+    parser.add_argument("--questions", type=int, default=500, help="questions of each kind looked up")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    for n in (int(size) for size in args.sizes.split(",")):
+        row = run(n, args.questions)
+        if args.json:
+            print(json.dumps(row))
+            continue
+        print(f"{row['entries']:>7} answers  loaded in {row['load_seconds']:.2f}s ({row['pairs_per_second']}/s)")
+        for kind in ("reworded", "other", "two herbs"):
+            stats = row[kind]
+            print(f"        {kind:<10} answered from bank {stats['answered']:>6.1%}  p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: answer latency percentiles with and without request hedging.
+
+Starts two fake Ollama servers (``benchmarks/fake_ollama.py``) where a
+small share of generations stall before their first token, the long tail
+seen when Ollama swaps models or a GPU is busy with another tenant's long
+prompt. Answers the same distinct questions through the pipeline once
+without hedging and once with a ``Hedger``, and reports p50/p95/p99
+latency, the hedge rate, how often the hedge answered first and how many
+extra generations the servers were asked for:
+
+    python benchmarks/bench_hedge.py --requests 300 --stall-share 0.03 --stall-time 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_ollama import FakeOllamaConfig, start_server  # noqa: E402
+
+from ayurparam.backends import BackendRegistry  # noqa: E402
+from ayurparam.hedging import Hedger  # noqa: E402
+from ayurparam.pipeline import answer_question, create_session  # noqa: E402
+from ayurparam.singleflight import SingleFlight  # noqa: E402
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(args, hedged: bool) -> dict:
+    servers = []
+    for seed in (1, 2):
+        config = FakeOllamaConfig(token_rate=args.token_rate, latency=args.latency, tokens=args.tokens, stall_share=args.stall_share, stall_time=args.stall_time, seed=seed)
+        servers.append(start_server(config=config))
+    urls = tuple(url for _, _, url in servers)
+    session = create_session(pool_size=args.concurrency * 2)
+    registry = BackendRegistry(session)
+    flights = SingleFlight()
+    hedger = Hedger(percentile=args.percentile, max_rate=args.max_rate) if hedged else None
+
+    def ask(i):
+        start = time.perf_counter()
+        answer = answer_question(f"Question {i}: what balances Pitta?", urls, servers[0][1].model, 700, 0.7, 0.95, 50, None, False, flights, session, registry, hedger=hedger)
+        return time.perf_counter() - start, answer.startswith("Error:")
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(ask, range(args.requests)))
+    # Let aborted generations notice the dropped connection
+    time.sleep(args.stall_time + 0.5)
+    for server, _, _ in servers:
+        server.shutdown()
+    registry.close()
+
+    latencies = [elapsed for elapsed, _ in results]
+    row = {
+        "hedging": hedged,
+        "requests": args.requests,
+        "errors": sum(error for _, error in results),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "upstream_requests": sum(config.requests for _, config, _ in servers),
+        "upstream_cancelled": sum(config.cancelled for _, config, _ in servers),
+    }
+    if hedger is not None:
+        stats = hedger.stats()
+        row.update(hedge_rate=round(stats["hedge_rate"], 3), win_rate=round(stats["win_rate"], 3), delay_ms={m: round(d * 1000, 1) for m, d in stats["delays"].items()})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="fake server seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=400.0, help="fake server tokens per second")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per answer")
+    parser.add_argument("--stall-share", type=float, default=0.03, help="share of generations that stall")
+    parser.add_argument("--stall-time", type=float, default=3.0, help="seconds a stalled generation waits before its first token")
+    parser.add_argument("--percentile", type=float, default=95.0, help="hedge after this percentile of time to first token")
+    parser.add_argument("--max-rate", type=float, default=0.1, help="largest share of requests hedged")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    for hedged in (False, True):
+        row = run(args, hedged)
+        if args.json:
+            print(json.dumps(row))
+            continue
+        label = "hedging on" if hedged else "hedging off"
+        line = (f"{label:<12} p50 {row['p50_ms']:>7.1f} ms  p95 {row['p95_ms']:>7.1f} ms  p99 {row['p99_ms']:>7.1f} ms  "
+                f"upstream {row['upstream_requests']:>4} ({row['upstream_cancelled']} cancelled)  errors {row['errors']}")
+        if hedged:
+            line += f"  hedged {row['hedge_rate']:.1%}, second backend first {row['win_rate']:.0%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Micro-benchmark: memory held by answer history for N sessions.
+
+Fills ``--sessions`` sessions with ``--answers`` synthetic answers each
+(Markdown text with grounding passages, roughly the size the app produces)
+and measures the memory held with ``tracemalloc``, first as a naive list of
+dicts per session and then in a ``HistoryStore``. Also reports the store's
+own estimate (what the sidebar shows) and the time to evict every session
+to disk.
+
+Run from the repository root:
+
+    python benchmarks/bench_history.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ayurparam.history import HistoryEntry, HistoryStore  # noqa: E402
+
+TERMS = (
+    "agni ama vata pitta kapha dosha dhatu mala srotas ojas rasayana panchakarma virechana "
+    "basti nasya triphala guduchi ashwagandha shunthi guggulu amavata jwara prameha nidana chikitsa"
+).split()
+FILLER = "the of and is in with by when which to from for as are it this that a".split()
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(TERMS) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(words))
+
+
+def make_answer(rng: random.Random, sources: int) -> dict:
+    answer = "\n\n".join(f"**{rng.choice(TERMS).title()}**: {make_text(rng, 60)}" for _ in range(6))
+    return {
+        "question": make_text(rng, 10) + "?",
+        "answer": answer,
+        "captions": ["⏱️ First token in 0.42s • Total 9.81s", "⚡ 38.2 tokens/s (512 tokens) • Load 0.00s"],
+        "sources": [("Charaka Samhita", make_text(rng, 180)) for _ in range(sources)],
+    }
+
+
+def copy(text: str) -> str:
+    return text[:-1] + text[-1]
+
+
+def copy_answer(answer: dict) -> dict:
+    """Give every answer its own string objects, as answers in the app have."""
+    return {
+        "question": copy(answer["question"]),
+        "answer": copy(answer["answer"]),
+        "captions": [copy(caption) for caption in answer["captions"]],
+        "sources": [(copy(title), copy(text)) for title, text in answer["sources"]],
+    }
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="100,1000", help="comma-separated session counts")
+    parser.add_argument("--answers", type=int, default=20, help="answers per session")
+    parser.add_argument("--max-entries", type=int, default=20, help="HistoryStore ring buffer size")
+    parser.add_argument("--sources", type=int, default=4, help="grounding passages per answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per session count")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = [make_answer(rng, args.sources) for _ in range(200)]
+    for sessions in (int(s) for s in args.sessions.split(",")):
+        picks = [[rng.randrange(len(pool)) for _ in range(args.answers)] for _ in range(sessions)]
+
+        def naive():
+            return {f"s{i}": [copy_answer(pool[p]) for p in session] for i, session in enumerate(picks)}
+
+        def store_build():
+            store = HistoryStore(tempfile.mkdtemp(), max_entries=args.max_entries, idle_ttl=0.0)
+            for i, session in enumerate(picks):
+                for p in session:
+                    a = copy_answer(pool[p])
+                    store.add(f"s{i}", HistoryEntry(a["question"], a["answer"], a["captions"], a["sources"]))
+            return store
+
+        _, naive_bytes = measure(naive)
+        store, store_bytes = measure(store_build)
+        estimate = store.stats()["memory_bytes"]
+        start = time.perf_counter()
+        store.evict_idle()
+        evict = time.perf_counter() - start
+        disk = sum(os.path.getsize(os.path.join(store.path, name)) for name in os.listdir(store.path))
+
+        row = {
+            "sessions": sessions,
+            "naive_kb_per_session": round(naive_bytes / sessions / 1024, 1),
+            "store_kb_per_session": round(store_bytes / sessions / 1024, 1),
+            "estimate_kb_per_session": round(estimate / sessions / 1024, 1),
+            "evict_ms_per_session": round(evict / sessions * 1000, 3),
+            "disk_kb_per_session": round(disk / sessions / 1024, 1),
+        }
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['sessions']:>6} sessions  naive {row['naive_kb_per_session']:>6.1f} KB/session  "
+                  f"store {row['store_kb_per_session']:>5.1f} KB/session (reported {row['estimate_kb_per_session']:.1f})  "
+                  f"evict {row['evict_ms_per_session']:.3f} ms/session  disk {row['disk_kb_per_session']:.1f} KB/session")
+
+
+if __name__ == "__main__":
+    main()
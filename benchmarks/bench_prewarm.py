@@ -0,0 +1,96 @@
+"""Benchmark: first-click latency of the Quick Tips with and without prewarming.
+
+Each mode runs in a fresh interpreter with an empty response cache and a
+fake Ollama server (``benchmarks/fake_ollama.py``). A new session connects,
+waits until the prewarmer reports every starting question answered (when
+prewarming is on) and then clicks each Quick Tip once, timing the full run
+that shows the answer.
+
+Run from the repository root:
+
+    python benchmarks/bench_prewarm.py --latency 0.3 --token-rate 40
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = f"""
+import json, logging, os, sys, time
+sys.path.insert(0, os.path.join({ROOT!r}, "benchmarks"))
+from streamlit.testing.v1 import AppTest
+from fake_ollama import FakeOllamaConfig, start_server
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+latency, token_rate, tokens, prewarm = float(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3]), sys.argv[4] == "1"
+_, _, url = start_server(config=FakeOllamaConfig(token_rate, latency, tokens))
+# The app only prewarms on the servers set by the operator
+os.environ["AYURPARAM_OLLAMA_URL"] = url
+at = AppTest.from_file(os.path.join({ROOT!r}, "ayurparam_streamlit.py"), default_timeout=300).run()
+at.sidebar.text_area[0].input(url)
+next(b for b in at.sidebar.button if "Connect" in b.label).click().run()
+start = time.perf_counter()
+while prewarm:
+    caption = next((c.value for c in at.sidebar.caption if "starting questions" in c.value), "")
+    ready, total = caption.split()[1].split("/") if caption else ("0", "?")
+    if ready == total:
+        break
+    time.sleep(0.2)
+    at.run()
+warm_s = time.perf_counter() - start
+clicks = []
+for button in [b for b in at.sidebar.button if b.label.startswith("•")]:
+    start = time.perf_counter()
+    next(b for b in at.sidebar.button if b.label == button.label).click().run()
+    clicks.append(time.perf_counter() - start)
+assert not at.exception, at.exception
+print(json.dumps({{"warm_s": warm_s, "clicks": clicks}}))
+"""
+
+
+def measure(args, prewarm: bool) -> dict:
+    env = dict(
+        os.environ,
+        AYURPARAM_METRICS_FILE="",
+        AYURPARAM_EMBED_MODEL="",
+        AYURPARAM_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "responses.sqlite3"),
+        AYURPARAM_PREWARM_INTERVAL="0.2" if prewarm else "0",
+    )
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD, str(args.latency), str(args.token_rate), str(args.tokens), "1" if prewarm else "0"],
+        capture_output=True, text=True, env=env, cwd=ROOT, check=True,
+    )
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    clicks = result["clicks"]
+    return {
+        "prewarm": prewarm,
+        "prewarm_s": round(result["warm_s"], 2) if prewarm else None,
+        "click_p50_ms": round(statistics.median(clicks) * 1000, 1),
+        "click_max_ms": round(max(clicks) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="fake server seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=40.0, help="fake server tokens per second")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per answer")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per mode")
+    args = parser.parse_args()
+
+    for prewarm in (False, True):
+        row = measure(args, prewarm)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            label = f"prewarm on (ready after {row['prewarm_s']}s)" if prewarm else "prewarm off"
+            print(f"{label:<32} first click p50 {row['click_p50_ms']:>7.1f} ms  max {row['click_max_ms']:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
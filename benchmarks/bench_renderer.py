@@ -0,0 +1,120 @@
+"""Micro-benchmark: IncrementalRenderer vs re-rendering the whole answer.
+
+Showing a streamed answer with ``markdown.markdown`` means reparsing the full
+accumulated text on every refresh, which is quadratic in answer length. This
+script feeds synthetic multi-KB answers chunk by chunk, renders after every
+``--every`` chunks with both approaches, checks the final HTML matches a
+one-shot render and reports the total time. Documents in ``EDGE_CASES`` are
+checked the same way first, rendering after every character.
+
+Run from the repository root:
+
+    python benchmarks/bench_renderer.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import markdown
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ayurparam.rendering import IncrementalRenderer  # noqa: E402
+
+BLOCKS = [
+    "## Samprapti of Amavata",
+    "Impaired **Agni** produces *ama*, which travels with aggravated Vata to the sandhis.",
+    "- Nidana sevana\n- Agnimandya\n- Ama formation\n- Sthana samshraya in joints",
+    "1. Langhana\n2. Swedana\n3. Deepana-pachana with tikta and katu drugs",
+    "> Charaka describes ama as the root of many diseases.",
+    "The classical texts list **Shunthi**, **Guduchi** and *Eranda taila* among key remedies.",
+]
+
+# Texts where a cut between blocks is easy to get wrong
+EDGE_CASES = [
+    " \t\n  \nfoo\n",
+    "\t\n\nfoo\n\nbar",
+    "  \n\t\nfoo\n\nbar",
+    " \t\n\n    code\n\nafter",
+    "- a\n\n- b\n\nafter",
+    "> quote\n\n> more\n\nafter",
+]
+
+
+def check_edge_cases():
+    for text in EDGE_CASES:
+        renderer = IncrementalRenderer()
+        for char in text:
+            renderer.feed(char)
+            renderer.render()
+        assert renderer.finish() == markdown.markdown(text), f"IncrementalRenderer output differs from a one-shot render for {text!r}"
+
+
+def make_chunks(size: int, rng: random.Random) -> list:
+    """Return word-sized chunks of a Markdown answer of about ``size`` characters."""
+    text = ""
+    while len(text) < size:
+        text += rng.choice(BLOCKS) + "\n\n"
+    return [piece for piece in text.replace(" ", " \x00").split("\x00") if piece]
+
+
+def run_full(chunks: list, every: int) -> str:
+    text = ""
+    for i, chunk in enumerate(chunks, 1):
+        text += chunk
+        if i % every == 0:
+            markdown.markdown(text)
+    return markdown.markdown(text)
+
+
+def run_incremental(chunks: list, every: int) -> str:
+    renderer = IncrementalRenderer()
+    for i, chunk in enumerate(chunks, 1):
+        renderer.feed(chunk)
+        if i % every == 0:
+            renderer.render()
+    return renderer.finish()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="2000,8000,32000", help="comma-separated answer sizes in characters")
+    parser.add_argument("--every", type=int, default=5, help="render after this many chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per size")
+    args = parser.parse_args()
+
+    check_edge_cases()
+    rng = random.Random(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        chunks = make_chunks(size, rng)
+        expected, full = timed(run_full, chunks, args.every)
+        html, incremental = timed(run_incremental, chunks, args.every)
+        assert html == expected, "IncrementalRenderer output differs from a one-shot render"
+        row = {
+            "chars": len("".join(chunks)),
+            "renders": len(chunks) // args.every,
+            "full_ms": round(full * 1000, 3),
+            "incremental_ms": round(incremental * 1000, 3),
+            "speedup": round(full / incremental, 1),
+        }
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['chars']:>7} chars {row['renders']:>5} renders  "
+                  f"full {row['full_ms']:>9.1f} ms  incremental {row['incremental_ms']:>7.1f} ms  "
+                  f"x{row['speedup']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Micro-benchmark: passage ingestion throughput and retrieval latency.
+
+Writes a synthetic corpus of ``--texts`` files, ingests it into a fresh
+PassageIndex with the fake server's bag-of-words embeddings (computed
+in-process, so no server is needed), then times BM25-only and hybrid
+(BM25 + vector) searches. A second ingest of the unchanged corpus shows the
+cost of an incremental scan.
+
+Run from the repository root:
+
+    python benchmarks/bench_retrieval.py
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ayurparam.retrieval import PassageIndex  # noqa: E402
+from fake_ollama import embed as bag_of_words  # noqa: E402
+
+TERMS = (
+    "agni ama vata pitta kapha dosha dhatu mala srotas ojas rasayana vajikarana panchakarma "
+    "virechana vamana basti nasya raktamokshana langhana brimhana deepana pachana shodhana "
+    "shamana triphala guduchi ashwagandha shunthi haritaki amalaki pippali guggulu eranda "
+    "amavata jwara prameha kushtha arsha shotha shula sandhi nidana samprapti chikitsa"
+).split()
+FILLER = "the of and is in with by when which to from for as are it this that a".split()
+
+
+def make_paragraph(rng: random.Random) -> str:
+    words = [rng.choice(TERMS) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(rng.randint(30, 90))]
+    return " ".join(words).capitalize() + "."
+
+
+def write_corpus(directory: str, texts: int, paragraphs: int, rng: random.Random):
+    for i in range(texts):
+        with open(os.path.join(directory, f"text_{i:03d}.txt"), "w", encoding="utf-8") as f:
+            for _ in range(paragraphs):
+                f.write(make_paragraph(rng) + "\n\n")
+
+
+def embed(texts):
+    vectors = np.asarray([bag_of_words(text) for text in texts], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", default="10,100", help="comma-separated corpus sizes in files")
+    parser.add_argument("--paragraphs", type=int, default=200, help="paragraphs per file")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per size")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for texts in (int(s) for s in args.texts.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus, index_dir = os.path.join(tmp, "corpus"), os.path.join(tmp, "index")
+            os.makedirs(corpus)
+            write_corpus(corpus, texts, args.paragraphs, rng)
+            index = PassageIndex(index_dir)
+            start = time.perf_counter()
+            ingested = index.ingest(corpus, embed)
+            ingest = time.perf_counter() - start
+            start = time.perf_counter()
+            index.ingest(corpus, embed)
+            rescan = time.perf_counter() - start
+
+            queries = [" ".join(rng.sample(TERMS, 3)) for _ in range(args.queries)]
+            vectors = embed(queries)
+            bm25, hybrid = [], []
+            for query, vector in zip(queries, vectors):
+                start = time.perf_counter()
+                assert index.search(query, args.k), "no passages found"
+                bm25.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                index.search(query, args.k, vector)
+                hybrid.append(time.perf_counter() - start)
+            size_mb = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)) / 1e6
+
+        bm25_p50, bm25_p95 = percentiles(bm25)
+        hybrid_p50, hybrid_p95 = percentiles(hybrid)
+        row = {
+            "texts": texts,
+            "chunks": ingested["chunks"],
+            "index_mb": round(size_mb, 1),
+            "ingest_chunks_per_s": round(ingested["chunks"] / ingest),
+            "rescan_ms": round(rescan * 1000, 1),
+            "bm25_p50_ms": round(bm25_p50, 3),
+            "bm25_p95_ms": round(bm25_p95, 3),
+            "hybrid_p50_ms": round(hybrid_p50, 3),
+            "hybrid_p95_ms": round(hybrid_p95, 3),
+        }
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['texts']:>4} texts {row['chunks']:>6} chunks {row['index_mb']:>6.1f} MB  "
+                  f"ingest {row['ingest_chunks_per_s']:>6}/s  rescan {row['rescan_ms']:>6.1f} ms  "
+                  f"bm25 p50 {row['bm25_p50_ms']:.2f} / p95 {row['bm25_p95_ms']:.2f} ms  "
+                  f"hybrid p50 {row['hybrid_p50_ms']:.2f} / p95 {row['hybrid_p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
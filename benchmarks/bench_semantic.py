@@ -0,0 +1,76 @@
+"""Micro-benchmark: SemanticCache lookup time against the number of entries.
+
+A lookup is one matrix-vector product over every stored embedding plus an
+argmax. This script fills an index with random unit vectors, checks that a
+slightly perturbed copy of a stored vector finds its original, and reports
+the median lookup time. Use ``--path`` to time the memory-mapped index.
+
+Run from the repository root:
+
+    python benchmarks/bench_semantic.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ayurparam.semantic import SemanticCache  # noqa: E402
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def fill(size: int, dim: int, path, rng: np.random.Generator) -> tuple:
+    cache = SemanticCache(path, "bench", threshold=0.9, max_entries=size)
+    vectors = unit(rng.standard_normal((size, dim), dtype=np.float32))
+    for i, vector in enumerate(vectors):
+        cache.add(vector, f"{i:064x}", scope=0)
+    return cache, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated entry counts")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimension (768 for nomic-embed-text)")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--path", action="store_true", help="memory-map the index in a temporary directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache, vectors = fill(size, args.dim, tmp if args.path else None, rng)
+            targets = rng.integers(0, size, args.lookups)
+            queries = unit(vectors[targets] + rng.standard_normal((args.lookups, args.dim), dtype=np.float32) * 0.01)
+            timings = []
+            for target, query in zip(targets, queries):
+                start = time.perf_counter()
+                match = cache.lookup(query, scope=0)
+                timings.append(time.perf_counter() - start)
+                assert match is not None and match.key == f"{target:064x}", "lookup missed a near-duplicate"
+        row = {
+            "entries": size,
+            "dim": args.dim,
+            "mmap": args.path,
+            "p50_ms": round(statistics.median(timings) * 1000, 3),
+            "max_ms": round(max(timings) * 1000, 3),
+        }
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['entries']:>7} entries x {row['dim']} dims  p50 {row['p50_ms']:>7.3f} ms  max {row['max_ms']:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Startup benchmark: cold first run, warm reruns and what the app imports.
+
+Each measurement runs in a fresh interpreter started with ``-X importtime``.
+Streamlit and its test harness are imported first; everything imported
+after that is attributed to the app, and the slowest of those imports are
+listed. The first ``AppTest`` run is the cold start (imports and cached
+resources); the following runs are ordinary reruns.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "--- app imports ---"
+
+CHILD = f"""
+import os, sys, time
+from streamlit.testing.v1 import AppTest
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+at = AppTest.from_file(os.path.join({ROOT!r}, "ayurparam_streamlit.py"), default_timeout=60)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+if sys.argv[2]:
+    at.sidebar.text_area[0].input(sys.argv[2])
+    next(b for b in at.sidebar.button if "Connect" in b.label).click().run()
+reruns = []
+for _ in range(int(sys.argv[1])):
+    start = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - start)
+assert not at.exception, at.exception
+print(first, *reruns)
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return ``(cumulative_us, module)`` for top-level imports made by the app."""
+    imports = []
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Only count imports made directly by the app, not their dependencies
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((int(cumulative), name.strip()))
+    return imports
+
+
+def measure(reruns: int, url: str) -> dict:
+    env = dict(os.environ, AYURPARAM_METRICS_FILE="", AYURPARAM_CACHE_PATH=os.path.join(ROOT, ".cache", "bench-startup.sqlite3"))
+    start = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, str(reruns), url],
+        capture_output=True, text=True, env=env, cwd=ROOT, check=True,
+    )
+    process = time.perf_counter() - start
+    first, *rest = map(float, child.stdout.split())
+    imports = sorted(parse_importtime(child.stderr), reverse=True)
+    return {
+        "process_s": round(process, 3),
+        "first_run_ms": round(first * 1000, 1),
+        "rerun_p50_ms": round(statistics.median(rest) * 1000, 1) if rest else None,
+        "app_imports_ms": round(sum(us for us, _ in imports) / 1000, 1),
+        "slowest_imports": [(name, round(us / 1000, 1)) for us, name in imports[:8]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to start")
+    parser.add_argument("--url", default="", help="Ollama URL to enter before the reruns (exercises the sidebar status)")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per interpreter")
+    args = parser.parse_args()
+
+    for _ in range(args.repeat):
+        row = measure(args.reruns, args.url)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"first run {row['first_run_ms']:>7.1f} ms  rerun p50 {row['rerun_p50_ms']:>6.1f} ms  "
+                  f"app imports {row['app_imports_ms']:>6.1f} ms  slowest: "
+                  + ", ".join(f"{name} {ms:.0f}" for name, ms in row["slowest_imports"][:5]))
+
+
+if __name__ == "__main__":
+    main()
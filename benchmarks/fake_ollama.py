@@ -0,0 +1,235 @@
+"""Local stand-in for an Ollama server, for benchmarks and load tests.
+
+Implements the endpoints the app uses: ``/api/generate`` (streaming NDJSON
+and blocking), ``/api/embed`` (hashed bag of words, so rewordings that share
+most words come out similar), ``/api/tags``, ``/api/ps`` and ``/api/show``
+(a trained context length). Generation time is simulated with a fixed
+prefill latency (plus an occasional stall, for a latency tail) followed by
+tokens emitted at a steady rate, and the final
+response carries realistic timing fields; requests whose ``num_ctx``
+differs from the previous one are counted as model reloads.
+
+Run standalone:
+
+    python benchmarks/fake_ollama.py --port 11434 --token-rate 40 --latency 0.3
+
+or start it in-process with ``start_server``.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER_WORDS = (
+    "**Amavata** arises when *ama*, produced by weak agni, is carried by aggravated Vata "
+    "to the sandhis (joints).\n\n- Nidana sevana\n- Agnimandya and ama formation\n"
+    "- Sthana samshraya in the joints\n\nTreatment follows langhana, swedana and "
+    "deepana-pachana with tikta and katu drugs. "
+).split(" ")
+
+EMBEDDING_DIM = 256
+
+
+def embed(text: str) -> list:
+    """Deterministic bag-of-words vector for ``text``."""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % EMBEDDING_DIM] += 1.0
+    return vector
+
+
+class FakeOllamaConfig:
+    """Simulation parameters shared by all request handlers."""
+
+    __slots__ = ('token_rate', 'latency', 'tokens', 'load_time', 'model', 'context_length', 'stall_share', 'stall_time', 'random', 'num_ctx', 'reloads', 'active', 'peak', 'requests', 'cancelled', 'lock')
+
+    def __init__(self, token_rate: float = 40.0, latency: float = 0.3, tokens: int = 200, load_time: float = 0.0, model: str = "Jayasimma/Ayurveda-8b", context_length: int = 8192, stall_share: float = 0.0, stall_time: float = 0.0, seed: int = 0):
+        self.token_rate = token_rate
+        self.latency = latency
+        # Share of streamed generations that stall for ``stall_time`` before their first token
+        self.stall_share = stall_share
+        self.stall_time = stall_time
+        self.random = random.Random(seed)
+        self.tokens = tokens
+        self.load_time = load_time
+        self.model = model
+        self.context_length = context_length
+        # Context window of the "loaded" model; a request with another one reloads it
+        self.num_ctx = None
+        self.reloads = 0
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config: FakeOllamaConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, obj, status=200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/api/tags"):
+                self._json({"models": [{"name": f"{config.model}:latest", "model": f"{config.model}:latest"}]})
+            elif self.path.startswith("/api/ps"):
+                self._json({"models": [{"name": f"{config.model}:latest", "model": f"{config.model}:latest", "size_vram": 1}]})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            num_ctx = request.get("options", {}).get("num_ctx", 2048)
+            if self.path.startswith("/api/show"):
+                self._json({"parameters": "", "model_info": {"general.architecture": "llama", "llama.context_length": config.context_length}})
+                return
+            if self.path.startswith("/api/generate"):
+                with config.lock:
+                    config.reloads += config.num_ctx is not None and config.num_ctx != num_ctx
+                    config.num_ctx = num_ctx
+            if self.path.startswith("/api/embed"):
+                text = request.get("input", request.get("prompt", ""))
+                texts = text if isinstance(text, list) else [text]
+                self._json({"model": request.get("model"), "embeddings": [embed(t) for t in texts]})
+                return
+            if not self.path.startswith("/api/generate"):
+                self._json({"error": "not found"}, 404)
+                return
+            if not request.get("prompt"):
+                # Empty prompt: preload request.
+                self._json({"model": request.get("model"), "response": "", "done": True, "load_duration": int(config.load_time * 1e9)})
+                return
+
+            num_predict = request.get("options", {}).get("num_predict", config.tokens)
+            count = max(1, min(config.tokens, num_predict))
+            words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(count)]
+            with config.lock:
+                config.active += 1
+                config.requests += 1
+                config.peak = max(config.peak, config.active)
+            try:
+                if request.get("stream", True):
+                    self._stream(request, words)
+                else:
+                    self._blocking(request, words)
+            finally:
+                with config.lock:
+                    config.active -= 1
+
+        def _final(self, request, count, started):
+            total = time.perf_counter() - started
+            eval_seconds = count / config.token_rate if config.token_rate else 0.0
+            return {
+                "model": request.get("model"),
+                "done": True,
+                "context": [1, 2, 3],
+                "total_duration": int(total * 1e9),
+                "load_duration": int(config.load_time * 1e9),
+                "prompt_eval_count": len(request.get("prompt", "")) // 4 + 1,
+                "prompt_eval_duration": int(config.latency * 1e9),
+                "eval_count": count,
+                "eval_duration": int(eval_seconds * 1e9),
+                "done_reason": "length" if count < config.tokens else "stop",
+            }
+
+        def _blocking(self, request, words):
+            started = time.perf_counter()
+            time.sleep(config.latency + (len(words) / config.token_rate if config.token_rate else 0.0))
+            self._json(dict(self._final(request, len(words), started), response="".join(words)))
+
+        def _stream(self, request, words):
+            started = time.perf_counter()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(obj):
+                data = (json.dumps(obj) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            with config.lock:
+                stall = config.stall_time if config.random.random() < config.stall_share else 0.0
+            try:
+                time.sleep(config.latency + stall)
+                interval = 1.0 / config.token_rate if config.token_rate else 0.0
+                next_at = time.perf_counter()
+                for word in words:
+                    next_at += interval
+                    delay = next_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    send({"model": request.get("model"), "response": word, "done": False})
+                send(dict(self._final(request, len(words), started), response=""))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away: a real Ollama aborts the generation here.
+                with config.lock:
+                    config.cancelled += 1
+                self.close_connection = True
+
+    return Handler
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected, not an error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(port: int = 0, host: str = "127.0.0.1", config: FakeOllamaConfig = None):
+    """Start a fake server on a daemon thread; returns ``(server, config, generate_url)``."""
+    config = config or FakeOllamaConfig()
+    server = FakeOllamaServer((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, config, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--token-rate", type=float, default=40.0, help="tokens per second per request")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per answer (capped by num_predict)")
+    parser.add_argument("--load-time", type=float, default=0.0, help="reported model load_duration in seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--host", default="127.0.0.1")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.token_rate, args.latency, args.tokens, args.load_time)
+    server, _, url = start_server(args.port, args.host, config)
+    print(f"Fake Ollama listening on {url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
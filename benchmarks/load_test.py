@@ -0,0 +1,166 @@
+"""Load test: drive the Streamlit app with concurrent sessions against a fake Ollama.
+
+Each simulated user is a ``streamlit.testing`` ``AppTest`` session running
+the real app script in this process (so process-wide pools, caches and
+registries are shared, as on a real server). For every session count in
+``--sessions`` the users configure the backend, measure a plain rerun, and
+then ask ``--requests`` questions each. Reported per step:
+
+- rerun render time (script execution without generation)
+- time to first token, as measured and displayed by the app
+- end-to-end latency of the "Generate Answer" run
+- throughput in answers per second, errors and peak upstream concurrency
+
+Results are printed as a table and, with ``--json``, appended to a JSONL file
+so runs can be compared for regressions. Without ``--url`` a fake Ollama
+server (``benchmarks/fake_ollama.py``) is started in-process.
+
+    python benchmarks/load_test.py --sessions 1,4,16 --requests 3 --json bench.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllamaConfig, add_arguments, start_server  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ayurparam_streamlit.py")
+TTFT_RE = re.compile(r"First token in ([\d.]+)s")
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+def by_label(elements, text: str):
+    return next(e for e in elements if text in e.label)
+
+
+# Python 3.11's parser is not safe for concurrent first compiles of the same
+# script, so each session's first run (which compiles it) is serialised.
+COMPILE_LOCK = threading.Lock()
+
+
+def run_user(user: int, step: int, args, url: str, results: dict, lock: threading.Lock):
+    try:
+        measured = measure_user(user, step, args, url)
+    except Exception as e:
+        print(f"user {user}: {type(e).__name__}: {e}", file=sys.stderr)
+        measured = {"render": [], "ttft": [], "e2e": [], "errors": args.requests}
+    with lock:
+        for name, value in measured.items():
+            results[name] += value
+
+
+def measure_user(user: int, step: int, args, url: str) -> dict:
+    render, ttft, e2e, errors = [], [], [], 0
+    at = AppTest.from_file(APP, default_timeout=args.timeout)
+    with COMPILE_LOCK:
+        at.run()
+    at.sidebar.text_area[0].input(url)
+    by_label(at.sidebar.button, "Connect").click()
+    by_label(at.sidebar.checkbox, "Stream Tokens").set_value(args.stream)
+    at.run()
+
+    start = time.perf_counter()
+    at.run()
+    render.append(time.perf_counter() - start)
+
+    for i in range(args.requests):
+        question = args.question if args.shared_prompt else f"{args.question} (user {user}, step {step}, request {i})"
+        by_label(at.text_area, "Enter your query").input(question)
+        at.run()
+        start = time.perf_counter()
+        by_label(at.button, "Generate Answer").click()
+        at.run()
+        e2e.append(time.perf_counter() - start)
+        if at.exception or at.error:
+            errors += 1
+            continue
+        for caption in at.caption:
+            match = TTFT_RE.search(caption.value)
+            if match:
+                ttft.append(float(match.group(1)))
+                break
+
+    return {"render": render, "ttft": ttft, "e2e": e2e, "errors": errors}
+
+
+def run_step(sessions: int, args, url: str, config: FakeOllamaConfig) -> dict:
+    results = {"render": [], "ttft": [], "e2e": [], "errors": 0}
+    lock = threading.Lock()
+    if config is not None:
+        with config.lock:
+            config.peak = config.active
+    threads = [threading.Thread(target=run_user, args=(u, sessions, args, url, results, lock)) for u in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    answered = sessions * args.requests - results["errors"]
+    row = {
+        "timestamp": time.time(),
+        "sessions": sessions,
+        "requests": sessions * args.requests,
+        "errors": results["errors"],
+        "stream": args.stream,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(answered / wall, 3) if wall else None,
+        "upstream_peak": config.peak if config is not None else None,
+    }
+    for name in ("render", "ttft", "e2e"):
+        for pct in (50, 95, 99):
+            row[f"{name}_p{pct}_s"] = percentile(results[name], pct)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8", help="comma-separated concurrent session counts")
+    parser.add_argument("--requests", type=int, default=3, help="questions per session")
+    parser.add_argument("--url", help="existing Ollama /api/generate URL (default: start a fake server)")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="use the blocking request path")
+    parser.add_argument("--shared-prompt", action="store_true", help="every user asks the same question")
+    parser.add_argument("--question", default="What is the Samprapti (pathogenesis) of Amavata according to Ayurveda?")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-run AppTest timeout in seconds")
+    parser.add_argument("--json", metavar="PATH", help="append one JSON object per step to PATH")
+    add_arguments(parser)
+    args = parser.parse_args()
+    # Sessions created off the main thread warn about a missing ScriptRunContext.
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    config = None
+    url = args.url
+    if url is None:
+        config = FakeOllamaConfig(args.token_rate, args.latency, args.tokens, args.load_time)
+        _, config, url = start_server(config=config)
+
+    print(f"{'sessions':>8} {'rps':>7} {'render p50':>11} {'ttft p50':>9} {'ttft p95':>9} {'e2e p50':>8} {'e2e p95':>8} {'e2e p99':>8} {'errors':>6}")
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        row = run_step(sessions, args, url, config)
+        print(f"{row['sessions']:>8} {row['throughput_rps']:>7} {row['render_p50_s']:>11} {row['ttft_p50_s']!s:>9} "
+              f"{row['ttft_p95_s']!s:>9} {row['e2e_p50_s']!s:>8} {row['e2e_p95_s']!s:>8} {row['e2e_p99_s']!s:>8} {row['errors']:>6}",
+              flush=True)
+        if args.json:
+            with open(args.json, "a", encoding="utf-8") as out:
+                out.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()